@@ -0,0 +1,591 @@
+"""
+ホットパスのベンチマーク
+
+APIやモデルの学習環境に依存せず、合成したローソク足でオフラインに計測する。
+結果はbenchmark_results/history.jsonlに追記され、保存済みのベースラインと比較して
+中央値がthresholdを超えて遅くなったケースを回帰として報告する。
+
+    python benchmark.py                  # 全ケースを計測してベースラインと比較
+    python benchmark.py -k calc_features # 名前に文字列を含むケースのみ計測
+    python benchmark.py --save-baseline  # 計測結果をベースラインとして保存
+    python benchmark.py --check          # 高速化した実装と元の実装の一致を確認
+    python benchmark.py --backend numpy  # カーネルの実装を指定して実行
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import ensemble
+import indicators
+import kernels
+import make_dataset
+from make_dataset import calc_features, get_data_for_days
+from multi_timeframe import build_multi_timeframe_features
+from streaming_indicators import StreamingTechnicalAnalyzer
+from technical_analyzer import (
+    build_technical_analysis_report,
+    calculate_adx,
+    calculate_atr,
+    calculate_bollinger_bands,
+    calculate_ema,
+    calculate_hurst_exponent,
+    calculate_mean_reversion_signals,
+    calculate_momentum_signals,
+    calculate_rolling_hurst,
+    calculate_rsi,
+    calculate_trend_signals,
+    calculate_volatility_signals,
+    decide_stat_arb_signal,
+    technical_analysis,
+)
+from technical_batch import technical_analysis_batch
+
+result_dir = "benchmark_results"
+history_path = os.path.join(result_dir, "history.jsonl")
+baseline_path = os.path.join(result_dir, "baseline.json")
+
+benchmarks = {}
+checks = {}
+
+
+def benchmark(name):
+    """
+    ベンチマークケースを登録するデコレータ
+
+    登録する関数は(計測対象の関数, 1回あたりの処理件数)を返す。
+    計測対象の関数が入力を書き換える場合は、関数内でコピーしてから処理すること。
+    """
+
+    def decorator(setup):
+        benchmarks[name] = setup
+        return setup
+
+    return decorator
+
+
+def check(name):
+    """高速化した実装が元の実装と一致することを確認する関数を登録するデコレータ"""
+
+    def decorator(func):
+        checks[name] = func
+        return func
+
+    return decorator
+
+
+def assert_report_close(expected, actual, rtol=1e-9, path="report"):
+    """
+    technical_analysisのレポートが一致することを確認する関数
+
+    シグナルと信頼度は完全一致、指標は相対誤差rtol以内であることを求める。
+    """
+    if isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), path
+        for key in expected:
+            assert_report_close(expected[key], actual[key], rtol, f"{path}.{key}")
+    elif isinstance(expected, float):
+        if math.isnan(expected):
+            assert math.isnan(actual), f"{path}: {expected} != {actual}"
+        else:
+            assert math.isclose(
+                expected, actual, rel_tol=rtol, abs_tol=rtol
+            ), f"{path}: {expected} != {actual}"
+    else:
+        assert expected == actual, f"{path}: {expected} != {actual}"
+
+
+def make_synthetic_klines(n, freq="1h", end=None, seed=0, as_str=False):
+    """
+    幾何ブラウン運動に従う合成ローソク足を作成する関数
+
+    Args:
+        n: 足の本数
+        freq: 足の間隔
+        end: 最後の足のopenTime(Noneの場合は固定の時刻)
+        seed: 乱数シード
+        as_str: get_1day_dataと同じく各列を文字列にする場合はTrue
+
+    Returns:
+        pd.DataFrame: 日本時間のopenTimeをインデックスとするローソク足データ
+    """
+    rng = np.random.default_rng(seed)
+    if end is None:
+        end = pd.Timestamp("2025-03-31 05:00", tz="Asia/Tokyo")
+    index = pd.date_range(end=end, periods=n, freq=freq, name="openTime")
+
+    close = 1.4e7 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, n)) * close
+    df = pd.DataFrame(
+        {
+            "open": open_.round(),
+            "high": (np.maximum(open_, close) + spread).round(),
+            "low": (np.minimum(open_, close) - spread).round(),
+            "close": close.round(),
+            "volume": rng.gamma(2.0, 5.0, n).round(4),
+        },
+        index=index,
+    )
+
+    if as_str:
+        df = df.astype(str)
+
+    return df
+
+
+def local_1day_data(klines):
+    """klinesを返すget_1day_dataの代替(日本時間6:00を日付の境界とする)"""
+
+    def get_1day_data(symbol="BTC_JPY", interval="1hour", date=""):
+        start = pd.Timestamp(datetime.strptime(date, "%Y%m%d"), tz="Asia/Tokyo")
+        start += timedelta(hours=6)
+        return klines.loc[start : start + timedelta(hours=23)].copy()
+
+    return get_1day_data
+
+
+# -----------------------------ベンチマークケース-----------------------------#
+@benchmark("get_data_for_days[days=10]")
+def bench_get_data_for_days():
+    klines = make_synthetic_klines(24 * 12, as_str=True)
+    stand_in = local_1day_data(klines)
+
+    def run():
+        with mock.patch.object(make_dataset, "get_1day_data", stand_in):
+            get_data_for_days(end_date="20250330", days=10)
+
+    return run, 240
+
+
+def _register_calc_features(n):
+    @benchmark(f"calc_features[{n}]")
+    def bench():
+        klines = make_synthetic_klines(n, as_str=True)
+        return (lambda: calc_features(klines.copy(), train=True)), n
+
+
+for _n in [72, 2400, 24 * 900]:
+    _register_calc_features(_n)
+
+
+@benchmark("build_multi_timeframe_features[1min x 30days]")
+def bench_build_multi_timeframe_features():
+    klines = make_synthetic_klines(60 * 24 * 30, freq="1min")
+    return (lambda: build_multi_timeframe_features(klines)), len(klines)
+
+
+def technical_analysis_unshared(prices_df):
+    """
+    中間結果を共有しないtechnical_analysis(速度の比較と一致の確認用)
+
+    戦略ごとにリターンやTRを計算し直し、ハースト指数もcalculate_hurst_exponentで求める。
+    """
+    prices_df = prices_df.astype(float)
+    returns = prices_df["close"].pct_change()
+    skew, kurt = indicators.rolling_skew_kurt(returns.to_numpy(), 63)
+    return build_technical_analysis_report(
+        {
+            "trend": calculate_trend_signals(prices_df),
+            "mean_reversion": calculate_mean_reversion_signals(prices_df),
+            "momentum": calculate_momentum_signals(prices_df),
+            "volatility": calculate_volatility_signals(prices_df),
+            "stat_arb": decide_stat_arb_signal(
+                calculate_hurst_exponent(prices_df["close"]), skew[-1], kurt[-1]
+            ),
+        }
+    )
+
+
+def _register_technical_analysis(n):
+    @benchmark(f"technical_analysis[{n}]")
+    def bench():
+        klines = make_synthetic_klines(n, as_str=True)
+        return (lambda: technical_analysis(klines.copy())), n
+
+    @benchmark(f"technical_analysis_unshared[{n}]")
+    def bench_unshared():
+        klines = make_synthetic_klines(n, as_str=True)
+        return (lambda: technical_analysis_unshared(klines.copy())), n
+
+
+for _n in [240, 2400]:
+    _register_technical_analysis(_n)
+
+
+@benchmark("streaming_indicators.update")
+def bench_streaming_update():
+    klines = make_synthetic_klines(2400, as_str=True)
+    analyzer = StreamingTechnicalAnalyzer(klines.iloc[:-1])
+    bar = klines.iloc[-1].to_dict()
+
+    def run():
+        analyzer.update(bar)
+        return analyzer.report()
+
+    return run, 1
+
+
+def _register_indicator(name, func):
+    @benchmark(f"{name}[2400]")
+    def bench():
+        klines = make_synthetic_klines(2400)
+        return (lambda: func(klines)), 2400
+
+
+for _name, _func in [
+    ("calculate_adx", calculate_adx),
+    ("calculate_atr", calculate_atr),
+    ("calculate_rsi", calculate_rsi),
+    ("calculate_bollinger_bands", calculate_bollinger_bands),
+]:
+    _register_indicator(_name, _func)
+
+
+@benchmark("technical_analysis_batch[8760]")
+def bench_technical_analysis_batch():
+    klines = make_synthetic_klines(24 * 365)
+    return (lambda: technical_analysis_batch(klines)), 24 * 365
+
+
+def _register_kernel(name, func, backend):
+    @benchmark(f"kernels.{name}[{backend}]")
+    def bench():
+        returns = make_synthetic_klines(24 * 365)["close"].pct_change().to_numpy()
+
+        def run():
+            with kernels.use_backend(backend):
+                return func(returns)
+
+        run()  # numbaのコンパイルを計測から除く
+        return run, len(returns)
+
+
+for _backend in kernels.available_backends:
+    for _name, _func in [
+        ("rolling_skew_kurt", lambda x: kernels.rolling_skew_kurt(x, 63)),
+        ("ewm_mean", lambda x: kernels.ewm_mean(x, 14)),
+        ("rolling_mean", lambda x: kernels.rolling_mean(x, 14)),
+    ]:
+        _register_kernel(_name, _func, _backend)
+
+
+@benchmark("calculate_hurst_exponent[240]")
+def bench_hurst():
+    close = make_synthetic_klines(240)["close"]
+    return (lambda: calculate_hurst_exponent(close)), 240
+
+
+@benchmark("calculate_rolling_hurst[8760]")
+def bench_rolling_hurst():
+    close = make_synthetic_klines(24 * 365)["close"]
+    return (lambda: calculate_rolling_hurst(close, window=240)), 24 * 365
+
+
+@benchmark("ensemble.predict_proba")
+def bench_predict_proba():
+    models = ensemble.load_models()
+    klines = make_synthetic_klines(72, as_str=True)
+    X = calc_features(klines.copy(), train=False).iloc[[-1]]
+    return (lambda: ensemble.predict_proba(models, X)), 1
+
+
+@benchmark("gmo_ml_bot.cycle")
+def bench_bot_cycle():
+    """gmo_ml_bot.pyの1サイクル(データ取得・特徴量作成・推論・注文判断)"""
+    models = ensemble.load_models()
+    klines = make_synthetic_klines(24 * 5, as_str=True)
+    stand_in = local_1day_data(klines)
+    current_time = (klines.index[-1] + timedelta(hours=1)).tz_localize(None)
+
+    def run():
+        with mock.patch.object(make_dataset, "get_1day_data", stand_in):
+            X = ensemble.make_features(current_time, days=3)
+        pred_proba = ensemble.predict_proba(models, X)
+        return "BUY" if pred_proba >= 0.5 else "SELL"
+
+    return run, 1
+
+
+# -----------------------------一致の確認-----------------------------#
+def pandas_indicators(df):
+    """calculate_*の元のpandasによる実装(一致の確認用)"""
+    close = df["close"]
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    rsi = 100 - 100 / (1 + gain.rolling(14).mean() / loss.rolling(14).mean())
+
+    sma = close.rolling(20).mean()
+    std = close.rolling(20).std()
+
+    prev_close = close.shift()
+    tr = pd.concat(
+        [
+            df["high"] - df["low"],
+            (df["high"] - prev_close).abs(),
+            (df["low"] - prev_close).abs(),
+        ],
+        axis=1,
+    ).max(axis=1)
+    up_move = df["high"] - df["high"].shift()
+    down_move = df["low"].shift() - df["low"]
+    plus_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, 0))
+    minus_dm = pd.Series(
+        np.where((down_move > up_move) & (down_move > 0), down_move, 0)
+    )
+    tr_ewm = tr.reset_index(drop=True).ewm(span=14).mean()
+    plus_di = 100 * plus_dm.ewm(span=14).mean() / tr_ewm
+    minus_di = 100 * minus_dm.ewm(span=14).mean() / tr_ewm
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+
+    return {
+        "rsi": rsi.to_numpy(),
+        "bb_upper": (sma + std * 2).to_numpy(),
+        "bb_lower": (sma - std * 2).to_numpy(),
+        "ema": close.ewm(span=21, adjust=False).mean().to_numpy(),
+        "atr": tr.rolling(14).mean().to_numpy(),
+        "adx": dx.ewm(span=14).mean().to_numpy(),
+        "+di": plus_di.to_numpy(),
+        "-di": minus_di.to_numpy(),
+    }
+
+
+@check("indicator_wrappers")
+def check_indicator_wrappers():
+    for seed in range(10):
+        for n in [10, 60, 2400]:
+            df = make_synthetic_klines(n, seed=seed)
+            original = df.copy()
+            expected = pandas_indicators(df)
+
+            adx = calculate_adx(df)
+            bb_upper, bb_lower = calculate_bollinger_bands(df)
+            actual = {
+                "rsi": calculate_rsi(df, 14),
+                "bb_upper": bb_upper,
+                "bb_lower": bb_lower,
+                "ema": calculate_ema(df, 21),
+                "atr": calculate_atr(df),
+                "adx": adx["adx"],
+                "+di": adx["+di"],
+                "-di": adx["-di"],
+            }
+            for key, values in actual.items():
+                assert values.index.equals(df.index), key
+                np.testing.assert_allclose(
+                    values.to_numpy(), expected[key], rtol=1e-9, err_msg=key
+                )
+
+            # 入力のDataFrameは書き換えない
+            pd.testing.assert_frame_equal(df, original)
+
+
+@check("technical_analysis_shared")
+def check_technical_analysis_shared():
+    for backend in kernels.available_backends:
+        with kernels.use_backend(backend):
+            for seed in range(5):
+                for n in [60, 240, 2400]:
+                    klines = make_synthetic_klines(n, seed=seed, as_str=True)
+                    # NaNも含めて完全に一致すること
+                    expected = json.dumps(technical_analysis_unshared(klines))
+                    actual = json.dumps(technical_analysis(klines))
+                    assert expected == actual, (backend, seed, n)
+
+
+# -----------------------------計測-----------------------------#
+def measure_time(fn, min_time=0.2, repeat=5):
+    """
+    1回あたりの実行時間を計測する関数
+
+    合計がmin_time秒以上になる回数を1セットとしてrepeatセット計測する。
+
+    Returns:
+        list: セットごとの1回あたりの実行時間(秒)
+    """
+    fn()  # ウォームアップ
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+
+    return timings
+
+
+def measure_memory(fn):
+    """
+    1回の実行で確保されたメモリを計測する関数
+
+    Returns:
+        tuple: (実行中のピーク(バイト), 戻り値を破棄した後も残っている量(バイト))
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak, retained
+
+
+def run_benchmarks(names, min_time=0.2, repeat=5):
+    results = {}
+    for name in names:
+        try:
+            fn, n_items = benchmarks[name]()
+        except Exception as e:  # モデルの依存ライブラリがない環境など
+            print(f"{name:<36} skipped: {e!r}")
+            continue
+
+        timings = measure_time(fn, min_time=min_time, repeat=repeat)
+        median = float(np.median(timings))
+        results[name] = {
+            "median": median,
+            "min": float(np.min(timings)),
+            "throughput": n_items / median,
+        }
+        results[name]["peak_memory"], results[name]["retained_memory"] = measure_memory(
+            fn
+        )
+        print(
+            f"{name:<36} {median * 1e3:10.3f} ms"
+            f" {results[name]['throughput']:14,.0f} items/s"
+            f" {results[name]['peak_memory'] / 2**20:9.2f} MiB"
+            f" {results[name]['retained_memory'] / 2**10:9.1f} KiB retained"
+        )
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(results, baseline, threshold):
+    """中央値がベースラインより(1 + threshold)倍を超えて遅くなったケースを返す"""
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-k", "--filter", default="", help="計測するケース名の部分文字列"
+    )
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="回帰とみなす遅延率"
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="一致の確認のみ行う")
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "numpy", "numba"],
+        default="auto",
+        help="カーネルの実装",
+    )
+    args = parser.parse_args()
+    kernels.set_backend(args.backend)
+
+    if args.check:
+        failed = 0
+        for name, func in checks.items():
+            if args.filter not in name:
+                continue
+            try:
+                func()
+                print(f"{name:<36} ok")
+            except AssertionError as e:
+                failed += 1
+                print(f"{name:<36} FAILED: {e}")
+        return 1 if failed else 0
+
+    names = [name for name in benchmarks if args.filter in name]
+    results = run_benchmarks(names, min_time=args.min_time, repeat=args.repeat)
+
+    os.makedirs(result_dir, exist_ok=True)
+    with open(history_path, "a") as f:
+        f.write(
+            json.dumps(
+                {
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "revision": git_revision(),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "kernels": kernels.get_backend(),
+                    "machine": platform.machine(),
+                    "results": results,
+                }
+            )
+            + "\n"
+        )
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"ベースラインを保存しました: {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print("ベースラインがありません。--save-baselineで保存してください")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, ratio in regressions.items():
+        print(f"REGRESSION {name}: ベースラインの{ratio:.2f}倍")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+periods_per_year = 24 * 365  # 1時間足
+stop_rate = -0.2  # Botが稼働を停止する利益率
+
+
+def returns_from_profit(profit, capital):
+    """
+    取引ごとの損益(円)を初期残高に対するリターンに変換する関数
+
+    Botは注文数量が固定のため、利益率は各リターンの累積和になる。
+
+    Args:
+        profit: 取引ごとの損益(円)
+        capital: 初期残高(円)
+
+    Returns:
+        np.ndarray: 初期残高に対するリターン
+    """
+    return np.asarray(profit, dtype=float) / capital
+
+
+def sharpe_ratio(returns, periods_per_year=periods_per_year):
+    """
+    年率換算したシャープレシオを計算する関数
+
+    Args:
+        returns: リターン(2次元の場合は各行を1つの系列として扱う)
+        periods_per_year: 1年あたりの期間数
+
+    Returns:
+        np.ndarray or float: シャープレシオ
+    """
+    returns = np.asarray(returns, dtype=float)
+    mean = returns.mean(axis=-1)
+    std = returns.std(axis=-1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return mean / std * np.sqrt(periods_per_year)
+
+
+def profit_rate_paths(returns):
+    """各時点の利益率(リターンの累積和)を計算する関数"""
+    return np.cumsum(returns, axis=-1)
+
+
+def max_drawdown(returns):
+    """
+    最大ドローダウンを計算する関数
+
+    Args:
+        returns: リターン(2次元の場合は各行を1つの系列として扱う)
+
+    Returns:
+        np.ndarray or float: 残高のピークからの最大下落率(負の値)
+    """
+    equity = 1 + profit_rate_paths(np.asarray(returns, dtype=float))
+    peak = np.maximum(np.maximum.accumulate(equity, axis=-1), 1)
+    return ((equity - peak) / peak).min(axis=-1)
+
+
+def hit_stop(returns, stop_rate=stop_rate):
+    """利益率がstop_rateを下回る時点があったかを判定する関数"""
+    return profit_rate_paths(returns).min(axis=-1) < stop_rate
+
+
+def circular_blocks(returns, block_size):
+    """
+    循環ブロックブートストラップで抽出するブロックの一覧を返す関数
+
+    系列の末尾に先頭block_size - 1本を継ぎ足した配列のストライドビューで、
+    i行目が位置iから始まるブロックになる。
+
+    Args:
+        returns: 元のリターン
+        block_size: ブロックの長さ
+
+    Returns:
+        np.ndarray: (len(returns), block_size)の読み取り専用ビュー
+
+    Raises:
+        ValueError: block_sizeがリターンの本数より大きい場合
+    """
+    if not 1 <= block_size <= len(returns):
+        raise ValueError(
+            f"ブロックの長さ({block_size})は1以上リターンの本数({len(returns)})以下にしてください"
+        )
+    padded = np.concatenate([returns, returns[: block_size - 1]])
+    return np.lib.stride_tricks.sliding_window_view(padded, block_size)
+
+
+def _default_batch_size(n):
+    # 1バッチあたり約32MBに収める
+    return max(1, (1 << 22) // n)
+
+
+def _resample_statistics(
+    returns, n_resamples, make_batch, batch_size, stop_rate, periods_per_year
+):
+    if batch_size is None:
+        batch_size = _default_batch_size(len(returns))
+
+    sharpe = np.empty(n_resamples)
+    drawdown = np.empty(n_resamples)
+    final_profit_rate = np.empty(n_resamples)
+    stop = np.empty(n_resamples, dtype=bool)
+
+    for start in range(0, n_resamples, batch_size):
+        end = min(start + batch_size, n_resamples)
+        batch = make_batch(end - start)
+
+        # 累積和から平均、内積から二乗和を求めて配列の走査回数を減らす
+        n = batch.shape[1]
+        paths = profit_rate_paths(batch)
+        mean = paths[:, -1] / n
+        var = (np.einsum("ij,ij->i", batch, batch) - n * mean**2) / (n - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe[start:end] = mean / np.sqrt(var) * np.sqrt(periods_per_year)
+
+        equity = paths + 1
+        peak = np.maximum.accumulate(equity, axis=1)
+        np.maximum(peak, 1, out=peak)
+        np.divide(equity, peak, out=equity)
+        drawdown[start:end] = equity.min(axis=1) - 1
+
+        final_profit_rate[start:end] = paths[:, -1]
+        stop[start:end] = paths.min(axis=1) < stop_rate
+
+    return {
+        "sharpe": sharpe,
+        "max_drawdown": drawdown,
+        "final_profit_rate": final_profit_rate,
+        "hit_stop": stop,
+    }
+
+
+def block_bootstrap(
+    returns,
+    n_resamples=10000,
+    block_size=24,
+    batch_size=None,
+    stop_rate=stop_rate,
+    periods_per_year=periods_per_year,
+    seed=None,
+):
+    """
+    ブロックブートストラップでシャープレシオ・最大ドローダウン・停止確率の分布を求める関数
+
+    自己相関を保つため、block_size本の連続したリターンを単位に復元抽出する。
+    リサンプルはbatch_size行の2次元配列としてまとめて生成・評価する。
+    リターンがblock_size本より少ない場合はブロックの長さをリターンの本数にする。
+
+    Args:
+        returns: バックテストまたは実取引のリターン
+        n_resamples: リサンプル数
+        block_size: ブロックの長さ
+        batch_size: 1度に生成するリサンプル数(Noneの場合はメモリ量から自動決定)
+        stop_rate: Botが稼働を停止する利益率
+        periods_per_year: 1年あたりの期間数
+        seed: 乱数シード
+
+    Returns:
+        dict: 各統計量のリサンプルごとの値
+    """
+    returns = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng(seed)
+    n = len(returns)
+    if n < 2:
+        raise ValueError("ブートストラップには2本以上のリターンが必要です")
+    block_size = min(block_size, n)
+    n_blocks = -(-n // block_size)
+    blocks = circular_blocks(returns, block_size)
+
+    def make_batch(size):
+        starts = rng.integers(0, n, size=(size, n_blocks))
+        return blocks[starts].reshape(size, -1)[:, :n]
+
+    return _resample_statistics(
+        returns, n_resamples, make_batch, batch_size, stop_rate, periods_per_year
+    )
+
+
+def monte_carlo(
+    returns,
+    n_resamples=10000,
+    method="shuffle",
+    batch_size=None,
+    stop_rate=stop_rate,
+    periods_per_year=periods_per_year,
+    seed=None,
+):
+    """
+    モンテカルロ法でシャープレシオ・最大ドローダウン・停止確率の分布を求める関数
+
+    Args:
+        returns: バックテストまたは実取引のリターン
+        n_resamples: リサンプル数
+        method: "shuffle"(リターンの順序を並べ替え)または"normal"(正規分布から生成)
+        batch_size: 1度に生成するリサンプル数(Noneの場合はメモリ量から自動決定)
+        stop_rate: Botが稼働を停止する利益率
+        periods_per_year: 1年あたりの期間数
+        seed: 乱数シード
+
+    Returns:
+        dict: 各統計量のリサンプルごとの値
+    """
+    returns = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    if method == "shuffle":
+
+        def make_batch(size):
+            return rng.permuted(np.broadcast_to(returns, (size, len(returns))), axis=1)
+
+    elif method == "normal":
+        mean, std = returns.mean(), returns.std(ddof=1)
+
+        def make_batch(size):
+            return rng.normal(mean, std, size=(size, len(returns)))
+
+    else:
+        raise ValueError(f"不正なmethodです: {method}")
+
+    return _resample_statistics(
+        returns, n_resamples, make_batch, batch_size, stop_rate, periods_per_year
+    )
+
+
+def summarize(distribution, percentiles=(5, 25, 50, 75, 95)):
+    """
+    block_bootstrapまたはmonte_carloの結果を要約する関数
+
+    Args:
+        distribution: block_bootstrapまたはmonte_carloの出力
+        percentiles: 出力するパーセンタイル
+
+    Returns:
+        pd.DataFrame: 統計量ごとの平均・標準偏差・パーセンタイルと停止確率
+    """
+    rows = {}
+    for name in ["sharpe", "max_drawdown", "final_profit_rate"]:
+        values = distribution[name]
+        row = {"mean": np.nanmean(values), "std": np.nanstd(values)}
+        for p, v in zip(percentiles, np.nanpercentile(values, percentiles)):
+            row[f"p{p}"] = v
+        rows[name] = row
+
+    # 停止確率はmean列に格納する
+    rows["hit_stop"] = {"mean": distribution["hit_stop"].mean()}
+
+    return pd.DataFrame(rows).T
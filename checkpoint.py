@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+
+from utils import print_log
+
+
+class CheckpointStore:
+    """
+    Botの実行状態をJSONファイルに保存・復元するクラス
+
+    保存は同じディレクトリの一時ファイルに書き込んでfsyncした後にos.replaceで
+    置き換えるため、書き込み中に停止しても前回の状態か今回の状態のいずれかが残る。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 状態を保存するJSONファイルのパス
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def save(self, state):
+        """状態(JSONに変換できる辞書)を保存する"""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def load(self):
+        """保存した状態を返す(ないか読めない場合はNone)"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print_log(
+                f"チェックポイントを読み込めませんでした: {e}",
+                level="warning",
+                notify=True,
+            )
+            return None
+
+
+def cycle_id(current_time):
+    """サイクル(1時間)を識別する文字列"""
+    return current_time.strftime("%Y%m%d%H")
+
+
+def reconcile_positions(state, position):
+    """
+    チェックポイントの建玉と実際の建玉を照合する関数
+
+    食い違う場合は通知し、建玉があるのに取引回数が0の場合は1にする
+    (次のサイクルで損益率を確認するため)。
+
+    Args:
+        state: チェックポイントの状態(position_side, trade_numを含む辞書)
+        position: get_positionの出力
+
+    Returns:
+        int: 取引回数
+    """
+    sides = sorted(p["side"] for p in position["data"].get("list", []))
+    expected = [state["position_side"]] if state["position_side"] else []
+    if sides != expected:
+        print_log(
+            f"チェックポイントの建玉({expected})と実際の建玉({sides})が一致しません",
+            level="warning",
+            notify=True,
+        )
+
+    trade_num = state["trade_num"]
+    if sides and trade_num == 0:
+        trade_num = 1
+    return trade_num
@@ -0,0 +1,449 @@
+import hashlib
+import itertools
+import json
+import math
+
+from llm_predictor import build_prompt, llm_model
+from utils import print_log
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+token_limit = 4000  # プロンプトのトークン数の上限
+# 元の形式とのトークン数の比較をログに出力する間隔(build_prompt_within_limitの呼び出し回数)
+full_format_log_every = 24
+_prompt_count = itertools.count()
+
+# トークン数が上限を超えた場合に短縮するセクションの順序(価値の低いものから)
+budget_policy = ("reasoning", "history", "descriptions", "articles")
+# 文字数で切り詰めるセクションの(最初の文字数, 最小の文字数)
+truncation_steps = {"reasoning": (100, 50), "descriptions": (200, 50)}
+
+# テクニカル分析結果の短縮キー
+strategy_keys = {
+    "trend_following": "tr",
+    "mean_reversion": "mr",
+    "momentum": "mo",
+    "volatility": "vo",
+    "statistical_arbitrage": "sa",
+}
+metric_keys = {
+    "adx": "adx",
+    "trend_strength": "str",
+    "z_score": "z",
+    "price_vs_bb": "bb",
+    "rsi_14": "rsi14",
+    "rsi_28": "rsi28",
+    "momentum_21": "m21",
+    "momentum_63": "m63",
+    "momentum_126": "m126",
+    "volume_momentum": "vm",
+    "historical_volatility": "hv",
+    "volatility_regime": "vr",
+    "volatility_z_score": "vz",
+    "atr_ratio": "atr",
+    "hurst_exponent": "h",
+    "skewness": "sk",
+    "kurtosis": "ku",
+}
+signal_keys = {"bullish": "+", "neutral": "0", "bearish": "-"}
+
+legend = (
+    "s=シグナル(+:bullish, 0:neutral, -:bearish), c=信頼度(%), "
+    "tr=トレンド(EMA,ADX), mr=平均回帰(z=zスコア, bb=ボリンジャーバンド内の位置, rsi14/rsi28), "
+    "mo=モメンタム(m21/m63/m126=期間リターン合計, vm=出来高比), "
+    "vo=ボラティリティ(hv=年率ボラ, vr=レジーム比, vz=zスコア, atr=ATR/価格), "
+    "sa=統計的裁定(h=ハースト指数, sk=歪度, ku=尖度)"
+)
+
+
+def round_value(value, digits=3):
+    """数値を有効数字digits桁に丸める(NaNと無限大はNone)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if math.isnan(value) or math.isinf(value):
+        return None
+    if isinstance(value, int):
+        return value
+    return float(f"{value:.{digits}g}")
+
+
+def compact_report(technical_analysis_report, digits=3):
+    """
+    テクニカル分析結果を短縮キーのフラットな辞書に変換する関数
+
+    説明文は省き、指標は有効数字digits桁に丸める。
+
+    Args:
+        technical_analysis_report: technical_analysisの出力
+        digits: 指標の有効数字
+
+    Returns:
+        dict: 例 {"s": "+", "c": 57, "tr.s": "+", "tr.c": 23, "tr.adx": 23.1, ...}
+    """
+    report = technical_analysis_report
+    row = {"s": signal_keys[report["signal"]], "c": report["confidence"]}
+    for name, strategy in report["strategy_signals"].items():
+        key = strategy_keys.get(name, name)
+        row[f"{key}.s"] = signal_keys[strategy["signal"]]
+        row[f"{key}.c"] = strategy["confidence"]
+        for metric, value in strategy["metrics"].items():
+            row[f"{key}.{metric_keys.get(metric, metric)}"] = round_value(value, digits)
+    return row
+
+
+def article_id(article):
+    """記事のリンク(なければタイトル)から短いIDを作成する関数"""
+    source = article.get("link") or article.get("title", "")
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:6]
+
+
+def compact_article(article, description_chars=None):
+    description = article.get("description", "")
+    if description_chars is not None and len(description) > description_chars:
+        description = description[:description_chars] + "…"
+    return {
+        "t": article.get("title", ""),
+        "d": description,
+        "p": article.get("pub_date", ""),
+    }
+
+
+def compact_history(reflection_history, digits=3, reasoning_chars=None):
+    """
+    予測履歴を差分形式に変換する関数
+
+    各レコードのテクニカル分析結果は直前のレコードから変化した項目のみ、
+    ニュース記事はIDのみを残す。
+
+    Args:
+        reasoning_chars: 予測の理由の最大文字数(Noneの場合は省略しない)
+
+    Returns:
+        tuple: (履歴のリスト, 履歴で参照される記事のIDと記事の辞書)
+    """
+    history = []
+    articles = {}
+    previous = {}
+    for record in reflection_history:
+        report = compact_report(record["technical_analysis_report"], digits)
+        delta = {
+            k: v for k, v in report.items() if k not in previous or previous[k] != v
+        }
+        previous = report
+
+        ids = []
+        for article in record["news_articles"]:
+            key = article_id(article)
+            articles.setdefault(key, article)
+            ids.append(key)
+
+        prediction = record["prediction"]
+        reasoning = prediction["reasoning"]
+        if (
+            reasoning_chars is not None
+            and isinstance(reasoning, str)
+            and len(reasoning) > reasoning_chars
+        ):
+            reasoning = reasoning[:reasoning_chars] + "…"
+        entry = {
+            "t": record["prediciton_time"],
+            "p": signal_keys.get(prediction["prediction"], prediction["prediction"]),
+            "c": prediction["confidence"],
+            "r": reasoning,
+            "ta": delta,
+            "n": ids,
+        }
+        actual = record["actual_result"]
+        if actual is not None:
+            entry["a"] = {
+                "chg": actual["price_change"],
+                "ok": int(actual["prediction_accuracy"]),
+            }
+        history.append(entry)
+
+    return history, articles
+
+
+def prompt_sections(
+    current_time,
+    technical_analysis_report,
+    news_articles,
+    reflection_history,
+    digits=3,
+    description_chars=None,
+    reasoning_chars=None,
+):
+    """
+    短縮形式のプロンプトをセクションごとに組み立てる関数
+
+    Args:
+        current_time: 予測時刻
+        technical_analysis_report: technical_analysisの出力
+        news_articles: ニュース記事のリスト
+        reflection_history: 過去の予測と実績のリスト
+        digits: 指標の有効数字
+        description_chars: 記事の説明文の最大文字数(Noneの場合は省略しない)
+        reasoning_chars: 予測履歴の理由の最大文字数(Noneの場合は省略しない)
+
+    Returns:
+        dict: セクション名(header/report/news/instructions/history/format)とその文字列
+            (順に連結したものがプロンプト)
+    """
+    history, history_articles = compact_history(
+        reflection_history, digits, reasoning_chars
+    )
+
+    articles = {}
+    current_ids = []
+    for article in news_articles:
+        key = article_id(article)
+        articles[key] = article
+        current_ids.append(key)
+    for key, article in history_articles.items():
+        articles.setdefault(key, article)
+
+    article_table = {
+        key: compact_article(article, description_chars)
+        for key, article in articles.items()
+    }
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    sections = {}
+    sections[
+        "header"
+    ] = f"""
+あなたはプロの仮想通貨トレーダーです。
+以下に示すテクニカル分析結果とニュース記事を基に、1時間後のビットコインの価格動向を論理的かつ具体的に予測してください。
+
+[現在時刻]
+{current_time.strftime("%a, %d %b %Y %H:%M:%S %z")}
+
+[凡例]
+{legend}
+
+"""
+    sections[
+        "report"
+    ] = f"""[ビットコインの時間足チャートに基づくテクニカル分析結果]
+{dumps(compact_report(technical_analysis_report, digits))}
+
+"""
+    sections[
+        "news"
+    ] = f"""[ニュース記事一覧(ID: t=タイトル, d=概要, p=公開日時)]
+{dumps(article_table)}
+
+[24時間以内のビットコイン関連ニュース記事のID]
+{dumps(current_ids)}
+
+"""
+    sections[
+        "instructions"
+    ] = """[注意点]
+テクニカル分析とニュース情報の両方を考慮して、総合的な判断を行ってください。
+特に、テクニカル分析とニュース情報から読み取れる市場感情が矛盾する場合は、その理由と、どちらの分析をより重視するかについても説明してください。
+"""
+
+    if len(history) > 0:
+        sections[
+            "history"
+        ] = f"""
+
+以下は過去のあなたの予測と実際の結果です。予測の誤りを反省し、より精度の高い予測を行ってください。
+(t=予測時刻, p=予測, c=信頼度, r=理由, ta=テクニカル分析結果のうち前のレコードから変化した項目, n=ニュース記事のID, a=実績(chg=価格変化率%, ok=的中))
+
+[過去の予測履歴と実績]
+{dumps(history)}
+"""
+
+    sections[
+        "format"
+    ] = """
+
+出力は、次のJSON形式に厳密に従って記述してください。
+{{
+    "prediction": "bullish/bearish/neutral",
+    "confidence": float between 0 and 100,
+    "reasoning": "string"
+}}
+"""
+
+    return sections
+
+
+def build_compact_prompt(
+    current_time,
+    technical_analysis_report,
+    news_articles,
+    reflection_history,
+    digits=3,
+    description_chars=None,
+    reasoning_chars=None,
+):
+    """
+    build_promptと同じ内容を短縮した形式でプロンプトを組み立てる関数
+
+    テクニカル分析結果は短縮キーと丸めた指標で、ニュース記事は記事一覧に1回だけ
+    IDとともに記載し、予測履歴はテクニカル分析結果の差分と記事IDで表す。
+    引数はprompt_sectionsと同じ。
+
+    Returns:
+        str: プロンプト
+    """
+    return "".join(
+        prompt_sections(
+            current_time,
+            technical_analysis_report,
+            news_articles,
+            reflection_history,
+            digits=digits,
+            description_chars=description_chars,
+            reasoning_chars=reasoning_chars,
+        ).values()
+    )
+
+
+def count_tokens(text, model=llm_model):
+    """
+    テキストのトークン数を数える関数
+
+    tiktokenがあればモデルのトークナイザで数え、なければ近似する
+    (ASCII文字は4文字で1トークン、それ以外は1文字1トークン)。
+    """
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text))
+
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def build_prompt_within_limit(
+    current_time,
+    technical_analysis_report,
+    news_articles,
+    reflection_history,
+    max_tokens=token_limit,
+    model=llm_model,
+    policy=budget_policy,
+    log=True,
+):
+    """
+    トークン数の上限に収まるよう短縮形式のプロンプトを組み立てる関数
+
+    上限を超える間は、policyの先頭から適用できる短縮を1段階ずつ適用する。
+    テクニカル分析結果は短縮しない。
+
+        reasoning: 予測履歴の理由を100文字、50文字に切り詰める
+        history: 古い予測履歴から削る
+        descriptions: 記事の説明文を200文字から半分ずつ(50文字まで)切り詰める
+        articles: 古いニュース記事から削る(1件は残す)
+
+    Args:
+        max_tokens: トークン数の上限
+        model: トークン数を数えるモデル名
+        policy: 短縮を適用する順序(価値の低いものから)
+        log: セクションごとのトークン数をログに出力する場合はTrue
+            (full_format_log_every回に1回は元の形式のトークン数も出力する)
+
+    Returns:
+        str: プロンプト
+    """
+    history = list(reflection_history)
+    articles = list(news_articles)
+    chars = {"reasoning": None, "descriptions": None}
+
+    def reduce(step):
+        """短縮を1段階適用する(適用できない場合はFalse)"""
+        if step == "history" and history:
+            history.pop(0)
+        elif step == "articles" and len(articles) > 1:
+            articles.pop()  # get_news_articlesは新しい順
+        elif step in chars:
+            current, start, stop = chars[step], *truncation_steps[step]
+            if current is not None and current // 2 < stop:
+                return False
+            chars[step] = start if current is None else current // 2
+        else:
+            return False
+        return True
+
+    while True:
+        sections = prompt_sections(
+            current_time,
+            technical_analysis_report,
+            articles,
+            history,
+            description_chars=chars["descriptions"],
+            reasoning_chars=chars["reasoning"],
+        )
+        prompt = "".join(sections.values())
+        tokens = count_tokens(prompt, model)
+        if tokens <= max_tokens:
+            break
+        if not any(reduce(step) for step in policy):
+            print_log(
+                f"プロンプトがトークン数の上限を超えています: {tokens} > {max_tokens}",
+                level="warning",
+                notify=False,
+            )
+            break
+
+    if log:
+        section_tokens = ", ".join(
+            f"{name}={count_tokens(text, model)}" for name, text in sections.items()
+        )
+        truncated = ", ".join(
+            f"{step}<={limit}文字" for step, limit in chars.items() if limit is not None
+        )
+        print_log(
+            f"プロンプトのトークン数: {tokens}/{max_tokens} ({section_tokens})"
+            f" 履歴{len(history)}/{len(reflection_history)}件,"
+            f" 記事{len(articles)}/{len(news_articles)}件"
+            + (f", {truncated}" if truncated else ""),
+            notify=False,
+        )
+        if next(_prompt_count) % full_format_log_every == 0:
+            log_full_format_tokens(
+                current_time,
+                technical_analysis_report,
+                news_articles,
+                reflection_history,
+                tokens,
+                model,
+            )
+
+    return prompt
+
+
+def log_full_format_tokens(
+    current_time,
+    technical_analysis_report,
+    news_articles,
+    reflection_history,
+    compact_tokens,
+    model=llm_model,
+):
+    """元の形式(build_prompt)のプロンプトのトークン数を短縮形式と比較してログに出力する関数"""
+    full_tokens = count_tokens(
+        build_prompt(
+            current_time,
+            technical_analysis_report,
+            news_articles,
+            reflection_history,
+        ),
+        model,
+    )
+    print_log(
+        f"元の形式のプロンプトのトークン数: {full_tokens} -> {compact_tokens}"
+        f" ({compact_tokens / full_tokens:.0%})",
+        notify=False,
+    )
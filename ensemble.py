@@ -0,0 +1,86 @@
+import os
+import pickle
+from datetime import timedelta
+
+from make_dataset import calc_features, get_data_for_days
+from tracer import traced
+
+model_dir = "models"
+
+feature_cols = [
+    "return",
+    "return_std_5",
+    "sharpe_5",
+]
+
+
+def load_models(model_dir=model_dir):
+    """
+    学習済みモデルを読み込む関数
+
+    Args:
+        model_dir: モデル(*.pkl)を格納したディレクトリ
+
+    Returns:
+        list: 読み込んだモデルのリスト
+    """
+    models = []
+    model_files = sorted(f for f in os.listdir(model_dir) if f.endswith(".pkl"))
+    for model_file in model_files:
+        with open(os.path.join(model_dir, model_file), "rb") as f:
+            models.append(pickle.load(f))
+
+    return models
+
+
+def make_features(current_time, symbol="BTC_JPY", days=3):
+    """
+    予測に使う直前の足の特徴量を作成する関数
+
+    Args:
+        current_time: 予測を行う時刻
+        symbol: 銘柄
+        days: 取得する日数
+
+    Returns:
+        pd.DataFrame: 直前の足の特徴量(1行)
+    """
+    if current_time.hour > 6:  # 日本時間朝6：00に新しい日付に切り替わる
+        end_date = current_time.strftime("%Y%m%d")
+    else:
+        end_date = (current_time - timedelta(days=1)).strftime("%Y%m%d")
+
+    X = get_data_for_days(
+        symbol=symbol,
+        interval="1hour",
+        end_date=end_date,
+        days=days,
+    )
+    X = calc_features(X, train=False)
+    X = X.loc[
+        X.index == (current_time - timedelta(hours=1)).strftime("%Y-%m-%d %H:00:00")
+    ].copy()
+
+    if X.empty:
+        raise ValueError("予測データが存在しません")
+
+    return X
+
+
+@traced("model_inference")
+def predict_proba(models, X):
+    """
+    アンサンブルの上昇確率を計算する関数
+
+    Args:
+        models: load_modelsで読み込んだモデルのリスト
+        X: 特徴量
+
+    Returns:
+        float: 各モデルの予測確率の平均
+    """
+    pred_proba = 0
+    for model in models:
+        pred_proba += model.predict_proba(X[feature_cols])[0][1]
+
+    return pred_proba / len(models)
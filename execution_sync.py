@@ -0,0 +1,105 @@
+import pandas as pd
+from pytz import timezone
+
+from trade import get_executions, get_latest_executions
+from utils import print_log
+
+
+def to_trade(close_row):
+    """
+    Ledger.unrecorded_closesの1行を台帳の取引(決済の約定1件)に変換する関数
+
+    Returns:
+        tuple: (trade_id, date, position, order_price, close_price, loss_gain)
+    """
+    (
+        execution_id,
+        close_side,
+        close_price,
+        loss_gain,
+        close_time,
+        open_side,
+        open_price,
+        open_time,
+    ) = close_row
+
+    # 新規約定の時刻(なければ決済の時刻)を日本時間の1時間単位で記録する
+    time_ = pd.Timestamp(open_time or close_time).astimezone(timezone("Asia/Tokyo"))
+    if open_side is not None:
+        position = -1 if open_side == "SELL" else 1
+    else:
+        position = 1 if close_side == "SELL" else -1
+
+    return (
+        execution_id,
+        time_.strftime("%Y-%m-%d %H:00:00"),
+        position,
+        None if open_price is None else int(open_price),
+        int(close_price),
+        int(loss_gain),
+    )
+
+
+class ExecutionSync:
+    """
+    GMOコインの約定履歴を台帳に同期するクラス
+
+    /v1/latestExecutionsを前回同期した約定ID(sync_stateに保存)まで1ページ100件で
+    遡って取得し、/v1/executionsで登録済みの注文の約定を10件ずつまとめて取得する
+    (latestExecutionsは直近1日分しか返さないため、停止期間が長い場合の補完に使う)。
+    約定は重複を除いて保存し、台帳に未記録の決済の約定から取引の損益を作り直す。
+    """
+
+    page_size = 100  # latestExecutionsの1ページの件数(APIの上限)
+    order_batch_size = 10  # executionsで1回に指定できる注文IDの数(APIの上限)
+
+    def __init__(self, ledger, symbol="BTC_JPY"):
+        self.ledger = ledger
+        self.symbol = symbol
+
+    def track_orders(self, order_ids):
+        """約定を取得する注文IDを登録する(order_process・exe_all_positionの戻り値)"""
+        self.ledger.track_orders(order_ids)
+
+    def fetch_latest(self, cursor):
+        """cursorより新しい約定をlatestExecutionsから取得する"""
+        executions = []
+        page = 1
+        while True:
+            rows = get_latest_executions(self.symbol, page=page, count=self.page_size)
+            new = [row for row in rows if int(row["executionId"]) > cursor]
+            executions += new
+            if len(new) < len(rows) or len(rows) < self.page_size:
+                return executions
+            page += 1
+
+    def fetch_orders(self, order_ids):
+        """注文IDを指定して約定を取得する"""
+        executions = []
+        for i in range(0, len(order_ids), self.order_batch_size):
+            executions += get_executions(order_ids[i : i + self.order_batch_size])
+        return executions
+
+    def sync(self):
+        """
+        約定を取得して台帳に保存し、新しい取引を記録する
+
+        Returns:
+            list: 新たに記録した取引のリスト
+        """
+        cursor = int(self.ledger.get_state("latest_execution_id", 0))
+        executions = self.fetch_latest(cursor)
+        executions += self.fetch_orders(self.ledger.unsynced_orders())
+
+        added = self.ledger.record_executions(executions)
+        if executions:
+            latest = max(int(e["executionId"]) for e in executions)
+            self.ledger.set_state("latest_execution_id", max(cursor, latest))
+
+        trades = [to_trade(row) for row in self.ledger.unrecorded_closes()]
+        self.ledger.record_trades(trades)
+
+        print_log(
+            f"約定履歴を同期しました: 約定{added}件, 取引{len(trades)}件", notify=False
+        )
+        return trades
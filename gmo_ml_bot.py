@@ -1,39 +1,55 @@
-import os
-import pickle
-import sqlite3
 import time
 from datetime import datetime, timedelta
 
-from make_dataset import calc_features, get_data_for_days
+from checkpoint import CheckpointStore, cycle_id, reconcile_positions
+from ensemble import make_features, predict_proba
+from execution_sync import ExecutionSync
+from ledger import Ledger
+from metrics import metrics
+from model_registry import ModelRegistry
+from tracer import tracer
 from trade import (
     exe_all_position,
     get_available_amount,
+    get_position,
     get_price,
-    get_trading_result,
     order_process,
 )
 from utils import print_log
 
 symbol = "BTC_JPY"
 trade_num = 0  # 取引回数
-dbname = "sql/trading.db"  # 取引結果を格納するテーブル
+dbname = "sql/trading.db"  # 取引結果を格納する台帳
 exe_type = "MARKET"  # 注文方式(成行)
-
-feature_cols = [
-    "return",
-    "return_std_5",
-    "sharpe_5",
-]
+metrics_port = 9108  # メトリクス(http://127.0.0.1:9108/metrics)のポート
+checkpoint_path = "checkpoints/gmo_ml_bot.json"  # 実行状態の保存先
+position_side = None  # 保有中のポジション(BUY/SELL/None)
+
+# サイクルごとの処理時間の記録(sql/trace.dbに30日分、traces/*.jsonに直近1週間分)
+tracer.configure(
+    enabled=True,
+    sample_rate=1.0,
+    db_path="sql/trace.db",
+    trace_dir="traces",
+    retention_days=30,
+    max_trace_files=24 * 7,
+)
+tracer.add_listener(metrics.on_span)  # 処理ごとの所要時間・回数・エラーを集計
+try:
+    metrics.serve(port=metrics_port)
+except OSError as e:  # ポートが使用中の場合などはメトリクスを公開せずに続行する
+    print_log(
+        f"メトリクスのサーバを起動できませんでした: {e}", level="warning", notify=False
+    )
 
 # -----------------------------Bot本体の処理-----------------------------#
 print_log("gmo_ml_botの稼働を開始します", notify=True)
 
-models = []
 try:
-    model_files = [f for f in os.listdir("models") if f.endswith(".pkl")]
-    for model_file in model_files:
-        with open(os.path.join("models", model_file), "rb") as f:
-            models.append(pickle.load(f))
+    model_registry = ModelRegistry(
+        "models"
+    )  # 更新されたモデルをサイクルの間に差し替える
+    model_registry.start()
 except Exception as e:
     print_log(
         f"モデルの読み込み中にエラーが発生しました: {e}", level="error", notify=True
@@ -41,41 +57,70 @@ except Exception as e:
     raise
 
 try:
-    conn = sqlite3.connect(dbname)
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS trading (
-            trade_id INTEGER,
-            date STRING,
-            position INTEGER,
-            order_price INTEGER,
-            close_price INTEGER,
-            loss_gain INTEGER
-        )
-        """
-    )
+    ledger = Ledger(dbname)
+    execution_sync = ExecutionSync(ledger, symbol=symbol)  # 約定履歴から取引を記録する
 except Exception as e:
     print_log(
         f"データベースの接続中にエラーが発生しました: {e}", level="error", notify=True
     )
     raise
 
-try:
-    default_available = int(get_available_amount())  # デフォルトの残高
-    previous_available = default_available
-except Exception as e:
-    print_log(f"残高の取得中にエラーが発生しました: {e}", level="error", notify=True)
-    raise
 
+def save_checkpoint():
+    """現在のサイクルまでの実行状態を保存する"""
+    checkpoint_store.save(
+        {
+            "cycle": cycle_id(current_time),
+            "trade_num": trade_num,
+            "default_available": default_available,
+            "position_side": position_side,
+        }
+    )
+
+
+# 前回の実行状態があれば引き継ぐ(損益率の基準となる残高を保つ)
+checkpoint_store = CheckpointStore(checkpoint_path)
+checkpoint = checkpoint_store.load()
 current_time = datetime.now()
 hour = current_time.hour
 
+if checkpoint is not None:
+    default_available = checkpoint["default_available"]
+    position_side = checkpoint["position_side"]
+    try:
+        trade_num = reconcile_positions(checkpoint, get_position())
+    except Exception as e:
+        trade_num = checkpoint["trade_num"]
+        print_log(
+            f"建玉の取得中にエラーが発生しました: {e}", level="warning", notify=True
+        )
+    if checkpoint["cycle"] != cycle_id(current_time):
+        hour = None  # この時間のサイクルが未完了のため、すぐに実行する
+    print_log(
+        f"前回の実行状態から再開します: サイクル={checkpoint['cycle']}, 取引回数={trade_num}, 基準残高={default_available}円",
+        notify=True,
+    )
+else:
+    try:
+        default_available = int(get_available_amount())  # デフォルトの残高
+    except Exception as e:
+        print_log(
+            f"残高の取得中にエラーが発生しました: {e}", level="error", notify=True
+        )
+        raise
+
 while True:
     try:
         current_time = datetime.now()
         if hour != current_time.hour:  # 1時間経過したら取引を行う
+            tracer.start_cycle()
+            metrics.inc("bot_cycles_total")
+            metrics.set(
+                "bot_cycle_lateness_seconds",
+                current_time.minute * 60
+                + current_time.second
+                + current_time.microsecond / 1e6,
+            )
             print_log("****************", notify=False)
             try:
                 price = get_price()
@@ -91,7 +136,9 @@ while True:
 
             # --------ポジションを決済する--------#
             try:
-                exe_all_position()
+                execution_sync.track_orders(exe_all_position())
+                position_side = None
+                metrics.set("bot_position", 0)
             except Exception as e:
                 print_log(
                     f"ポジションの決済中にエラーが発生しました: {e}",
@@ -103,45 +150,45 @@ while True:
 
             time.sleep(1)
 
-            if trade_num > 0:
-                # try:
-                #     (
-                #         tmp_id,
-                #         tmp_date,
-                #         tmp_position,
-                #         tmp_order_price,
-                #         tmp_close_price,
-                #         tmp_loss_gain,
-                #     ) = get_trading_result()  # 取引結果
+            # 前回の同期以降の約定を取得し、取引結果をデータベースに格納
+            try:
+                for trade in execution_sync.sync():
+                    print_log(
+                        f"取引結果をデータベースに格納しました: id={trade[0]}, date={trade[1]}, position={trade[2]}, order_price={trade[3]}, close_price={trade[4]}, loss_gain={trade[5]}",
+                        notify=False,
+                    )
+            except Exception as e:
+                print_log(
+                    f"取引結果の格納中にエラーが発生しました: {e}",
+                    level="error",
+                    notify=True,
+                )
 
-                #     # データベースに格納
-                #     cur.execute(
-                #         "INSERT INTO trading values(?, ?, ?, ?, ?, ?)",
-                #         (
-                #             tmp_id,
-                #             tmp_date,
-                #             tmp_position,
-                #             tmp_order_price,
-                #             tmp_close_price,
-                #             tmp_loss_gain,
-                #         ),
-                #     )
-                #     conn.commit()
-                #     print_log(
-                #         f"取引結果をデータベースに格納しました: id={tmp_id}, date={tmp_date}, position={tmp_position}, order_price={tmp_order_price}, close_price={tmp_close_price}, loss_gain={tmp_loss_gain}",
-                #         notify=False,
-                #     )
-                # except Exception as e:
-                #     print_log(
-                #         f"取引結果の格納中にエラーが発生しました: {e}",
-                #         level="error",
-                #         notify=True,
-                #     )
+            # --------日次で損益をレポーティング--------#
+            if current_time.hour == 0:
+                try:
+                    day = (current_time - timedelta(days=1)).strftime("%Y-%m-%d")
+                    summary = ledger.daily_summary(day)
+                    cumulative_profit = ledger.cumulative_profit()
 
+                    print_log(
+                        f"{day}\n損益: {summary['loss_gain']}円\n勝率: {summary['win_rate'] * 100:.1f}%({summary['wins']}/{summary['trades']})\n累積損益: {cumulative_profit}円",
+                        notify=True,
+                    )
+                except Exception as e:
+                    print_log(
+                        f"日次損益の計算中にエラーが発生しました: {e}",
+                        level="error",
+                        notify=True,
+                    )
+
+            if trade_num > 0:
                 try:
                     available = int(get_available_amount())
                     profit = available - default_available
                     profit_rate = profit / default_available
+                    metrics.set("bot_available_margin_yen", available)
+                    metrics.set("bot_profit_rate", profit_rate)
                     # print_log(
                     #     f"決済損益は{tmp_loss_gain}で、現在の残高は{available}円です",
                     #     notify=False,
@@ -153,14 +200,6 @@ while True:
                         notify=True,
                     )
 
-                if current_time.hour == 0:
-                    daily_profit = available - previous_available
-                    print_log(
-                        f"{(current_time - timedelta(days=1)).strftime('%Y-%m-%d')}\n損益: {daily_profit}円\n残高: {available}円",
-                        notify=True,
-                    )
-                    previous_available = available
-
                 if profit_rate < -0.2:
                     print_log(
                         f"利益率が -20% を下回りました: {profit_rate}", notify=True
@@ -169,34 +208,15 @@ while True:
 
             # --------ポジションを決めるための予測を行う--------#
             try:
-                if current_time.hour > 6:  # 日本時間朝6：00に新しい日付に切り替わる
-                    end_date = current_time.strftime("%Y%m%d")
-                else:
-                    end_date = (current_time - timedelta(days=1)).strftime("%Y%m%d")
-
-                X = get_data_for_days(
-                    symbol=symbol,
-                    interval="1hour",
-                    end_date=end_date,
-                    days=3,
-                )
-                X = calc_features(X, train=False)
-                X = X.loc[
-                    X.index
-                    == (current_time - timedelta(hours=1)).strftime("%Y-%m-%d %H:00:00")
-                ].copy()
-
-                if X.empty:
-                    raise ValueError("予測データが存在しません")
+                models = model_registry.current()
+                X = make_features(current_time, symbol=symbol, days=3)
+                model_registry.smoke_row = X
 
                 print_log(f"\n{X.squeeze()}", notify=False)
 
-                pred_proba = 0
-                for model in models:
-                    pred_proba += model.predict_proba(X[feature_cols])[0][1]
-
-                pred_proba /= len(models)
+                pred_proba = predict_proba(models, X)
                 print_log(pred_proba, notify=False)
+                metrics.set("bot_prediction_probability", pred_proba)
 
                 if pred_proba >= 0.5:
                     side = "BUY"
@@ -215,53 +235,23 @@ while True:
 
             # --------注文を出す--------#
             try:
-                order_process(
+                order_id = order_process(
                     symbol=symbol, side=side, executionType=exe_type, size=0.01
                 )
+                execution_sync.track_orders([order_id])
+                metrics.set("bot_position", 1 if side == "BUY" else -1)
+                position_side = side
                 trade_num += 1
+                save_checkpoint()
             except Exception as e:
                 print_log(
                     f"注文中にエラーが発生しました: {e}", level="error", notify=True
                 )
                 continue
 
-            # # --------日次で損益をレポーティング--------#
-            # if current_time.hour == 0:
-            #     try:
-            #         cur.execute(
-            #             "SELECT SUM(loss_gain) FROM trading WHERE DATE(date) = DATE('now', 'localtime', '-1 day')"
-            #         )
-            #         daily_profit = cur.fetchone()[0] or 0
-
-            #         cur.execute(
-            #             "SELECT COUNT(*) FROM trading WHERE DATE(date) = DATE('now', 'localtime', '-1 day')"
-            #         )
-            #         daily_trades = cur.fetchone()[0]
-
-            #         cur.execute(
-            #             "SELECT COUNT(*) FROM trading WHERE DATE(date) = DATE('now', 'localtime', '-1 day') AND loss_gain > 0"
-            #         )
-            #         daily_wins = cur.fetchone()[0]
-
-            #         daily_win_rate = (
-            #             daily_wins / daily_trades if daily_trades > 0 else 0
-            #         )
-
-            #         cur.execute("SELECT SUM(loss_gain) FROM trading")
-            #         cumulative_profit = cur.fetchone()[0] or 0
-
-            #         print_log(
-            #             f"{(current_time - timedelta(days=1)).strftime('%Y-%m-%d')}\n損益: {daily_profit}円\n勝率: {daily_win_rate * 100:.1f}%({daily_wins}/{daily_trades})\n累積損益: {cumulative_profit}円",
-            #             notify=True,
-            #         )
-            #     except Exception as e:
-            #         print_log(
-            #             f"日次損益の計算中にエラーが発生しました: {e}",
-            #             level="error",
-            #             notify=True,
-            #         )
-
         else:
+            tracer.end_cycle()
+            save_checkpoint()
             remaining_minutes = 60 - current_time.minute
             sleep_time = 60 * remaining_minutes
             print_log(f"{remaining_minutes}分スリープします", notify=False)
@@ -270,6 +260,9 @@ while True:
         print_log(f"想定外のエラーが発生しました: {e}", level="error", notify=True)
         break
 
-conn.close()
+tracer.end_cycle()
+tracer.flush()
+metrics.shutdown()
+ledger.close()
 
 print_log("gmo_ml_botの稼働を終了します", notify=True)
@@ -1,16 +1,41 @@
 import configparser
-import json
 import os
-import re
+import threading
 import time
 from datetime import datetime, timedelta
+from functools import partial
 
+import pandas as pd
 from openai import OpenAI
 
+from checkpoint import CheckpointStore, cycle_id, reconcile_positions
+from compact_prompt import build_prompt_within_limit
+from ensemble import load_models
+from input_gatherer import InputGatherer
+from llm_cache import LLMCache
+from llm_predictor import (
+    StreamingPrediction,
+    cycle_start,
+    evaluate_prediction,
+    llm_model,
+    make_record,
+    parse_prediction,
+    request_prediction,
+    request_prediction_stream,
+)
 from make_dataset import get_data_for_days
-from news_analyzer import get_news_articles
-from technical_analyzer import technical_analysis
-from trade import exe_all_position, get_available_amount, get_price, order_process
+from news_analyzer import save_news_snapshot
+from news_poller import NewsPoller
+from prediction_coordinator import PredictionCoordinator
+from reflection_store import ReflectionStore
+from streaming_indicators import StreamingTechnicalAnalyzer
+from trade import (
+    exe_all_position,
+    get_available_amount,
+    get_position,
+    get_price,
+    order_process,
+)
 from utils import print_log
 
 conf = configparser.ConfigParser()
@@ -22,75 +47,205 @@ symbol = "BTC_JPY"
 exe_type = "MARKET"  # 注文方式(成行)
 
 reflection_history_window = 6  # リフレクションに使用する予測履歴のサイズ
+reflection_store = ReflectionStore(  # 予測履歴(再起動後も直近の履歴から再開する)
+    "sql/reflection_history.db", window=reflection_history_window
+)
+prompt_token_limit = 4000  # プロンプトのトークン数の上限
+# 応答をストリーミングで受け取り、予測と信頼度が揃った時点で判断する
+llm_streaming = True
+llm_cache_bypass = False  # Trueの場合はキャッシュを使わず常にLLMを呼び出す
+llm_cache = LLMCache(  # LLM応答のキャッシュ(リプレイの応答ストアも兼ねる)
+    "sql/llm_cache.db", max_entries=10000, bypass=llm_cache_bypass
+)
+news_feeds = ["https://jp.cointelegraph.com/rss/tag/bitcoin"]  # ニュースのRSSフィード
+news_poll_interval = 300  # ニュースの索引を更新する間隔(秒)
+news_poller = NewsPoller(news_feeds, path="sql/news_index.db")
+news_snapshot_path = "news_snapshots.jsonl"  # リプレイ用のニュース記録
+technical_days = 10  # テクニカル分析に使う日数
+# 新しい足だけを追加して更新するテクニカル分析(初回と足が欠けた場合は作り直す)
+technical_analyzer = None
+technical_lock = threading.Lock()
+# 入力の取得元ごとのタイムアウト(秒)
+input_timeouts = {"price": 10, "technicals": 120, "available": 10, "news": 10}
+input_gatherer = InputGatherer()  # 予測の入力をポジションの決済と並行して取得する
+prediction_deadline = 120  # サイクル開始から予測を決定するまでの秒数
+ensemble_weight = 0.0  # LLMが間に合った場合にアンサンブルの予測を混ぜる重み(0から1)
+checkpoint_path = "checkpoints/gmo_ml_bot_with_llm.json"  # 実行状態の保存先
+position_side = None  # 保有中のポジション(BUY/SELL/None)
 
 # -----------------------------Bot本体の処理-----------------------------#
 print_log("gmo_ml_botの稼働を開始します", notify=True)
+news_poller.start(interval=news_poll_interval)
 try:
-    default_available = int(get_available_amount())  # デフォルトの残高
-    previous_available = default_available
+    models = load_models("models")  # LLMが締め切りに間に合わない場合のアンサンブル
 except Exception as e:
-    print_log(f"残高の取得中にエラーが発生しました: {e}", level="error", notify=True)
-    raise
+    print_log(
+        f"アンサンブルのモデルを読み込めませんでした: {e}",
+        level="warning",
+        notify=True,
+    )
+    models = []
+prediction_coordinator = PredictionCoordinator(
+    models, deadline=prediction_deadline, ensemble_weight=ensemble_weight, symbol=symbol
+)
+
+
+def save_checkpoint():
+    """現在のサイクルまでの実行状態を保存する(予測履歴はreflection_storeに保存済み)"""
+    checkpoint_store.save(
+        {
+            "cycle": cycle_id(current_time),
+            "trade_num": trade_num,
+            "default_available": default_available,
+            "previous_available": previous_available,
+            "position_side": position_side,
+        }
+    )
+
 
+# 前回の実行状態があれば引き継ぐ(損益率の基準となる残高を保つ)
+checkpoint_store = CheckpointStore(checkpoint_path)
+checkpoint = checkpoint_store.load()
 trade_num = 0  # 取引回数
 current_time = datetime.now()
 hour = current_time.hour
-reflection_history = []
-previous_price = None
+
+if checkpoint is not None:
+    default_available = checkpoint["default_available"]
+    previous_available = checkpoint["previous_available"]
+    position_side = checkpoint["position_side"]
+    try:
+        trade_num = reconcile_positions(checkpoint, get_position())
+    except Exception as e:
+        trade_num = checkpoint["trade_num"]
+        print_log(
+            f"建玉の取得中にエラーが発生しました: {e}", level="warning", notify=True
+        )
+    if checkpoint["cycle"] != cycle_id(current_time):
+        hour = None  # この時間のサイクルが未完了のため、すぐに実行する
+    print_log(
+        f"前回の実行状態から再開します: サイクル={checkpoint['cycle']}, 取引回数={trade_num}, 基準残高={default_available}円",
+        notify=True,
+    )
+else:
+    try:
+        default_available = int(get_available_amount())  # デフォルトの残高
+        previous_available = default_available
+    except Exception as e:
+        print_log(
+            f"残高の取得中にエラーが発生しました: {e}", level="error", notify=True
+        )
+        raise
+
+# すぐにサイクルを実行する場合は、前の時間の予測を今回のサイクルで評価する
+previous_price = reflection_store.resume(
+    current_time if hour is not None else current_time - timedelta(hours=1)
+)
+print_log(
+    f"保存済みの予測履歴を{len(reflection_store.history())}件読み込みました",
+    notify=False,
+)
 
 
 def predict_with_llm(
     current_time, technical_analysis_report, news_articles, reflection_history
 ):
-    prompt = f"""
-あなたはプロの仮想通貨トレーダーです。
-以下に示すテクニカル分析結果とニュース記事を基に、1時間後のビットコインの価格動向を論理的かつ具体的に予測してください。
-
-[現在時刻]
-{current_time.strftime("%a, %d %b %Y %H:%M:%S %z")}
-
-[ビットコインの時間足チャートに基づくテクニカル分析結果]
-{json.dumps(technical_analysis_report, ensure_ascii=False)}
-
-[24時間以内のビットコイン関連ニュース記事]
-{json.dumps(news_articles, ensure_ascii=False, indent=2)}
-
-[注意点]
-テクニカル分析とニュース情報の両方を考慮して、総合的な判断を行ってください。
-特に、テクニカル分析とニュース情報から読み取れる市場感情が矛盾する場合は、その理由と、どちらの分析をより重視するかについても説明してください。
-"""
-
-    # 予測履歴がある場合は追加
-    if len(reflection_history) > 0:
-        prompt += f"""
+    """
+    LLMに予測を問い合わせる関数
+
+    プロンプトの時刻は正時に切り捨てるため、同じ時間内の再試行・再起動では
+    キャッシュ済みの応答を使用する。
+
+    Returns:
+        StreamingPrediction: 応答(キャッシュにある場合は受信済みの応答)
+    """
+    prompt = build_prompt_within_limit(
+        cycle_start(current_time),
+        technical_analysis_report,
+        news_articles,
+        reflection_history,
+        max_tokens=prompt_token_limit,
+    )
 
-以下は過去のあなたの予測と実際の結果です。予測の誤りを反省し、より精度の高い予測を行ってください。
+    cached = llm_cache.lookup(prompt, model=llm_model)
+    if cached is not None:
+        print_log(
+            f"キャッシュ済みのLLM応答を使用します: {llm_cache.stats()}", notify=False
+        )
+        return StreamingPrediction([cached["content"]])
+
+    if llm_streaming:
+        stream = request_prediction_stream(client, prompt, model=llm_model)
+    else:
+        stream = StreamingPrediction(
+            [request_prediction(client, prompt, model=llm_model)]
+        )
+
+    # 再試行・再起動時とリプレイ用に応答を記録
+    stream.add_done_callback(
+        lambda s: llm_cache.put(prompt, s.content, model=llm_model)
+    )
 
-[過去の予測履歴と実績]
-{json.dumps(reflection_history, ensure_ascii=False)}
-"""
+    return stream
 
-    prompt += """
 
-出力は、次のJSON形式に厳密に従って記述してください。
-{{
-    "prediction": "bullish/bearish/neutral",
-    "confidence": float between 0 and 100,
-    "reasoning": "string"
-}}
-"""
+def get_technical_analysis(end_date, target_time):
+    """
+    ローソク足を取得し、予測時刻までのテクニカル分析結果を返す関数
 
-    print_log(f"prompt: {prompt}", notify=False)
+    分析の対象はget_data_for_days(end_date, days=technical_days)の範囲(technical_analysisと
+    同じ結果)。2回目以降はend_dateの1日分だけを取得し、前回の続きの足を分析器に追加して
+    窓の開始時刻より前の足を外す。前回の足から続かない場合は全期間を取得し直す。
+    """
+    global technical_analyzer
 
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        temperature=0,
-        messages=[
-            {"role": "user", "content": prompt},
-        ],
+    target = pd.Timestamp(target_time, tz="Asia/Tokyo")
+    start = (
+        pd.Timestamp(end_date, tz="Asia/Tokyo")
+        - timedelta(days=technical_days - 1)
+        + timedelta(hours=6)
     )
 
-    return response
+    with technical_lock:
+        if technical_analyzer is not None:
+            X = get_data_for_days(
+                symbol=symbol, interval="1hour", end_date=end_date, days=1
+            )
+            last_time = technical_analyzer.last_time
+            new_bars = X.loc[(X.index > last_time) & (X.index <= target)]
+            if last_time == target or (
+                len(new_bars) > 0
+                and new_bars.index[0] == last_time + timedelta(hours=1)
+                and new_bars.index[-1] == target
+            ):
+                for _, bar in new_bars.iterrows():
+                    technical_analyzer.update(bar)
+            else:
+                technical_analyzer = None
+
+        if technical_analyzer is None:
+            X = get_data_for_days(
+                symbol=symbol,
+                interval="1hour",
+                end_date=end_date,
+                days=technical_days,
+            )
+
+            if target_time not in X.index:
+                raise ValueError("予測データが存在しません")
+
+            technical_analyzer = StreamingTechnicalAnalyzer(X.loc[:target_time])
+
+        technical_analyzer.drop_before(start)
+        return technical_analyzer.report()
+
+
+def record_reasoning(record, stream):
+    """応答の完了後に予測レコードへ予測の理由を書き込む関数"""
+    _, _, reasoning = parse_prediction(stream.content)
+    record["prediction"]["reasoning"] = reasoning
+    reflection_store.update(record)
+    print_log(f"理由: {reasoning}", notify=False)
 
 
 while True:
@@ -98,8 +253,35 @@ while True:
         current_time = datetime.now()
         if hour != current_time.hour:  # 1時間経過したら取引を行う
             print_log("****************", notify=False)
+            # プロンプト・予測レコード・ニュースの記録には正時の時刻を使う(リプレイと一致させる)
+            cycle_time = cycle_start(current_time)
+
+            # --------予測の入力の取得を開始する--------#
+            if current_time.hour > 6:  # 日本時間朝6：00に新しい日付に切り替わる
+                end_date = current_time.strftime("%Y%m%d")
+            else:
+                end_date = (current_time - timedelta(days=1)).strftime("%Y%m%d")
+            target_time = (current_time - timedelta(hours=1)).strftime(
+                "%Y-%m-%d %H:00:00"
+            )
+
+            input_gatherer.start()
+            prediction_coordinator.start(current_time)
+            input_gatherer.submit("price", input_timeouts["price"], get_price)
+            input_gatherer.submit(
+                "technicals",
+                input_timeouts["technicals"],
+                get_technical_analysis,
+                end_date,
+                target_time,
+            )
+            # ニュースはバックグラウンドで更新している索引から取得する
+            input_gatherer.submit(
+                "news", input_timeouts["news"], news_poller.get_news_articles
+            )
+
             try:
-                price = float(get_price())
+                price = float(input_gatherer.result("price"))
                 print_log(f"現在の{symbol}価格は{price}円です", notify=False)
             except Exception as e:  # メンテナンス時はスキップ
                 print_log(
@@ -107,15 +289,16 @@ while True:
                     level="warning",
                     notify=True,
                 )
+                input_gatherer.cancel()
+                prediction_coordinator.cancel()
                 # 価格取得エラー時は前回の予測レコードを削除
-                if len(reflection_history) > 0:
-                    last_record = reflection_history[-1]
-                    if last_record["actual_result"] is None:
-                        print_log(
-                            "価格取得エラーのため、前回の予測レコードを削除します",
-                            notify=False,
-                        )
-                        reflection_history.pop()  # 最後のレコードを削除
+                last_record = reflection_store.last()
+                if last_record is not None and last_record["actual_result"] is None:
+                    print_log(
+                        "価格取得エラーのため、前回の予測レコードを削除します",
+                        notify=False,
+                    )
+                    reflection_store.discard_last()  # 最後のレコードを削除
 
                 hour = current_time.hour
                 continue
@@ -123,20 +306,28 @@ while True:
             # --------ポジションを決済する--------#
             try:
                 exe_all_position()
+                position_side = None
             except Exception as e:
                 print_log(
                     f"ポジションの決済中にエラーが発生しました: {e}",
                     level="error",
                     notify=True,
                 )
+                # このサイクルでは予測しないため、開始した入力の取得と予測を中止する
+                input_gatherer.cancel()
+                prediction_coordinator.cancel()
                 hour = current_time.hour
                 continue
 
             time.sleep(1)
 
             if trade_num > 0:
+                # 決済後の残高を取得する
+                input_gatherer.submit(
+                    "available", input_timeouts["available"], get_available_amount
+                )
                 try:
-                    available = int(get_available_amount())
+                    available = int(input_gatherer.result("available"))
                     profit = available - default_available
                     profit_rate = profit / default_available
                 except Exception as e:
@@ -162,134 +353,58 @@ while True:
 
             # --------ポジションを決めるための予測を行う--------#
             try:
-                if current_time.hour > 6:  # 日本時間朝6：00に新しい日付に切り替わる
-                    end_date = current_time.strftime("%Y%m%d")
-                else:
-                    end_date = (current_time - timedelta(days=1)).strftime("%Y%m%d")
-
-                X = get_data_for_days(
-                    symbol=symbol,
-                    interval="1hour",
-                    end_date=end_date,
-                    days=10,
-                )
-
-                target_time = (current_time - timedelta(hours=1)).strftime(
-                    "%Y-%m-%d %H:00:00"
-                )
-                if target_time not in X.index:
-                    raise ValueError("予測データが存在しません")
+                technical_analysis_report = input_gatherer.result("technicals")
+                news_articles = input_gatherer.result("news", default=[])
+                input_gatherer.report()
 
-                X = X.loc[:target_time]
-
-                technical_analysis_report = technical_analysis(X)
-
-                news_articles = get_news_articles()
+                save_news_snapshot(cycle_time, news_articles, news_snapshot_path)
 
                 # 前回の予測レコードの実績を更新
-                if len(reflection_history) > 0 and previous_price is not None:
-                    last_record = reflection_history[-1]
+                last_record = reflection_store.last()
+                if last_record is not None and previous_price is not None:
                     if last_record["actual_result"] is None:
-                        price_change = ((price - previous_price) / previous_price) * 100
-                        direction = (
-                            "up"
-                            if price_change > 0
-                            else "down" if price_change < 0 else "flat"
+                        last_record["actual_result"] = evaluate_prediction(
+                            last_record["prediction"]["prediction"],
+                            price,
+                            previous_price,
                         )
+                        reflection_store.update(last_record)
 
-                        last_prediction = last_record["prediction"]["prediction"]
-                        if last_prediction == "bullish" and direction == "up":
-                            accuracy = True
-                        elif last_prediction == "bearish" and direction == "down":
-                            accuracy = True
-                        elif last_prediction == "neutral" and abs(price_change) < 1:
-                            accuracy = True
-                        else:
-                            accuracy = False
-
-                        last_record["actual_result"] = {
-                            "price_change": round(price_change, 2),
-                            "price_change_direction": direction,
-                            "prediction_accuracy": accuracy,
-                        }
-
-                response = predict_with_llm(
-                    current_time,
+                stream = predict_with_llm(
+                    cycle_time,
                     technical_analysis_report,
                     news_articles,
-                    reflection_history,
+                    reflection_store.history(),
                 )
-                response_content = response.choices[0].message.content
-
-                try:
-                    # まずJSONパースを試みる
-                    response_json = json.loads(response_content)
-                    prediction = response_json["prediction"]
-                    confidence = response_json["confidence"]
-                    reasoning = response_json["reasoning"]
-                except json.JSONDecodeError:
-                    print_log(
-                        f"JSONパースエラーが発生しました。正規表現で抽出を試みます。\nLLMの出力: {response_content}",
-                        level="warning",
-                        notify=False,
-                    )
-
-                    # デフォルト値を設定
-                    prediction = "neutral"
-                    confidence = 50
-                    reasoning = "抽出失敗"
-
-                    # 正規表現で抽出
-                    # prediction抽出 (bullish/bearish/neutral)
-                    prediction_match = re.search(
-                        r'"prediction"[^\w]*:?[^\w]*"(bullish|bearish|neutral)"',
-                        response_content,
-                        re.IGNORECASE,
-                    )
-                    if prediction_match:
-                        prediction = prediction_match.group(1).lower()
-
-                    # confidence抽出 (0-100の数値)
-                    confidence_match = re.search(
-                        r'"confidence"[^\w]*:?[^\w]*(\d+(?:\.\d+)?)', response_content
-                    )
-                    if confidence_match:
-                        try:
-                            confidence = float(confidence_match.group(1))
-                        except ValueError:
-                            pass
-
-                    # reasoning抽出 (引用符で囲まれた文字列)
-                    reasoning_match = re.search(
-                        r'"reasoning"[^\w]*:?[^\w]*"([^"]*)"', response_content
-                    )
-                    if reasoning_match:
-                        reasoning = reasoning_match.group(1)
+                decision = prediction_coordinator.decide(stream)
+                prediction = decision["prediction"]
+                confidence = decision["confidence"]
 
                 print_log(
-                    f"予測結果: {prediction}\n信頼度: {confidence}\n理由: {reasoning}",
+                    f"予測結果: {prediction}\n信頼度: {confidence}"
+                    f"\n予測元: {decision['source']}"
+                    f" (アンサンブルの上昇確率: {decision['ensemble_proba']})",
                     notify=False,
                 )
 
-                # 今回の予測を履歴に保存
-                current_record = {
-                    "prediciton_time": current_time.strftime(
-                        "%a, %d %b %Y %H:%M:%S %z"
-                    ),
-                    "technical_analysis_report": technical_analysis_report,
-                    "news_articles": news_articles,
-                    "prediction": {
-                        "prediction": prediction,
-                        "confidence": confidence,
-                        "reasoning": reasoning,
-                    },
-                    "actual_result": None,  # 次回の予測時に更新
-                }
-                reflection_history.append(current_record)
-
-                # 履歴のサイズを制限
-                if len(reflection_history) > reflection_history_window:
-                    reflection_history = reflection_history[-reflection_history_window:]
+                # 今回の予測を履歴に保存(LLMの理由は応答の完了後に書き込む)
+                current_record = make_record(
+                    cycle_time,
+                    technical_analysis_report,
+                    news_articles,
+                    prediction,
+                    confidence,
+                    None,
+                )
+                if decision["source"] == "ensemble":
+                    current_record["prediction"]["reasoning"] = (
+                        "LLMの予測が締め切りに間に合わなかったため、"
+                        f"アンサンブルの上昇確率{decision['ensemble_proba']:.3f}で判断"
+                    )
+                # メモリに保持する履歴は直近reflection_history_window件に制限される
+                reflection_store.append(current_time, price, current_record)
+                if decision["source"] != "ensemble":
+                    stream.add_done_callback(partial(record_reasoning, current_record))
 
                 previous_price = price
 
@@ -316,7 +431,9 @@ while True:
                 order_process(
                     symbol=symbol, side=side, executionType=exe_type, size=0.01
                 )
+                position_side = side
                 trade_num += 1
+                save_checkpoint()
             except Exception as e:
                 print_log(
                     f"注文中にエラーが発生しました: {e}", level="error", notify=True
@@ -324,6 +441,7 @@ while True:
                 continue
 
         else:
+            save_checkpoint()
             remaining_minutes = 60 - current_time.minute
             sleep_time = 60 * remaining_minutes
             print_log(f"{remaining_minutes}分スリープします", notify=False)
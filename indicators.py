@@ -0,0 +1,178 @@
+import numpy as np
+
+import kernels
+
+
+def ewm_alpha(span):
+    """Smoothing factor used by pandas for ewm(span=span)"""
+    com = (span - 1) / 2.0
+    return 1.0 / (1.0 + com)
+
+
+def ewm_mean(values, span, adjust=True):
+    """
+    Exponentially weighted mean of a 1-D array
+
+    Follows the recursion of pandas' ewm(span=span, adjust=adjust).mean()
+    operation for operation, so the result matches pandas bit for bit,
+    including the handling of leading NaNs.
+
+    Args:
+        values: 1-D array
+        span: EWM span
+        adjust: Same meaning as in pandas
+
+    Returns:
+        np.ndarray: EWM values
+    """
+    return kernels.ewm_mean(values, span, adjust)
+
+
+def pct_change(values):
+    """Same as pd.Series.pct_change() for an array without NaNs"""
+    values = np.asarray(values, dtype=float)
+    out = np.empty_like(values)
+    out[0] = np.nan
+    out[1:] = values[1:] / values[:-1] - 1
+    return out
+
+
+def true_range(high, low, close):
+    """True range, with the first bar falling back to high - low"""
+    high_low = high - low
+    prev_close = np.r_[np.nan, close[:-1]]
+    high_close = np.abs(high - prev_close)
+    low_close = np.abs(low - prev_close)
+    return np.fmax(np.fmax(high_low, high_close), low_close)
+
+
+def directional_movement(high, low):
+    """
+    Plus and minus directional movement
+
+    Returns:
+        tuple: (plus_dm, minus_dm)
+    """
+    up_move = np.r_[np.nan, high[1:] - high[:-1]]
+    down_move = np.r_[np.nan, low[:-1] - low[1:]]
+    with np.errstate(invalid="ignore"):
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    return plus_dm, minus_dm
+
+
+def rolling_mean(values, window):
+    """Same as rolling(window).mean(): NaN until the window is full"""
+    return kernels.rolling_mean(values, window)
+
+
+def rolling_std(values, window):
+    """Same as rolling(window).std(): NaN until the window is full"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1 :] = windows.std(axis=1, ddof=1)
+    return out
+
+
+def rolling_skew_kurt(values, window):
+    """
+    Same as rolling(window).skew() and rolling(window).kurt()
+
+    Returns:
+        tuple: (skew, kurt)
+    """
+    return kernels.rolling_skew_kurt(values, window)
+
+
+def ema(close, window):
+    """Exponential moving average, ewm(span=window, adjust=False).mean()"""
+    return ewm_mean(close, window, adjust=False)
+
+
+def price_changes(close):
+    """
+    Gains and losses of the close-to-close changes
+
+    Returns:
+        tuple: (gain, loss), both non-negative
+    """
+    delta = np.diff(np.asarray(close, dtype=float), prepend=np.nan)
+    # The first difference is NaN and counts as neither gain nor loss
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    return gain, loss
+
+
+def rsi(close, period=14, changes=None):
+    """
+    Relative Strength Index from the simple rolling means of gains and losses
+
+    Args:
+        close: 1-D array of close prices
+        period: RSI period
+        changes: (gain, loss) from price_changes(close), if already computed
+
+    Returns:
+        np.ndarray: RSI values (NaN until the window is full)
+    """
+    gain, loss = price_changes(close) if changes is None else changes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = rolling_mean(gain, period) / rolling_mean(loss, period)
+        return 100 - (100 / (1 + rs))
+
+
+def bollinger_bands(close, window=20, num_std=2):
+    """
+    Bollinger Bands
+
+    Returns:
+        tuple: (upper_band, lower_band)
+    """
+    sma = rolling_mean(close, window)
+    std_dev = rolling_std(close, window)
+    return sma + std_dev * num_std, sma - std_dev * num_std
+
+
+def adx(high, low, close, period=14, tr=None):
+    """
+    Average Directional Index with the directional indicators
+
+    Args:
+        high: 1-D array of high prices
+        low: 1-D array of low prices
+        close: 1-D array of close prices
+        period: Span of the exponential smoothing
+        tr: true_range(high, low, close), if already computed
+
+    Returns:
+        tuple: (adx, plus_di, minus_di)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    if tr is None:
+        tr = true_range(high, low, close)
+
+    tr_ewm = ewm_mean(tr, period)
+    plus_dm, minus_dm = directional_movement(high, low)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * (ewm_mean(plus_dm, period) / tr_ewm)
+        minus_di = 100 * (ewm_mean(minus_dm, period) / tr_ewm)
+        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    return ewm_mean(dx, period), plus_di, minus_di
+
+
+def atr(high, low, close, period=14, tr=None):
+    """
+    Average True Range, the simple rolling mean of the true range
+
+    tr is true_range(high, low, close), if already computed.
+    """
+    if tr is None:
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+        close = np.asarray(close, dtype=float)
+        tr = true_range(high, low, close)
+    return rolling_mean(tr, period)
@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from utils import print_log
+
+_required = object()
+
+
+class InputGatherer:
+    """
+    1サイクル分の入力を並行して取得するクラス
+
+    submitで登録した取得処理はスレッドプールで実行され、resultは取得元ごとの
+    タイムアウト(submitした時刻から数える)まで結果を待つ。タイムアウトした処理は
+    中断されずにスレッドを占有し続けるため、取得処理自体にもタイムアウトを設定すること。
+    """
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="input"
+        )
+        self._tasks = {}
+        self.latencies = {}
+        self._started_at = time.monotonic()
+
+    def start(self):
+        """新しいサイクルを開始する(前のサイクルの結果は破棄する)"""
+        self._tasks = {}
+        self.latencies = {}
+        self._started_at = time.monotonic()
+
+    def cancel(self):
+        """
+        サイクルを中止する
+
+        まだ開始していない取得処理は取り消し、実行中の処理は結果を待たずに破棄する。
+        """
+        for future, _ in self._tasks.values():
+            future.cancel()
+        self._tasks = {}
+
+    def submit(self, name, timeout, fn, *args, **kwargs):
+        """
+        取得処理を登録する
+
+        Args:
+            name: 取得元の名前
+            timeout: 結果を待つ秒数
+            fn: 取得処理
+        """
+
+        def run():
+            started_at = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.latencies[name] = time.monotonic() - started_at
+
+        self._tasks[name] = (self._executor.submit(run), time.monotonic() + timeout)
+
+    def result(self, name, default=_required):
+        """
+        取得結果を返す
+
+        Args:
+            name: 取得元の名前
+            default: タイムアウト・エラー時に返す値(省略した場合は例外を送出する)
+
+        Returns:
+            取得処理の戻り値
+        """
+        future, deadline = self._tasks[name]
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            error = TimeoutError(f"{name}の取得がタイムアウトしました")
+        except Exception as e:
+            error = e
+
+        if default is _required:
+            raise error
+        print_log(
+            f"{name}の取得に失敗したため既定値を使用します: {error}",
+            level="warning",
+            notify=False,
+        )
+        return default
+
+    def report(self):
+        """取得元ごとの所要時間と、サイクル開始から全入力が揃うまでの時間をログに出力する"""
+        elapsed = time.monotonic() - self._started_at
+        latencies = ", ".join(
+            (
+                f"{name}={self.latencies[name]:.2f}秒"
+                if name in self.latencies
+                else f"{name}=未完了"
+            )
+            for name in self._tasks
+        )
+        print_log(f"入力の取得時間: {latencies} (全体: {elapsed:.2f}秒)", notify=False)
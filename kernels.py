@@ -0,0 +1,251 @@
+"""
+Rolling and recursive kernels behind the indicators
+
+Each kernel has a NumPy (or pandas) implementation and, when numba is
+importable, a JIT-compiled single-pass implementation. The numba backend is used by
+default when available; select one at runtime with set_backend() or
+temporarily with use_backend().
+
+    import kernels
+    kernels.set_backend("numpy")
+"""
+
+import math
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+available_backends = ("numpy", "numba") if numba is not None else ("numpy",)
+_backend = available_backends[-1]
+
+
+def set_backend(name):
+    """
+    Select the kernel implementation
+
+    Args:
+        name: "numpy", "numba" or "auto" (numba when available)
+    """
+    global _backend
+    if name == "auto":
+        name = available_backends[-1]
+    if name not in available_backends:
+        raise ValueError(f"Kernel backend not available: {name}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+@contextmanager
+def use_backend(name):
+    """Use a backend inside a with block"""
+    previous = _backend
+    set_backend(name)
+    try:
+        yield
+    finally:
+        set_backend(previous)
+
+
+def ewm_mean(values, span, adjust=True):
+    """
+    Exponentially weighted mean, ewm(span=span, adjust=adjust).mean()
+
+    Both backends follow pandas' recursion operation for operation, so the
+    result matches pandas bit for bit, including the handling of NaNs.
+    """
+    com = (span - 1) / 2.0
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+
+    values = np.asarray(values, dtype=float)
+    if _backend == "numba":
+        return _ewm_mean_jit(values, old_wt_factor, new_wt, adjust)
+
+    # Indexing a list is much faster than indexing an array in Python
+    out = [math.nan] * len(values)
+    _ewm_mean_loop(values.tolist(), old_wt_factor, new_wt, adjust, out)
+    return np.array(out)
+
+
+def rolling_mean(values, window):
+    """Same as rolling(window).mean(): NaN until the window is full or while it holds a NaN"""
+    values = np.asarray(values, dtype=float)
+    if _backend == "numba":
+        return _rolling_mean_jit(values, window)
+
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1 :] = windows.mean(axis=1)
+    return out
+
+
+def rolling_skew_kurt(values, window):
+    """
+    Same as rolling(window).skew() and rolling(window).kurt()
+
+    Bias-corrected sample skewness and excess kurtosis, NaN until the window
+    is full or while it holds a NaN. A constant window gives NaN with numba
+    and whatever the installed pandas returns otherwise.
+
+    Returns:
+        tuple: (skew, kurt)
+    """
+    values = np.asarray(values, dtype=float)
+    if _backend == "numba":
+        return _rolling_skew_kurt_jit(values, window)
+
+    # pandas' own single-pass rolling moments are the fastest without numba
+    rolling = pd.Series(values).rolling(window)
+    return rolling.skew().to_numpy(), rolling.kurt().to_numpy()
+
+
+def _ewm_mean_loop(vals, old_wt_factor, new_wt, adjust, out):
+    if len(vals) == 0:
+        return
+
+    weighted = vals[0]
+    old_wt = 1.0
+    out[0] = weighted
+    for i in range(1, len(vals)):
+        cur = vals[i]
+        if weighted == weighted:
+            if cur == cur:
+                old_wt *= old_wt_factor
+                if weighted != cur:
+                    weighted = old_wt * weighted + new_wt * cur
+                    weighted /= old_wt + new_wt
+                if adjust:
+                    old_wt += new_wt
+                else:
+                    old_wt = 1.0
+            else:
+                old_wt *= old_wt_factor
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+
+
+def _rolling_mean_loop(values, window, out):
+    # Kahan-compensated running sum; a window of zeros gives exactly 0
+    total = 0.0
+    comp = 0.0
+    nan_count = 0
+    nonzero_count = 0
+    for i in range(len(values)):
+        x = values[i]
+        if x != x:
+            nan_count += 1
+        else:
+            if x != 0.0:
+                nonzero_count += 1
+            y = x - comp
+            t = total + y
+            comp = (t - total) - y
+            total = t
+        if i >= window:
+            old = values[i - window]
+            if old != old:
+                nan_count -= 1
+            else:
+                if old != 0.0:
+                    nonzero_count -= 1
+                y = -old - comp
+                t = total + y
+                comp = (t - total) - y
+                total = t
+        if i >= window - 1 and nan_count == 0:
+            out[i] = total / window if nonzero_count > 0 else 0.0
+
+
+def _rolling_skew_kurt_loop(values, window, skew, kurt):
+    # Power sums relative to a shift point, rebuilt from the window once per
+    # window length to bound the accumulated rounding error
+    n = float(window)
+    shift = 0.0
+    s1 = s2 = s3 = s4 = 0.0
+    nan_count = 0
+    since_rebuild = 0
+    for i in range(len(values)):
+        x = values[i]
+        if x != x:
+            nan_count += 1
+        else:
+            d = x - shift
+            d2 = d * d
+            s1 += d
+            s2 += d2
+            s3 += d2 * d
+            s4 += d2 * d2
+        if i >= window:
+            old = values[i - window]
+            if old != old:
+                nan_count -= 1
+            else:
+                d = old - shift
+                d2 = d * d
+                s1 -= d
+                s2 -= d2
+                s3 -= d2 * d
+                s4 -= d2 * d2
+
+        since_rebuild += 1
+        if since_rebuild >= window and nan_count == 0:
+            since_rebuild = 0
+            start = max(i - window + 1, 0)
+            shift = 0.0
+            for j in range(start, i + 1):
+                shift += values[j]
+            shift /= i + 1 - start
+            s1 = s2 = s3 = s4 = 0.0
+            for j in range(start, i + 1):
+                d = values[j] - shift
+                d2 = d * d
+                s1 += d
+                s2 += d2
+                s3 += d2 * d
+                s4 += d2 * d2
+
+        if i >= window - 1 and nan_count == 0:
+            mean = s1 / n
+            m2 = s2 / n - mean * mean
+            m3 = s3 / n - 3 * mean * s2 / n + 2 * mean**3
+            m4 = s4 / n - 4 * mean * s3 / n + 6 * mean * mean * s2 / n - 3 * mean**4
+            if m2 > 1e-14 * (s2 / n):
+                skew[i] = math.sqrt(n * (n - 1)) / (n - 2) * m3 / m2**1.5
+                kurt[i] = (n + 1) * (n - 1) / ((n - 2) * (n - 3)) * m4 / (
+                    m2 * m2
+                ) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+
+
+if numba is not None:
+    _jit = numba.njit(cache=True)
+    _ewm_mean_loop_jit = _jit(_ewm_mean_loop)
+    _rolling_mean_loop_jit = _jit(_rolling_mean_loop)
+    _rolling_skew_kurt_loop_jit = _jit(_rolling_skew_kurt_loop)
+
+    def _ewm_mean_jit(values, old_wt_factor, new_wt, adjust):
+        out = np.full(len(values), np.nan)
+        _ewm_mean_loop_jit(values, old_wt_factor, new_wt, adjust, out)
+        return out
+
+    def _rolling_mean_jit(values, window):
+        out = np.full(len(values), np.nan)
+        _rolling_mean_loop_jit(values, window, out)
+        return out
+
+    def _rolling_skew_kurt_jit(values, window):
+        skew = np.full(len(values), np.nan)
+        kurt = np.full(len(values), np.nan)
+        _rolling_skew_kurt_loop_jit(values, window, skew, kurt)
+        return skew, kurt
@@ -0,0 +1,342 @@
+import os
+import sqlite3
+import threading
+
+
+class Ledger:
+    """
+    取引結果を保存するSQLiteの台帳
+
+    WALモードで開き、取引はtrade_idを主キーとするtradingテーブルに保存する
+    (同じ取引を2回保存しても1件になる)。日ごとの取引数・勝ち数・損益は
+    daily_summaryテーブルに、全期間の合計はledger_totalsテーブルに取引の保存と
+    同じトランザクションで加算するため、日次レポートと累積損益は取引の件数に
+    関わらず1行の読み出しで得られる。取引の元になる約定(executions)、約定を
+    取得する注文(orders)と同期の位置(sync_state)も同じファイルに保存する。
+    """
+
+    def __init__(self, path="sql/trading.db"):
+        """
+        Args:
+            path: 台帳を保存するSQLiteファイルのパス
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        with self._conn:
+            migrated = self._migrate()
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS trading (
+                    trade_id INTEGER PRIMARY KEY,
+                    date TEXT,
+                    position INTEGER,
+                    order_price INTEGER,
+                    close_price INTEGER,
+                    loss_gain INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS trading_date ON trading (date)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_summary (
+                    day TEXT PRIMARY KEY,
+                    trades INTEGER,
+                    wins INTEGER,
+                    loss_gain INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ledger_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    trades INTEGER,
+                    wins INTEGER,
+                    loss_gain INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO ledger_totals VALUES (1, 0, 0, 0)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS executions (
+                    execution_id INTEGER PRIMARY KEY,
+                    order_id INTEGER,
+                    position_id INTEGER,
+                    symbol TEXT,
+                    side TEXT,
+                    settle_type TEXT,
+                    size REAL,
+                    price REAL,
+                    loss_gain REAL,
+                    fee REAL,
+                    timestamp TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS executions_order_id ON executions (order_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS executions_position_id ON executions (position_id)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS orders (
+                    order_id INTEGER PRIMARY KEY,
+                    attempts INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT)"
+            )
+        if migrated:
+            self.rebuild_summary()
+
+    def _migrate(self):
+        """主キーのない旧形式のtradingテーブルを新しい形式に移行する(移行した場合はTrue)"""
+        columns = self._conn.execute("PRAGMA table_info(trading)").fetchall()
+        if not columns or any(column[5] for column in columns):
+            return False
+
+        self._conn.execute("ALTER TABLE trading RENAME TO trading_old")
+        self._conn.execute(
+            """
+            CREATE TABLE trading (
+                trade_id INTEGER PRIMARY KEY,
+                date TEXT,
+                position INTEGER,
+                order_price INTEGER,
+                close_price INTEGER,
+                loss_gain INTEGER
+            )
+            """
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO trading SELECT * FROM trading_old WHERE trade_id IS NOT NULL"
+        )
+        self._conn.execute("DROP TABLE trading_old")
+        self._conn.execute("DROP TABLE IF EXISTS daily_summary")
+        self._conn.execute("DROP TABLE IF EXISTS ledger_totals")
+        return True
+
+    def record_trades(self, trades):
+        """
+        取引結果をまとめて保存する(保存済みのtrade_idは無視する)
+
+        Args:
+            trades: (trade_id, date, position, order_price, close_price, loss_gain)の
+                イテラブル。dateは"%Y-%m-%d %H:%M:%S"形式の日本時間
+
+        Returns:
+            int: 新たに保存した取引の数
+        """
+        daily = {}
+        with self._lock, self._conn:
+            for trade in trades:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO trading VALUES (?, ?, ?, ?, ?, ?)", trade
+                )
+                if cursor.rowcount == 0:
+                    continue
+                day = str(trade[1])[:10]
+                loss_gain = trade[5]
+                count, wins, total = daily.get(day, (0, 0, 0))
+                daily[day] = (count + 1, wins + (loss_gain > 0), total + loss_gain)
+
+            self._add_summary(daily)
+
+        return sum(count for count, _, _ in daily.values())
+
+    def _add_summary(self, daily):
+        if not daily:
+            return
+        self._conn.executemany(
+            """
+            INSERT INTO daily_summary VALUES (?, ?, ?, ?)
+            ON CONFLICT (day) DO UPDATE SET
+                trades = trades + excluded.trades,
+                wins = wins + excluded.wins,
+                loss_gain = loss_gain + excluded.loss_gain
+            """,
+            [(day, *summary) for day, summary in daily.items()],
+        )
+        self._conn.execute(
+            """
+            UPDATE ledger_totals SET
+                trades = trades + ?, wins = wins + ?, loss_gain = loss_gain + ?
+            WHERE id = 1
+            """,
+            tuple(sum(column) for column in zip(*daily.values())),
+        )
+
+    def rebuild_summary(self):
+        """daily_summaryとledger_totalsをtradingテーブルから作り直す"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM daily_summary")
+            self._conn.execute(
+                "UPDATE ledger_totals SET trades = 0, wins = 0, loss_gain = 0"
+            )
+            rows = self._conn.execute(
+                """
+                SELECT substr(date, 1, 10), COUNT(*), SUM(loss_gain > 0), SUM(loss_gain)
+                FROM trading GROUP BY substr(date, 1, 10)
+                """
+            ).fetchall()
+            self._add_summary(
+                {day: (count, wins, total) for day, count, wins, total in rows}
+            )
+
+    def record_executions(self, executions):
+        """
+        約定をまとめて保存する(保存済みのexecutionIdは無視する)
+
+        Args:
+            executions: GMOコインAPIの約定一覧の要素(dict)のイテラブル
+
+        Returns:
+            int: 新たに保存した約定の数
+        """
+        rows = [
+            (
+                int(e["executionId"]),
+                int(e["orderId"]),
+                int(e["positionId"]),
+                e["symbol"],
+                e["side"],
+                e["settleType"],
+                float(e["size"]),
+                float(e["price"]),
+                float(e["lossGain"]),
+                float(e["fee"]),
+                e["timestamp"],
+            )
+            for e in executions
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def unrecorded_closes(self):
+        """
+        取引としてtradingテーブルに保存されていない決済の約定と、その建玉の新規約定を返す
+
+        Returns:
+            list: (決済の約定ID, 決済の売買区分, 決済価格, 決済損益, 決済時刻,
+                新規の売買区分, 新規価格, 新規時刻)のタプルのリスト
+                (新規の約定がない場合は新規の項目がNone)
+        """
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT c.execution_id, c.side, c.price, c.loss_gain, c.timestamp,
+                       o.side, o.price, o.timestamp
+                FROM executions c
+                LEFT JOIN executions o ON o.execution_id = (
+                    SELECT MIN(execution_id) FROM executions
+                    WHERE position_id = c.position_id AND settle_type = 'OPEN'
+                )
+                WHERE c.settle_type = 'CLOSE'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM trading t WHERE t.trade_id = c.execution_id
+                    )
+                ORDER BY c.execution_id
+                """
+            ).fetchall()
+
+    def track_orders(self, order_ids):
+        """約定を取得する注文IDを登録する"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO orders VALUES (?, 0)",
+                [(int(order_id),) for order_id in order_ids],
+            )
+
+    def unsynced_orders(self, max_attempts=3):
+        """
+        約定が保存されていない注文IDを返し、試行回数を加算する
+
+        max_attempts回取得しても約定がない注文(約定しなかった注文)は返さない。
+        """
+        with self._lock, self._conn:
+            order_ids = [
+                order_id
+                for (order_id,) in self._conn.execute(
+                    """
+                    SELECT order_id FROM orders o
+                    WHERE attempts < ? AND NOT EXISTS (
+                        SELECT 1 FROM executions e WHERE e.order_id = o.order_id
+                    )
+                    ORDER BY order_id
+                    """,
+                    (max_attempts,),
+                )
+            ]
+            self._conn.executemany(
+                "UPDATE orders SET attempts = attempts + 1 WHERE order_id = ?",
+                [(order_id,) for order_id in order_ids],
+            )
+        return order_ids
+
+    def get_state(self, name, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE name = ?", (name,)
+            ).fetchone()
+        return default if row is None else row[0]
+
+    def set_state(self, name, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (name, str(value))
+            )
+
+    def daily_summary(self, day):
+        """
+        日ごとの集計を返す
+
+        Args:
+            day: "%Y-%m-%d"形式の日付
+
+        Returns:
+            dict: trades, wins, loss_gain, win_rate
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT trades, wins, loss_gain FROM daily_summary WHERE day = ?",
+                (day,),
+            ).fetchone()
+        trades, wins, loss_gain = row or (0, 0, 0)
+        return {
+            "trades": trades,
+            "wins": wins,
+            "loss_gain": loss_gain,
+            "win_rate": wins / trades if trades > 0 else 0,
+        }
+
+    def cumulative_profit(self):
+        """全期間の損益の合計"""
+        with self._lock:
+            (loss_gain,) = self._conn.execute(
+                "SELECT loss_gain FROM ledger_totals WHERE id = 1"
+            ).fetchone()
+        return loss_gain
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+
+from llm_predictor import llm_model, parse_prediction, prompt_hash
+from utils import print_log
+
+
+def normalize_prompt(prompt):
+    """改行コードと行末・前後の空白の違いを無視するためにプロンプトを正規化する関数"""
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+class LLMCache:
+    """
+    プロンプトのハッシュ値をキーとしてLLMの応答を保存するSQLiteのキャッシュ
+
+    キーはモデル名と正規化したプロンプトのハッシュ値。応答本文と、そこから抽出した
+    予測・信頼度・理由を保存する。件数がmax_entriesを超えた場合は最後に使われた
+    時刻が最も古いものから削除する。bypass=Trueの場合は検索を行わず(常にミス)、
+    応答の保存のみ行う。ReplayEngineの応答ストアとしても使用できる。
+    """
+
+    def __init__(self, path="sql/llm_cache.db", max_entries=10000, bypass=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT,
+                prediction TEXT,
+                confidence REAL,
+                reasoning TEXT,
+                created_at REAL,
+                last_used_at REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used_at)"
+        )
+
+    @staticmethod
+    def make_key(prompt, model=llm_model):
+        return prompt_hash(normalize_prompt(prompt), model)
+
+    def lookup(self, prompt, model=llm_model):
+        """
+        保存済みの応答を検索する関数
+
+        Returns:
+            dict: content, prediction, confidence, reasoningを持つ辞書(なければNone)
+        """
+        if self.bypass:
+            self.misses += 1
+            return None
+
+        key = self.make_key(prompt, model)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, prediction, confidence, reasoning FROM llm_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE llm_cache SET last_used_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+
+        content, prediction, confidence, reasoning = row
+        return {
+            "content": content,
+            "prediction": prediction,
+            "confidence": confidence,
+            "reasoning": reasoning,
+        }
+
+    def get(self, prompt, model=llm_model):
+        """ResponseStoreと同じく応答本文のみを返す関数"""
+        entry = self.lookup(prompt, model)
+        return None if entry is None else entry["content"]
+
+    def put(self, prompt, content, model=llm_model):
+        """
+        応答を保存する関数(予測・信頼度・理由は応答本文から抽出する)
+
+        予測を抽出できない応答(必要なキーが欠けたJSONなど)は保存しない。
+        """
+        try:
+            prediction, confidence, reasoning = parse_prediction(content)
+        except (KeyError, TypeError, ValueError) as e:
+            print_log(
+                f"予測を抽出できないためLLM応答をキャッシュしません: {e!r}",
+                level="warning",
+                notify=False,
+            )
+            return
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            confidence = None
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.make_key(prompt, model),
+                    model,
+                    content,
+                    str(prediction),
+                    confidence,
+                    str(reasoning),
+                    now,
+                    now,
+                ),
+            )
+            # 件数の上限を超えた分を最後に使われた時刻が古い順に削除
+            self._conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,432 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from utils import print_log
+
+llm_model = "gpt-4.1"
+
+
+def build_prompt(
+    current_time, technical_analysis_report, news_articles, reflection_history
+):
+    """
+    LLMに渡すプロンプトを組み立てる関数
+
+    Args:
+        current_time: 予測時刻
+        technical_analysis_report: technical_analysisの出力
+        news_articles: ニュース記事のリスト
+        reflection_history: 過去の予測と実績のリスト
+
+    Returns:
+        str: プロンプト
+    """
+    prompt = f"""
+あなたはプロの仮想通貨トレーダーです。
+以下に示すテクニカル分析結果とニュース記事を基に、1時間後のビットコインの価格動向を論理的かつ具体的に予測してください。
+
+[現在時刻]
+{current_time.strftime("%a, %d %b %Y %H:%M:%S %z")}
+
+[ビットコインの時間足チャートに基づくテクニカル分析結果]
+{json.dumps(technical_analysis_report, ensure_ascii=False)}
+
+[24時間以内のビットコイン関連ニュース記事]
+{json.dumps(news_articles, ensure_ascii=False, indent=2)}
+
+[注意点]
+テクニカル分析とニュース情報の両方を考慮して、総合的な判断を行ってください。
+特に、テクニカル分析とニュース情報から読み取れる市場感情が矛盾する場合は、その理由と、どちらの分析をより重視するかについても説明してください。
+"""
+
+    # 予測履歴がある場合は追加
+    if len(reflection_history) > 0:
+        prompt += f"""
+
+以下は過去のあなたの予測と実際の結果です。予測の誤りを反省し、より精度の高い予測を行ってください。
+
+[過去の予測履歴と実績]
+{json.dumps(reflection_history, ensure_ascii=False)}
+"""
+
+    prompt += """
+
+出力は、次のJSON形式に厳密に従って記述してください。
+{{
+    "prediction": "bullish/bearish/neutral",
+    "confidence": float between 0 and 100,
+    "reasoning": "string"
+}}
+"""
+
+    return prompt
+
+
+def request_prediction(client, prompt, model=llm_model):
+    """
+    LLMに予測を問い合わせ、応答本文を返す関数
+
+    Args:
+        client: OpenAIクライアント
+        prompt: build_promptで作成したプロンプト
+        model: 使用するモデル名
+
+    Returns:
+        str: LLMの応答本文
+    """
+    print_log(f"prompt: {prompt}", notify=False)
+
+    response = client.chat.completions.create(
+        model=model,
+        temperature=0,
+        messages=[
+            {"role": "user", "content": prompt},
+        ],
+    )
+
+    return response.choices[0].message.content
+
+
+def stream_chunks(client, prompt, model=llm_model):
+    """
+    LLMの応答をストリーミングで受け取り、テキストの断片を順に返すジェネレータ
+
+    Args:
+        client: OpenAIクライアント
+        prompt: build_promptで作成したプロンプト
+        model: 使用するモデル名
+
+    Yields:
+        str: 応答本文の断片
+    """
+    print_log(f"prompt: {prompt}", notify=False)
+
+    stream = client.chat.completions.create(
+        model=model,
+        temperature=0,
+        messages=[
+            {"role": "user", "content": prompt},
+        ],
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+class StreamingPrediction:
+    """
+    ストリーミング応答を受信しながらpredictionとconfidenceを抽出するクラス
+
+    応答はバックグラウンドのスレッドで受信する。decision()はpredictionと
+    confidenceが揃った時点で(reasoningの受信を待たずに)返り、result()は応答の
+    完了を待って本文を返す。応答の完了時には判断までの時間と完了までの時間を
+    ログに出力し、add_done_callbackで登録した関数を呼び出す(エラー時は呼ばない)。
+    応答から予測を抽出できない場合はneutral(信頼度0)とし、登録した関数で発生した
+    例外はログに出力して受信スレッドを止めない。
+    """
+
+    prediction_pattern = re.compile(
+        r'"prediction"\s*:\s*"(bullish|bearish|neutral)"', re.IGNORECASE
+    )
+    # 数値の途中で抽出しないよう、数値の後の区切り文字まで受信してから抽出する
+    confidence_pattern = re.compile(r'"confidence"\s*:\s*(\d+(?:\.\d+)?)\s*[,}\n]')
+
+    def __init__(self, chunks):
+        """
+        Args:
+            chunks: 応答本文の断片のイテラブル(stream_chunksの出力など)
+        """
+        self.content = None
+        self.prediction = None
+        self.confidence = None
+        self.error = None
+        self.time_to_decision = None
+        self.completion_time = None
+
+        self._started_at = time.monotonic()
+        self._decided = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._thread = threading.Thread(
+            target=self._receive, args=(chunks,), daemon=True
+        )
+        self._thread.start()
+
+    def _receive(self, chunks):
+        text = ""
+        try:
+            for chunk in chunks:
+                text += chunk
+                if not self._decided.is_set():
+                    self._extract(text)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.content = text
+            self.completion_time = time.monotonic() - self._started_at
+            try:
+                if not self._decided.is_set() and self.error is None:
+                    # 逐次抽出できなかった場合は応答全体から抽出する
+                    self._decide(*self._parse(text))
+            finally:
+                # 抽出に失敗してもdecision()とresult()が待ち続けないようにする
+                self._decided.set()
+                with self._lock:
+                    self._done.set()
+                    callbacks = self._callbacks if self.error is None else []
+
+        if self.error is None:
+            print_log(
+                f"LLMの応答が完了しました: 判断まで{self.time_to_decision:.2f}秒, "
+                f"完了まで{self.completion_time:.2f}秒",
+                notify=False,
+            )
+        for callback in callbacks:
+            self._call(callback)
+
+    @staticmethod
+    def _parse(text):
+        """応答全体からpredictionとconfidenceを抽出する(失敗した場合はneutral, 0)"""
+        try:
+            prediction, confidence, _ = parse_prediction(text)
+            return prediction, confidence
+        except Exception as e:
+            print_log(
+                f"LLMの応答から予測を抽出できませんでした: {e!r}\nLLMの出力: {text}",
+                level="warning",
+                notify=False,
+            )
+            return "neutral", 0
+
+    def _call(self, callback):
+        try:
+            callback(self)
+        except Exception as e:
+            print_log(
+                f"LLMの応答の完了時の処理でエラーが発生しました: {e!r}",
+                level="error",
+                notify=False,
+            )
+
+    def _extract(self, text):
+        prediction_match = self.prediction_pattern.search(text)
+        confidence_match = self.confidence_pattern.search(text)
+        if prediction_match and confidence_match:
+            self._decide(
+                prediction_match.group(1).lower(), float(confidence_match.group(1))
+            )
+
+    def _decide(self, prediction, confidence):
+        self.prediction = prediction
+        self.confidence = confidence
+        self.time_to_decision = time.monotonic() - self._started_at
+        self._decided.set()
+
+    def decision(self, timeout=None):
+        """
+        predictionとconfidenceが揃うまで待つ
+
+        Returns:
+            tuple: (prediction, confidence)
+        """
+        if not self._decided.wait(timeout):
+            raise TimeoutError("LLMの予測が時間内に得られませんでした")
+        if self.prediction is None:
+            raise self.error
+        return self.prediction, self.confidence
+
+    def result(self, timeout=None):
+        """応答の完了まで待ち、応答本文を返す"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("LLMの応答が時間内に完了しませんでした")
+        if self.error is not None:
+            raise self.error
+        return self.content
+
+    def add_done_callback(self, callback):
+        """応答の完了時にcallback(self)を呼び出す(完了済みの場合はすぐに呼び出す)"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        if self.error is None:
+            self._call(callback)
+
+
+def request_prediction_stream(client, prompt, model=llm_model):
+    """
+    LLMにストリーミングで予測を問い合わせる関数
+
+    Returns:
+        StreamingPrediction: 受信中の応答
+    """
+    return StreamingPrediction(stream_chunks(client, prompt, model))
+
+
+def parse_prediction(response_content):
+    """
+    LLMの応答から予測結果を抽出する関数
+
+    Args:
+        response_content: LLMの応答本文
+
+    Returns:
+        tuple: (prediction, confidence, reasoning)
+    """
+    try:
+        # まずJSONパースを試みる
+        response_json = json.loads(response_content)
+        prediction = response_json["prediction"]
+        confidence = response_json["confidence"]
+        reasoning = response_json["reasoning"]
+    except json.JSONDecodeError:
+        print_log(
+            f"JSONパースエラーが発生しました。正規表現で抽出を試みます。\nLLMの出力: {response_content}",
+            level="warning",
+            notify=False,
+        )
+
+        # デフォルト値を設定
+        prediction = "neutral"
+        confidence = 50
+        reasoning = "抽出失敗"
+
+        # 正規表現で抽出
+        # prediction抽出 (bullish/bearish/neutral)
+        prediction_match = re.search(
+            r'"prediction"[^\w]*:?[^\w]*"(bullish|bearish|neutral)"',
+            response_content,
+            re.IGNORECASE,
+        )
+        if prediction_match:
+            prediction = prediction_match.group(1).lower()
+
+        # confidence抽出 (0-100の数値)
+        confidence_match = re.search(
+            r'"confidence"[^\w]*:?[^\w]*(\d+(?:\.\d+)?)', response_content
+        )
+        if confidence_match:
+            try:
+                confidence = float(confidence_match.group(1))
+            except ValueError:
+                pass
+
+        # reasoning抽出 (引用符で囲まれた文字列)
+        reasoning_match = re.search(
+            r'"reasoning"[^\w]*:?[^\w]*"([^"]*)"', response_content
+        )
+        if reasoning_match:
+            reasoning = reasoning_match.group(1)
+
+    return prediction, confidence, reasoning
+
+
+def cycle_start(current_time):
+    """
+    サイクルの時刻(現在時刻を正時に切り捨てたもの)を返す関数
+
+    プロンプト・予測レコード・ニュースのスナップショットの時刻をこれに揃えることで、
+    起動が数秒遅れてもリプレイ(正時のサイクル)で同じプロンプトが組み立てられる。
+    """
+    return current_time.replace(minute=0, second=0, microsecond=0)
+
+
+def make_record(
+    current_time,
+    technical_analysis_report,
+    news_articles,
+    prediction,
+    confidence,
+    reasoning,
+):
+    """予測履歴に保存するレコードを作成する関数"""
+    return {
+        "prediciton_time": current_time.strftime("%a, %d %b %Y %H:%M:%S %z"),
+        "technical_analysis_report": technical_analysis_report,
+        "news_articles": news_articles,
+        "prediction": {
+            "prediction": prediction,
+            "confidence": confidence,
+            "reasoning": reasoning,
+        },
+        "actual_result": None,  # 次回の予測時に更新
+    }
+
+
+def evaluate_prediction(last_prediction, price, previous_price):
+    """
+    前回の予測を実際の価格変動と照合する関数
+
+    Args:
+        last_prediction: 前回の予測(bullish/bearish/neutral)
+        price: 現在価格
+        previous_price: 前回予測時の価格
+
+    Returns:
+        dict: 予測レコードのactual_resultに格納する実績
+    """
+    price_change = ((price - previous_price) / previous_price) * 100
+    direction = "up" if price_change > 0 else "down" if price_change < 0 else "flat"
+
+    if last_prediction == "bullish" and direction == "up":
+        accuracy = True
+    elif last_prediction == "bearish" and direction == "down":
+        accuracy = True
+    elif last_prediction == "neutral" and abs(price_change) < 1:
+        accuracy = True
+    else:
+        accuracy = False
+
+    return {
+        "price_change": round(price_change, 2),
+        "price_change_direction": direction,
+        "prediction_accuracy": accuracy,
+    }
+
+
+def prompt_hash(prompt, model=llm_model):
+    """モデル名とプロンプトからキャッシュキーとなるハッシュ値を計算する関数"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """
+    プロンプトのハッシュ値をキーとしてLLMの応答を保存するストア
+
+    応答は追記型のJSONLファイルに記録され、リプレイ時に同じプロンプトが
+    組み立てられた場合はAPIを呼ばずに記録済みの応答を返す。
+    """
+
+    def __init__(self, path="llm_responses.jsonl"):
+        self.path = path
+        self.responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    self.responses[row["hash"]] = row["content"]
+
+    def get(self, prompt, model=llm_model):
+        return self.responses.get(prompt_hash(prompt, model))
+
+    def put(self, prompt, content, model=llm_model):
+        key = prompt_hash(prompt, model)
+        if self.responses.get(key) == content:
+            return
+        self.responses[key] = content
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(
+                json.dumps(
+                    {"hash": key, "model": model, "content": content},
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 import requests
 
+from tracer import traced
+
 # from ta import add_all_ta_features
 # from ta.utils import dropna
 
@@ -34,6 +36,7 @@ def get_1day_data(symbol="BTC_JPY", interval="1hour", date=""):
     return data
 
 
+@traced()
 def get_data_for_days(symbol="BTC_JPY", interval="1hour", end_date="", days=450):
     all_data = pd.DataFrame()
     current_date = datetime.strptime(end_date, "%Y%m%d")
@@ -50,6 +53,7 @@ def get_data_for_days(symbol="BTC_JPY", interval="1hour", end_date="", days=450)
     return all_data
 
 
+@traced()
 def calc_features(df, train=True):
     df[df.columns] = df[df.columns].astype(float)
 
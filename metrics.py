@@ -0,0 +1,120 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    """ラベルの値の\\と"と改行をPrometheusのテキスト形式に合わせてエスケープする"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name, labels, value):
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+
+class Metrics:
+    """
+    Botの状態と処理時間をPrometheusのテキスト形式で公開するメトリクス
+
+    値の更新と出力はロックで保護するため、tracedで計測している処理を実行する複数の
+    スレッド(入力の取得など)やserveで起動するHTTPサーバから同時に呼び出してよい。
+    on_spanをtracer.add_listenerに登録すると、tracedで計測している処理ごとの
+    所要時間・呼び出し回数・エラー回数を集計する。
+    """
+
+    def __init__(self):
+        self.gauges = {}
+        self.counters = {}
+        self.help = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def describe(self, name, text):
+        """メトリクスの説明(# HELP)を登録する"""
+        self.help[name] = text
+
+    def set(self, name, value, **labels):
+        """ゲージの値を設定する"""
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def inc(self, name, value=1, **labels):
+        """カウンタを加算する"""
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def on_span(self, name, duration_ns, error):
+        """tracerのspanの終了時に呼び出される"""
+        seconds = duration_ns / 1e9
+        self.set("bot_stage_last_duration_seconds", seconds, stage=name)
+        self.inc("bot_stage_duration_seconds_sum", seconds, stage=name)
+        self.inc("bot_stage_duration_seconds_count", stage=name)
+        if error:
+            self.inc("bot_errors_total", endpoint=name)
+
+    def render(self):
+        """Prometheusのテキスト形式で出力する"""
+        with self._lock:
+            gauges = self.gauges.copy()
+            counters = self.counters.copy()
+
+        lines = []
+        seen = set()
+        for kind, values in (("gauge", gauges), ("counter", counters)):
+            for (name, labels), value in sorted(values.items()):
+                if name not in seen:
+                    seen.add(name)
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(_format(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """/metricsを返すHTTPサーバをバックグラウンドのスレッドで起動する"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics = Metrics()
+metrics.describe("bot_cycle_lateness_seconds", "正時からサイクル開始までの秒数")
+metrics.describe("bot_cycles_total", "実行したサイクルの数")
+metrics.describe("bot_stage_last_duration_seconds", "処理ごとの直近の所要時間")
+metrics.describe("bot_stage_duration_seconds_sum", "処理ごとの所要時間の合計")
+metrics.describe("bot_stage_duration_seconds_count", "処理(API呼び出しなど)の回数")
+metrics.describe("bot_errors_total", "処理ごとのエラーの回数")
+metrics.describe("bot_prediction_probability", "アンサンブルの上昇確率")
+metrics.describe("bot_position", "現在のポジション(1: 買い, -1: 売り, 0: なし)")
+metrics.describe("bot_available_margin_yen", "取引余力(円)")
+metrics.describe("bot_profit_rate", "稼働開始時の残高に対する損益率")
@@ -0,0 +1,120 @@
+import math
+import os
+import threading
+
+import pandas as pd
+
+from ensemble import feature_cols, load_models
+from utils import print_log
+
+
+def model_version(model_dir):
+    """
+    モデルのディレクトリの版を表す値を返す関数
+
+    *.pklと(あれば)版の管理ファイルmanifest.jsonの名前・サイズ・更新時刻の組。
+    """
+    version = []
+    for name in sorted(os.listdir(model_dir)):
+        if name.endswith(".pkl") or name == "manifest.json":
+            stat = os.stat(os.path.join(model_dir, name))
+            version.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(version)
+
+
+def validate_models(models, X):
+    """
+    各モデルが特徴量の行から0〜1の上昇確率を返すことを確認する関数
+
+    Raises:
+        ValueError: モデルがない、または確率が不正な場合
+    """
+    if len(models) == 0:
+        raise ValueError("モデルがありません")
+    for model in models:
+        proba = model.predict_proba(X[feature_cols])[0][1]
+        if not (0 <= proba <= 1) or math.isnan(proba):
+            raise ValueError(f"モデルの予測確率が不正です: {proba}")
+
+
+class ModelRegistry:
+    """
+    models/*.pklを監視し、更新されたアンサンブルを再起動せずに差し替えるクラス
+
+    バックグラウンドのスレッドがinterval秒ごとにディレクトリの版(model_version)を
+    確認し、変化した後1回分の間隔で変化が止まったら(ファイルの書き込み中に読まない
+    ため)新しいアンサンブルを読み込んでsmoke_rowで検証する。検証に通ったものは
+    次にcurrentが呼ばれた時点(サイクルの開始時)に差し替えるため、予測の途中で
+    モデルが変わったり、予測が読み込みを待ったりすることはない。検証に失敗した版は
+    再び変化するまで読み込まない。
+    """
+
+    def __init__(self, model_dir="models", interval=60):
+        """
+        Args:
+            model_dir: モデル(*.pkl)を格納したディレクトリ
+            interval: ディレクトリを確認する間隔(秒)
+        """
+        self.model_dir = model_dir
+        self.interval = interval
+        # 検証に使う特徴量の行(Botが直近の予測に使った行で更新する)
+        self.smoke_row = pd.DataFrame([[0.0] * len(feature_cols)], columns=feature_cols)
+
+        self.version = model_version(model_dir)
+        self.models = load_models(model_dir)
+        validate_models(self.models, self.smoke_row)
+
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """検証済みの新しいアンサンブルがあれば差し替え、現在のアンサンブルを返す"""
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self.models, self.version = pending
+            print_log(
+                f"モデルを差し替えました: {[name for name, _, _ in self.version]}",
+                notify=True,
+            )
+        return self.models
+
+    def start(self):
+        """ディレクトリを監視するバックグラウンドのスレッドを開始する"""
+
+        def loop():
+            last_seen = self.version
+            rejected = None
+            while not self._stop.wait(self.interval):
+                try:
+                    version = model_version(self.model_dir)
+                    stable = version == last_seen
+                    last_seen = version
+                    if not stable or version in (self.version, rejected):
+                        continue
+                    if self._pending is not None and self._pending[1] == version:
+                        continue
+
+                    models = load_models(self.model_dir)
+                    validate_models(models, self.smoke_row)
+                    self._pending = (models, version)
+                    print_log(
+                        "新しいモデルを読み込みました。次のサイクルで差し替えます",
+                        notify=False,
+                    )
+                except Exception as e:
+                    rejected = last_seen
+                    print_log(
+                        f"新しいモデルの読み込み・検証に失敗しました: {e}",
+                        level="error",
+                        notify=True,
+                    )
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# GMOコインのklinesのintervalと期間の対応
+interval_periods = {
+    "1min": pd.Timedelta(minutes=1),
+    "5min": pd.Timedelta(minutes=5),
+    "10min": pd.Timedelta(minutes=10),
+    "15min": pd.Timedelta(minutes=15),
+    "30min": pd.Timedelta(minutes=30),
+    "1hour": pd.Timedelta(hours=1),
+    "4hour": pd.Timedelta(hours=4),
+    "8hour": pd.Timedelta(hours=8),
+    "12hour": pd.Timedelta(hours=12),
+    "1day": pd.Timedelta(days=1),
+    "1week": pd.Timedelta(weeks=1),
+}
+
+ohlcv_cols = ["open", "high", "low", "close", "volume"]
+
+
+def resample_ohlcv(df, interval, offset=pd.Timedelta(0)):
+    """
+    ローソク足をより長い足にまとめる関数
+
+    インデックスは時刻順に並んでいる前提で、UNIX時間をperiodで割った値が
+    変わる位置を境界としてreduceatで1回の走査で集計する。
+
+    Args:
+        df: openTimeをインデックスとするローソク足データ
+        interval: まとめる先のinterval(interval_periodsのキー)
+        offset: 足の境界をずらす時間(UTCの0時を基準とする)
+
+    Returns:
+        pd.DataFrame: openTimeをインデックスとするローソク足データ
+    """
+    period = interval_periods[interval].value
+    ns = df.index.as_unit("ns").asi8
+    bucket = (ns - offset.value) // period
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    resampled = pd.DataFrame(
+        {
+            "open": df["open"].to_numpy(dtype=float)[starts],
+            "high": np.maximum.reduceat(df["high"].to_numpy(dtype=float), starts),
+            "low": np.minimum.reduceat(df["low"].to_numpy(dtype=float), starts),
+            "close": df["close"].to_numpy(dtype=float)[ends],
+            "volume": np.add.reduceat(df["volume"].to_numpy(dtype=float), starts),
+        },
+        index=pd.to_datetime(bucket[starts] * period + offset.value, utc=True),
+    )
+    resampled.index = resampled.index.tz_convert(df.index.tz).as_unit(df.index.unit)
+    resampled.index.name = df.index.name
+
+    return resampled
+
+
+def build_timeframes(df, source_interval, intervals, offset=pd.Timedelta(0)):
+    """
+    最も短い足から複数の時間足のローソク足を作成する関数
+
+    長い足は、その期間を割り切れる直前の足から順にまとめて作成する
+    (例: 1min -> 15min -> 1hour -> 4hour -> 1day)。
+
+    Args:
+        df: source_intervalのローソク足データ
+        source_interval: dfのinterval
+        intervals: 作成するintervalのリスト
+        offset: 足の境界をずらす時間(UTCの0時を基準とする)
+
+    Returns:
+        dict: intervalをキーとするローソク足データ
+    """
+    df = df[ohlcv_cols].astype(float)
+    frames = {source_interval: df}
+
+    for interval in sorted(set(intervals), key=lambda x: interval_periods[x]):
+        if interval in frames:
+            continue
+        if interval_periods[interval] < interval_periods[source_interval]:
+            raise ValueError(f"{interval}は{source_interval}より短い足です")
+
+        # 期間を割り切れる最も長い作成済みの足から作成する
+        base = max(
+            (
+                k
+                for k in frames
+                if interval_periods[interval] % interval_periods[k] == pd.Timedelta(0)
+            ),
+            key=lambda x: interval_periods[x],
+        )
+        frames[interval] = resample_ohlcv(frames[base], interval, offset)
+
+    return frames
+
+
+def calc_timeframe_features(df, windows=(5, 13, 25)):
+    """
+    calc_featuresと同じ特徴量を1つの時間足について計算する関数
+
+    Args:
+        df: ローソク足データ
+        windows: ローリング統計量の期間
+
+    Returns:
+        pd.DataFrame: 特徴量
+    """
+    features = pd.DataFrame(index=df.index)
+    features["return"] = np.log(df["close"] / df["open"])
+
+    for window in windows:
+        rolling = features["return"].rolling(window, 2)
+        features[f"return_mean_{window}"] = rolling.mean()  # 移動平均
+        features[f"return_std_{window}"] = rolling.std()  # 標準偏差
+        features[f"sharpe_{window}"] = (
+            features[f"return_mean_{window}"] / features[f"return_std_{window}"]
+        )  # シャープレシオ
+        features[f"return_mean_gap_{window}"] = (
+            df["close"] / features[f"return_mean_{window}"]
+        )  # 移動平均乖離率
+
+    return features.replace([np.inf, -np.inf], np.nan)
+
+
+def align_features(features, interval, decision_times):
+    """
+    各判断時刻までに確定していた足の特徴量を取り出す関数
+
+    足はopenTime + 期間で確定するため、確定時刻がdecision_times以前の
+    最新の足を二分探索で選ぶ(先読みしない)。
+
+    Args:
+        features: intervalの特徴量
+        interval: featuresのinterval
+        decision_times: 判断時刻(DatetimeIndex)
+
+    Returns:
+        pd.DataFrame: decision_timesをインデックスとする特徴量
+    """
+    close_times = (features.index + interval_periods[interval]).as_unit("ns").asi8
+    pos = np.searchsorted(close_times, decision_times.as_unit("ns").asi8, "right") - 1
+
+    values = features.to_numpy(dtype=float)[np.maximum(pos, 0)]
+    values[pos < 0] = np.nan
+
+    return pd.DataFrame(values, index=decision_times, columns=features.columns)
+
+
+def build_multi_timeframe_features(
+    df,
+    source_interval="1min",
+    base_interval="1hour",
+    intervals=("1min", "15min", "4hour", "1day"),
+    windows=(5, 13, 25),
+    offset=pd.Timedelta(0),
+):
+    """
+    複数の時間足の特徴量を判断足に揃えて1つの特徴量テーブルにする関数
+
+    判断足のopenTimeをインデックスとし、その足の確定時刻(openTime + 期間)に
+    確定していた各時間足の特徴量を"{interval}_"を接頭辞とする列で結合する。
+    判断足自体の特徴量は接頭辞なしでcalc_featuresと同じ列名になる。
+
+    Args:
+        df: source_intervalのローソク足データ(get_data_for_daysの出力)
+        source_interval: dfのinterval
+        base_interval: 予測を行う判断足のinterval
+        intervals: 結合する時間足のintervalのリスト
+        windows: ローリング統計量の期間
+        offset: 足の境界をずらす時間(UTCの0時を基準とする)
+
+    Returns:
+        pd.DataFrame: 判断足のopenTimeをインデックスとする特徴量
+    """
+    frames = build_timeframes(
+        df, source_interval, [base_interval, *intervals], offset=offset
+    )
+
+    # 元データの末尾で確定していない判断足は除く
+    base = frames[base_interval]
+    last_close = df.index[-1] + interval_periods[source_interval]
+    base = base.loc[base.index + interval_periods[base_interval] <= last_close]
+    decision_times = base.index + interval_periods[base_interval]
+
+    result = [calc_timeframe_features(base, windows)]
+    for interval in intervals:
+        if interval == base_interval:
+            continue
+        features = calc_timeframe_features(frames[interval], windows)
+        aligned = align_features(features, interval, decision_times)
+        aligned.index = base.index
+        result.append(aligned.add_prefix(f"{interval}_"))
+
+    return pd.concat(result, axis=1)
@@ -1,4 +1,5 @@
 import datetime
+import json
 import re
 
 import feedparser
@@ -100,6 +101,48 @@ def get_news_articles(rss_url="https://jp.cointelegraph.com/rss/tag/bitcoin"):
     return articles[:5]
 
 
+def save_news_snapshot(current_time, articles, path="news_snapshots.jsonl"):
+    """
+    取得したニュース記事をリプレイ用のスナップショットとして追記する関数
+
+    Args:
+        current_time: 記事を取得した時刻
+        articles: get_news_articlesの出力
+        path: スナップショットを保存するJSONLファイルのパス
+    """
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(
+            json.dumps(
+                {"time": current_time.isoformat(), "articles": articles},
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
+
+
+def load_news_snapshots(path="news_snapshots.jsonl"):
+    """
+    save_news_snapshotで保存したスナップショットを読み込む関数
+
+    Args:
+        path: スナップショットを保存したJSONLファイルのパス
+
+    Returns:
+        list: (取得時刻, 記事のリスト)のタプルを時刻順に並べたリスト
+    """
+    snapshots = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            snapshots.append(
+                (datetime.datetime.fromisoformat(row["time"]), row["articles"])
+            )
+
+    return sorted(snapshots, key=lambda x: x[0])
+
+
 if __name__ == "__main__":
     # テスト用コード
     articles = get_news_articles()
@@ -0,0 +1,231 @@
+import calendar
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import feedparser
+import requests
+
+from news_analyzer import clean_html
+from utils import print_log
+
+default_feeds = ["https://jp.cointelegraph.com/rss/tag/bitcoin"]
+article_ttl = 24 * 60 * 60  # 記事を保持する秒数
+
+
+class NewsPoller:
+    """
+    複数のRSSフィードを定期的に取得し、記事をSQLiteの索引に保存するクラス
+
+    フィードはETag・Last-Modifiedによる条件付きリクエストで並行して取得し、更新が
+    ない場合(304)は解析しない。記事はリンクをキーに重複を除いて保存し、HTMLの除去は
+    新しい記事に対してのみ行う。公開から24時間を過ぎた記事は取得のたびに削除する。
+    get_news_articlesは索引から記事を返すため、ネットワークを待たない。
+    """
+
+    def __init__(self, feeds=None, path="sql/news_index.db", timeout=10):
+        """
+        Args:
+            feeds: RSSフィードのURLのリスト
+            path: 索引を保存するSQLiteファイルのパス
+            timeout: 1フィードあたりのリクエストのタイムアウト(秒)
+        """
+        self.feeds = list(feeds or default_feeds)
+        self.path = path
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.feeds), thread_name_prefix="news"
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feeds (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    modified TEXT,
+                    checked_at REAL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    link TEXT PRIMARY KEY,
+                    title TEXT,
+                    description TEXT,
+                    pub_date TEXT,
+                    published_at REAL,
+                    feed TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS articles_published_at ON articles (published_at)"
+            )
+
+    def _fetch(self, url, etag, modified):
+        """
+        フィードを条件付きリクエストで取得する
+
+        Returns:
+            tuple: (解析したフィード(更新がない場合はNone), ETag, Last-Modified)
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+
+        res = requests.get(url, headers=headers, timeout=self.timeout)
+        if res.status_code == 304:
+            return None, etag, modified
+        res.raise_for_status()
+
+        return (
+            feedparser.parse(res.content),
+            res.headers.get("ETag"),
+            res.headers.get("Last-Modified"),
+        )
+
+    def poll(self):
+        """
+        全てのフィードを並行して取得し、新しい記事を索引に追加する
+
+        Returns:
+            int: 追加した記事の数
+        """
+        with self._lock:
+            validators = {
+                url: (etag, modified)
+                for url, etag, modified in self._conn.execute(
+                    "SELECT url, etag, modified FROM feeds"
+                )
+            }
+        futures = {
+            url: self._executor.submit(
+                self._fetch, url, *validators.get(url, (None, None))
+            )
+            for url in self.feeds
+        }
+
+        now = time.time()
+        added = 0
+        for url, future in futures.items():
+            try:
+                feed, etag, modified = future.result()
+            except Exception as e:
+                print_log(
+                    f"RSSフィードの取得中にエラーが発生しました: {url}: {e}",
+                    level="warning",
+                    notify=False,
+                )
+                continue
+
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?)",
+                    (url, etag, modified, now),
+                )
+                if feed is not None:
+                    added += self._add_entries(url, feed.entries, now)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM articles WHERE published_at <= ?", (now - article_ttl,)
+            )
+
+        return added
+
+    def _add_entries(self, url, entries, now):
+        rows = []
+        for entry in entries:
+            link = entry.get("link", "")
+            parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+            if not link or parsed is None:
+                continue
+
+            published_at = calendar.timegm(parsed)
+            if published_at <= now - article_ttl:
+                continue
+            if self._conn.execute(
+                "SELECT 1 FROM articles WHERE link = ?", (link,)
+            ).fetchone():
+                continue
+
+            rows.append(
+                (
+                    link,
+                    entry.get("title", ""),
+                    clean_html(entry.get("description", "")),
+                    entry.get("published", ""),
+                    published_at,
+                    url,
+                )
+            )
+
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        return len(rows)
+
+    def get_news_articles(self, limit=5):
+        """
+        索引から24時間以内の記事を新しい順に返す
+
+        Args:
+            limit: 返す記事の数
+
+        Returns:
+            list: ニュース記事のリスト(news_analyzer.get_news_articlesと同じ形式)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT title, link, description, pub_date FROM articles
+                WHERE published_at > ? ORDER BY published_at DESC LIMIT ?
+                """,
+                (time.time() - article_ttl, limit),
+            ).fetchall()
+
+        return [
+            {
+                "title": title,
+                "link": link,
+                "description": description,
+                "pub_date": pub_date,
+            }
+            for title, link, description, pub_date in rows
+        ]
+
+    def start(self, interval=300):
+        """
+        索引を更新してから、interval秒ごとに取得するバックグラウンドのスレッドを開始する
+        """
+        self.poll()
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    print_log(
+                        f"ニュースの更新中にエラーが発生しました: {e}",
+                        level="error",
+                        notify=False,
+                    )
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,191 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ensemble import make_features, predict_proba
+from utils import print_log
+
+
+def signal_score(prediction, confidence):
+    """予測と信頼度を-1から1のスコアに変換する関数(bullishが正)"""
+    sign = {"bullish": 1, "bearish": -1}.get(prediction, 0)
+    return sign * float(confidence) / 100
+
+
+def score_prediction(score):
+    """スコアを予測と信頼度に変換する関数"""
+    if score > 0:
+        prediction = "bullish"
+    elif score < 0:
+        prediction = "bearish"
+    else:
+        prediction = "neutral"
+    return prediction, round(abs(score) * 100, 1)
+
+
+class PredictionCoordinator:
+    """
+    LLMとアンサンブル(models/*.pkl)の予測を並行して実行し、締め切りまでに判断するクラス
+
+    startでサイクルを開始するとアンサンブルの予測をバックグラウンドで開始し、
+    締め切りをstartからdeadline秒後に設定する。decideはLLMの予測を締め切りまで待ち、
+    間に合った場合はLLMの予測(ensemble_weight > 0の場合はアンサンブルとの加重平均)、
+    間に合わなかった場合やエラーの場合はアンサンブルの予測を返す。締め切りの超過と
+    フォールバックはlog_pathにJSONLで記録する。
+    """
+
+    def __init__(
+        self,
+        models,
+        deadline=120,
+        ensemble_weight=0.0,
+        symbol="BTC_JPY",
+        log_path="prediction_fallbacks.jsonl",
+    ):
+        """
+        Args:
+            models: アンサンブルのモデルのリスト(空の場合はフォールバックしない)
+            deadline: サイクル開始から判断までの秒数
+            ensemble_weight: LLMが間に合った場合にアンサンブルのスコアに掛ける重み(0から1)
+            symbol: 銘柄
+            log_path: 締め切りの超過とフォールバックを記録するファイルのパス
+        """
+        self.models = models
+        self.deadline = deadline
+        self.ensemble_weight = ensemble_weight
+        self.symbol = symbol
+        self.log_path = log_path
+        self.stats = {"llm": 0, "blend": 0, "ensemble": 0, "miss": 0}
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ensemble"
+        )
+        self._ensemble = None
+        self._started_at = time.monotonic()
+        self._current_time = None
+
+    def start(self, current_time):
+        """サイクルを開始し、アンサンブルの予測を開始する"""
+        self._started_at = time.monotonic()
+        self._current_time = current_time
+        self._ensemble = None
+        if self.models:
+            self._ensemble = self._executor.submit(self._predict_ensemble, current_time)
+
+    def cancel(self):
+        """サイクルを中止する(開始前のアンサンブルの予測は取り消し、実行中の予測は破棄する)"""
+        if self._ensemble is not None:
+            self._ensemble.cancel()
+        self._ensemble = None
+
+    def _predict_ensemble(self, current_time):
+        X = make_features(current_time, symbol=self.symbol, days=3)
+        return predict_proba(self.models, X)
+
+    def remaining(self):
+        """締め切りまでの残り秒数"""
+        return max(self.deadline - (time.monotonic() - self._started_at), 0)
+
+    def ensemble_proba(self):
+        """締め切りまでに得られたアンサンブルの上昇確率(得られない場合はNone)"""
+        if self._ensemble is None:
+            return None
+        try:
+            return self._ensemble.result(timeout=self.remaining())
+        except Exception as e:
+            print_log(
+                f"アンサンブルの予測に失敗しました: {e}", level="warning", notify=False
+            )
+            return None
+
+    def decide(self, stream):
+        """
+        LLMの応答を締め切りまで待ち、予測を決定する
+
+        Args:
+            stream: LLMの応答(StreamingPrediction)
+
+        Returns:
+            dict: prediction, confidence, source(llm/blend/ensemble), ensemble_proba
+        """
+        try:
+            prediction, confidence = stream.decision(timeout=self.remaining())
+            llm_error = None
+        except Exception as e:
+            llm_error = e
+
+        if llm_error is None:
+            proba = self.ensemble_proba() if self.ensemble_weight > 0 else None
+            if proba is None:
+                self.stats["llm"] += 1
+                return {
+                    "prediction": prediction,
+                    "confidence": confidence,
+                    "source": "llm",
+                    "ensemble_proba": None,
+                }
+
+            score = (1 - self.ensemble_weight) * signal_score(
+                prediction, confidence
+            ) + self.ensemble_weight * (proba - 0.5) * 2
+            prediction, confidence = score_prediction(score)
+            self.stats["blend"] += 1
+            return {
+                "prediction": prediction,
+                "confidence": confidence,
+                "source": "blend",
+                "ensemble_proba": proba,
+            }
+
+        # LLMが締め切りに間に合わなかった(またはエラー)場合はアンサンブルで判断する
+        self.stats["miss"] += 1
+        proba = self.ensemble_proba()
+        self._record(llm_error, proba)
+        stream.add_done_callback(self._log_late_response)
+
+        if proba is None:
+            raise RuntimeError(
+                f"LLMとアンサンブルのいずれも予測を得られませんでした: {llm_error}"
+            )
+
+        self.stats["ensemble"] += 1
+        prediction, confidence = score_prediction((proba - 0.5) * 2)
+        if prediction == "neutral":  # gmo_ml_botと同じく0.5は上昇とみなす
+            prediction = "bullish"
+        return {
+            "prediction": prediction,
+            "confidence": confidence,
+            "source": "ensemble",
+            "ensemble_proba": proba,
+        }
+
+    def _record(self, llm_error, proba):
+        elapsed = time.monotonic() - self._started_at
+        print_log(
+            f"LLMの予測が締め切りに間に合いませんでした({elapsed:.1f}秒): {llm_error}"
+            f" アンサンブルの上昇確率: {proba}",
+            level="warning",
+            notify=False,
+        )
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "time": self._current_time.isoformat(),
+                        "deadline": self.deadline,
+                        "elapsed": round(elapsed, 3),
+                        "error": f"{type(llm_error).__name__}: {llm_error}",
+                        "ensemble_proba": proba,
+                        "fallback": proba is not None,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+
+    def _log_late_response(self, stream):
+        print_log(
+            f"締め切り後にLLMの予測が得られました: {stream.prediction}"
+            f" (信頼度: {stream.confidence}, 判断まで{stream.time_to_decision:.2f}秒)",
+            notify=False,
+        )
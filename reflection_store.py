@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+from compact_prompt import article_id
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class ReflectionStore:
+    """
+    予測履歴(make_recordのレコード)をSQLiteに保存し、直近window件をメモリに保持するクラス
+
+    レコードはテクニカル分析結果・予測・実績をJSONで、ニュース記事はIDのみを保存し、
+    記事本体は記事テーブルに1回だけ保存する(連続するサイクルで同じ記事が重複するため)。
+    起動時には直近window件のみを読み込む。実績や予測の理由はupdateで保存済みの行を
+    書き換える。
+    """
+
+    def __init__(self, path="sql/reflection_history.db", window=6):
+        """
+        Args:
+            path: 予測履歴を保存するSQLiteファイルのパス
+            window: メモリに保持する(プロンプトに使う)予測履歴の件数
+        """
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reflection_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    time TEXT,
+                    price REAL,
+                    prediction_time TEXT,
+                    technical_analysis_report TEXT,
+                    article_ids TEXT,
+                    prediction TEXT,
+                    actual_result TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reflection_articles (
+                    id TEXT PRIMARY KEY,
+                    article TEXT
+                )
+                """
+            )
+
+        # (行ID, 予測時刻, 予測時の価格, レコード)
+        self._entries = deque(maxlen=window)
+        rows = self._conn.execute(
+            "SELECT * FROM reflection_records ORDER BY id DESC LIMIT ?", (window,)
+        ).fetchall()
+        for row in reversed(rows):
+            self._entries.append(self._load(row))
+
+    def _load(self, row):
+        (
+            row_id,
+            time,
+            price,
+            prediction_time,
+            report,
+            article_ids,
+            prediction,
+            actual_result,
+        ) = row
+        articles = []
+        for key in json.loads(article_ids):
+            article = self._conn.execute(
+                "SELECT article FROM reflection_articles WHERE id = ?", (key,)
+            ).fetchone()
+            if article is not None:
+                articles.append(json.loads(article[0]))
+
+        record = {
+            "prediciton_time": prediction_time,
+            "technical_analysis_report": json.loads(report),
+            "news_articles": articles,
+            "prediction": json.loads(prediction),
+            "actual_result": json.loads(actual_result),
+        }
+        return row_id, datetime.fromisoformat(time), price, record
+
+    def history(self):
+        """プロンプトに使う直近window件のレコードのリスト"""
+        return [record for _, _, _, record in self._entries]
+
+    def last(self):
+        """最新のレコード(なければNone)"""
+        return self._entries[-1][3] if self._entries else None
+
+    def append(self, current_time, price, record):
+        """
+        レコードを追加する
+
+        Args:
+            current_time: 予測時刻
+            price: 予測時の価格(次回の実績の評価に使う)
+            record: make_recordの出力
+        """
+        articles = record["news_articles"]
+        ids = [article_id(article) for article in articles]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO reflection_articles VALUES (?, ?)",
+                [(key, _dumps(article)) for key, article in zip(ids, articles)],
+            )
+            cursor = self._conn.execute(
+                """
+                INSERT INTO reflection_records (
+                    time, price, prediction_time, technical_analysis_report,
+                    article_ids, prediction, actual_result
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    current_time.isoformat(),
+                    price,
+                    record["prediciton_time"],
+                    _dumps(record["technical_analysis_report"]),
+                    _dumps(ids),
+                    _dumps(record["prediction"]),
+                    _dumps(record["actual_result"]),
+                ),
+            )
+            self._entries.append((cursor.lastrowid, current_time, price, record))
+
+    def update(self, record):
+        """レコードの予測(理由)と実績の変更を保存する"""
+        with self._lock:
+            for row_id, _, _, entry in self._entries:
+                if entry is record:
+                    break
+            else:
+                return  # 既にwindowから外れたレコード
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE reflection_records SET prediction = ?, actual_result = ? WHERE id = ?",
+                    (
+                        _dumps(record["prediction"]),
+                        _dumps(record["actual_result"]),
+                        row_id,
+                    ),
+                )
+
+    def discard_last(self):
+        """最新のレコードを削除する(空いた分は保存済みの古いレコードで補う)"""
+        with self._lock, self._conn:
+            row_id, _, _, _ = self._entries.pop()
+            self._conn.execute("DELETE FROM reflection_records WHERE id = ?", (row_id,))
+
+            oldest_id = self._entries[0][0] if self._entries else row_id
+            row = self._conn.execute(
+                "SELECT * FROM reflection_records WHERE id < ? ORDER BY id DESC LIMIT 1",
+                (oldest_id,),
+            ).fetchone()
+            if row is not None:
+                self._entries.appendleft(self._load(row))
+
+    def resume(self, current_time):
+        """
+        起動時に前回の予測の続きから再開できるか判定する
+
+        最新のレコードの実績が未評価で、同じ時間帯(1時間以内)に予測したものであれば
+        次回の評価に使う予測時の価格を返す。それより古い場合は実績を評価できないため
+        レコードを削除する。
+
+        Returns:
+            float: 前回予測時の価格(再開できない場合はNone)
+        """
+        if not self._entries or self._entries[-1][3]["actual_result"] is not None:
+            return None
+
+        _, time, price, _ = self._entries[-1]
+        if time.strftime("%Y%m%d%H") == current_time.strftime("%Y%m%d%H"):
+            return price
+
+        self.discard_last()
+        return None
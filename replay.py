@@ -0,0 +1,297 @@
+import json
+from datetime import timedelta
+from functools import partial
+
+import pandas as pd
+
+from compact_prompt import build_prompt_within_limit
+from llm_cache import LLMCache
+from llm_predictor import (
+    ResponseStore,
+    build_prompt,
+    evaluate_prediction,
+    llm_model,
+    make_record,
+    parse_prediction,
+)
+from news_analyzer import load_news_snapshots
+from technical_analyzer import technical_analysis
+from utils import print_log
+
+
+def load_klines(path):
+    """
+    保存済みのローソク足データを読み込む関数
+
+    Args:
+        path: get_data_for_daysの出力を保存したpklまたはcsvファイルのパス
+
+    Returns:
+        pd.DataFrame: 日本時間のopenTimeをインデックスとするローソク足データ
+    """
+    if path.endswith(".pkl"):
+        klines = pd.read_pickle(path)
+    else:
+        klines = pd.read_csv(path, index_col=0)
+        klines.index = pd.to_datetime(klines.index)
+
+    if klines.index.tz is None:
+        klines.index = klines.index.tz_localize("Asia/Tokyo")
+    else:
+        klines.index = klines.index.tz_convert("Asia/Tokyo")
+
+    return klines.sort_index()
+
+
+def technical_stub_model(prompt, technical_analysis_report, news_articles):
+    """
+    テクニカル分析の総合シグナルをそのまま予測とするスタブモデル
+
+    応答ストアに記録がないサイクルをAPIを呼ばずに埋めるために使用する。
+    """
+    return json.dumps(
+        {
+            "prediction": technical_analysis_report["signal"],
+            "confidence": technical_analysis_report["confidence"],
+            "reasoning": "stub: technical_analysisの総合シグナル",
+        },
+        ensure_ascii=False,
+    )
+
+
+class ReplayEngine:
+    """
+    保存済みのローソク足とニュースのスナップショットからLLM Botの各サイクルを再現するエンジン
+
+    gmo_ml_bot_with_llm.pyと同じ手順でテクニカル分析とプロンプトを組み立て、
+    LLMの応答は応答ストア(プロンプトのハッシュ値がキー)から、記録がなければ
+    スタブモデルから解決する。APIを呼ばないため数か月分のサイクルを数分で再現できる。
+    """
+
+    def __init__(
+        self,
+        klines,
+        news_snapshots=None,
+        response_store=None,
+        stub_model=technical_stub_model,
+        model=llm_model,
+        days=10,
+        reflection_history_window=6,
+        size=0.01,
+        prompt_format="compact",
+        prompt_token_limit=4000,
+    ):
+        """
+        Args:
+            klines: 1時間足のローソク足データ(load_klinesの出力)
+            news_snapshots: load_news_snapshotsの出力、またはそのファイルのパス
+            response_store: LLMCacheかResponseStore、またはそのファイルのパス
+                (拡張子が.dbの場合はLLMCache、それ以外はResponseStoreとして開く)
+            stub_model: 応答ストアに記録がない場合に使う関数(Noneの場合は予測しない)
+            model: 応答ストアの検索に使うモデル名
+            days: テクニカル分析に使う日数(Botのget_data_for_daysと合わせること)
+            reflection_history_window: リフレクションに使用する予測履歴のサイズ
+            size: 損益計算に使う注文数量
+            prompt_format: プロンプトの形式(Botと同じ"compact"、記録が古い場合は"full")
+            prompt_token_limit: 短縮形式のプロンプトのトークン数の上限(Botと合わせること)
+        """
+        self.klines = klines.astype(float)
+
+        if isinstance(news_snapshots, str):
+            news_snapshots = load_news_snapshots(news_snapshots)
+        self.news_snapshots = news_snapshots or []
+        self.news_times = pd.DatetimeIndex(
+            [pd.Timestamp(t).tz_localize(None) for t, _ in self.news_snapshots]
+        )
+
+        if isinstance(response_store, str):
+            if response_store.endswith(".db"):
+                response_store = LLMCache(response_store)
+            else:
+                response_store = ResponseStore(response_store)
+        self.response_store = response_store
+        self.stub_model = stub_model
+        self.model = model
+        self.days = days
+        self.reflection_history_window = reflection_history_window
+        self.size = size
+        if prompt_format == "compact":
+            self.build_prompt = partial(
+                build_prompt_within_limit, max_tokens=prompt_token_limit, log=False
+            )
+        elif prompt_format == "full":
+            self.build_prompt = build_prompt
+        else:
+            raise ValueError(f"プロンプトの形式が不正です: {prompt_format}")
+
+        self.stats = {"store": 0, "stub": 0, "miss": 0}
+
+    def window_start(self, current_time):
+        """Botのget_data_for_days(days=self.days)が返すデータの開始時刻"""
+        # 日本時間朝6：00に新しい日付に切り替わる
+        if current_time.hour > 6:
+            end_date = current_time.normalize()
+        else:
+            end_date = (current_time - timedelta(days=1)).normalize()
+
+        return end_date - timedelta(days=self.days - 1) + timedelta(hours=6)
+
+    def get_news(self, current_time):
+        """current_time時点で取得済みだった最新のニュースを返す"""
+        if len(self.news_times) == 0:
+            return []
+
+        pos = self.news_times.searchsorted(current_time.tz_localize(None), side="right")
+        if pos == 0:
+            return []
+
+        return self.news_snapshots[pos - 1][1]
+
+    def resolve(self, prompt, technical_analysis_report, news_articles):
+        """
+        プロンプトに対するLLMの応答を解決する
+
+        Returns:
+            tuple: (応答本文, 解決元 store/stub/miss)
+        """
+        if self.response_store is not None:
+            content = self.response_store.get(prompt, model=self.model)
+            if content is not None:
+                return content, "store"
+
+        if self.stub_model is not None:
+            content = self.stub_model(prompt, technical_analysis_report, news_articles)
+            return content, "stub"
+
+        return None, "miss"
+
+    def run(self, start=None, end=None):
+        """
+        指定期間のサイクルを再現する
+
+        Args:
+            start: 再現を開始するサイクル時刻
+            end: 再現を終了するサイクル時刻
+
+        Returns:
+            pd.DataFrame: サイクル時刻をインデックスとする予測と損益の記録
+        """
+        closes = self.klines["close"]
+        cycle_times = self.klines.index + timedelta(hours=1)
+        if start is not None:
+            cycle_times = cycle_times[
+                cycle_times >= pd.Timestamp(start, tz="Asia/Tokyo")
+            ]
+        if end is not None:
+            cycle_times = cycle_times[cycle_times <= pd.Timestamp(end, tz="Asia/Tokyo")]
+
+        reflection_history = []
+        previous_price = None
+        results = []
+
+        for current_time in cycle_times:
+            target_time = current_time - timedelta(hours=1)
+            price = closes.loc[target_time]
+
+            X = self.klines.loc[self.window_start(current_time) : target_time]
+            technical_analysis_report = technical_analysis(X)
+
+            news_articles = self.get_news(current_time)
+
+            # 前回の予測レコードの実績を更新
+            if len(reflection_history) > 0 and previous_price is not None:
+                last_record = reflection_history[-1]
+                if last_record["actual_result"] is None:
+                    last_record["actual_result"] = evaluate_prediction(
+                        last_record["prediction"]["prediction"],
+                        price,
+                        previous_price,
+                    )
+
+            # Botと同じくタイムゾーンなしの時刻でプロンプトを組み立てる
+            bot_time = current_time.tz_localize(None).to_pydatetime()
+            prompt = self.build_prompt(
+                bot_time, technical_analysis_report, news_articles, reflection_history
+            )
+            content, source = self.resolve(
+                prompt, technical_analysis_report, news_articles
+            )
+            self.stats[source] += 1
+
+            row = {
+                "time": current_time,
+                "price": price,
+                "source": source,
+                "prediction": None,
+                "confidence": None,
+                "side": 0,
+            }
+            if content is not None:
+                prediction, confidence, reasoning = parse_prediction(content)
+                reflection_history.append(
+                    make_record(
+                        bot_time,
+                        technical_analysis_report,
+                        news_articles,
+                        prediction,
+                        confidence,
+                        reasoning,
+                    )
+                )
+                if len(reflection_history) > self.reflection_history_window:
+                    reflection_history = reflection_history[
+                        -self.reflection_history_window :
+                    ]
+                previous_price = price
+
+                row["prediction"] = prediction
+                row["confidence"] = confidence
+                row["side"] = {"bullish": 1, "bearish": -1}.get(prediction, 0)
+
+            results.append(row)
+
+        result_df = pd.DataFrame(results).set_index("time")
+        # 次のサイクルまでポジションを保有した場合の損益
+        result_df["price_diff"] = result_df["price"].shift(-1) - result_df["price"]
+        result_df["profit"] = result_df["side"] * result_df["price_diff"] * self.size
+
+        print_log(
+            f"リプレイが完了しました: cycles={len(result_df)}, "
+            f"store={self.stats['store']}, stub={self.stats['stub']}, miss={self.stats['miss']}",
+            notify=False,
+        )
+
+        return result_df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM Botのオフラインリプレイ")
+    parser.add_argument("klines", help="ローソク足データ(pkl/csv)")
+    parser.add_argument("--news", default=None, help="ニュースのスナップショット")
+    parser.add_argument(
+        "--responses", default=None, help="LLM応答の記録(LLMCacheの.dbまたはJSONL)"
+    )
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--output", default="replay_result.csv")
+    parser.add_argument(
+        "--prompt-format",
+        choices=["compact", "full"],
+        default="compact",
+        help="プロンプトの形式(応答記録を取得したBotと合わせる)",
+    )
+    args = parser.parse_args()
+
+    engine = ReplayEngine(
+        load_klines(args.klines),
+        news_snapshots=args.news,
+        response_store=args.responses,
+        prompt_format=args.prompt_format,
+    )
+    result_df = engine.run(start=args.start, end=args.end)
+    result_df.to_csv(args.output)
+
+    print(engine.stats)
+    print("Profit during replay period: ", int(result_df["profit"].sum()))
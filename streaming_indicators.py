@@ -0,0 +1,438 @@
+import math
+from collections import deque
+
+from indicators import ewm_alpha
+from technical_analyzer import (
+    build_technical_analysis_report,
+    decide_mean_reversion_signal,
+    decide_momentum_signal,
+    decide_stat_arb_signal,
+    decide_trend_signal,
+    decide_volatility_signal,
+    series_hurst_exponent,
+)
+
+
+class EwmState:
+    """
+    Running value of pandas' ewm(span=span, adjust=adjust).mean()
+
+    One step of the recursion used by indicators.ewm_mean, so feeding a series
+    value by value gives the same result bit for bit.
+    """
+
+    def __init__(self, span, adjust=True):
+        alpha = ewm_alpha(span)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = 1.0 if adjust else alpha
+        self.adjust = adjust
+
+        self.value = math.nan
+        self.old_wt = 1.0
+        self.started = False
+
+    def update(self, x):
+        if not self.started:
+            self.started = True
+            self.value = x
+            return self.value
+
+        weighted = self.value
+        if weighted == weighted:
+            if x == x:
+                self.old_wt *= self.old_wt_factor
+                if weighted != x:
+                    weighted = self.old_wt * weighted + self.new_wt * x
+                    weighted /= self.old_wt + self.new_wt
+                if self.adjust:
+                    self.old_wt += self.new_wt
+                else:
+                    self.old_wt = 1.0
+            else:
+                self.old_wt *= self.old_wt_factor
+        elif x == x:
+            weighted = x
+
+        self.value = weighted
+        return self.value
+
+
+class RollingWindow:
+    """
+    Rolling statistics of the last window values, updated in O(1)
+
+    Keeps running power sums of the values relative to a shift point. The sums
+    are rebuilt from the buffer once every window updates, which bounds the
+    accumulated rounding error at an amortised O(1) cost. As with pandas'
+    rolling(window) the statistics are NaN until the window is full and while
+    it contains a NaN.
+    """
+
+    def __init__(self, window, moments=2):
+        self.window = window
+        self.moments = moments
+
+        self.values = deque()
+        self.nan_count = 0
+        self.shift = 0.0
+        self.sums = [0.0] * moments
+        self.since_rebuild = 0
+
+    def push(self, x):
+        self.values.append(x)
+        if x == x:
+            self._add(x, 1.0)
+        else:
+            self.nan_count += 1
+
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self._add(old, -1.0)
+            else:
+                self.nan_count -= 1
+
+        self.since_rebuild += 1
+        if self.since_rebuild >= self.window:
+            self._rebuild()
+
+    def _add(self, x, sign):
+        d = x - self.shift
+        p = d
+        for k in range(self.moments):
+            self.sums[k] += sign * p
+            p *= d
+
+    def _rebuild(self):
+        self.since_rebuild = 0
+        valid = [v for v in self.values if v == v]
+        self.shift = sum(valid) / len(valid) if valid else 0.0
+        self.sums = [0.0] * self.moments
+        for v in valid:
+            self._add(v, 1.0)
+
+    @property
+    def full(self):
+        return len(self.values) == self.window and self.nan_count == 0
+
+    def sum(self):
+        if not self.full:
+            return math.nan
+        return self.shift * self.window + self.sums[0]
+
+    def mean(self):
+        if not self.full:
+            return math.nan
+        return self.shift + self.sums[0] / self.window
+
+    def std(self):
+        if not self.full:
+            return math.nan
+        n = self.window
+        var = (self.sums[1] - self.sums[0] * self.sums[0] / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def skew_kurt(self):
+        """Bias-corrected sample skewness and excess kurtosis, as in pandas"""
+        if not self.full:
+            return math.nan, math.nan
+
+        n = float(self.window)
+        s1, s2, s3, s4 = (x / n for x in self.sums[:4])
+        m2 = s2 - s1 * s1
+        m3 = s3 - 3 * s1 * s2 + 2 * s1**3
+        m4 = s4 - 4 * s1 * s3 + 6 * s1 * s1 * s2 - 3 * s1**4
+        if m2 <= 0:
+            return math.nan, math.nan
+
+        skew = math.sqrt(n * (n - 1)) / (n - 2) * m3 / m2**1.5
+        kurt = (n + 1) * (n - 1) / ((n - 2) * (n - 3)) * m4 / (m2 * m2) - 3 * (
+            n - 1
+        ) ** 2 / ((n - 2) * (n - 3))
+        return skew, kurt
+
+
+class StreamingTechnicalAnalyzer:
+    """
+    Stateful version of technical_analysis() updated one bar at a time
+
+    Seed it once with the price history, then call update() with each new
+    bar as it closes; every indicator is carried forward in constant time, so
+    report() is available immediately without recomputing the history. The
+    report is the same as technical_analysis() over the bars in the window:
+    signals and confidences match, and metrics agree up to floating-point
+    rounding of the running sums. The window holds every bar fed so far until
+    drop_before() moves its start forward.
+
+    Example:
+        analyzer = StreamingTechnicalAnalyzer(prices_df)
+        analyzer.update(new_bar)
+        analyzer.drop_before(window_start)
+        report = analyzer.report()
+    """
+
+    def __init__(self, prices_df=None, max_lag=20, period=14):
+        self.n_bars = 0
+        self.last = None
+        self.last_time = None
+        self.period = period
+
+        # Trend, with the (time, high, low, close) of the bars in the window
+        # to replay the EWMs from when the window start moves
+        self._reset_trend()
+        self.bars = deque()
+
+        # Mean reversion
+        self.close_50 = RollingWindow(50)
+        self.close_20 = RollingWindow(20)
+        self.gain_14 = RollingWindow(14, moments=1)
+        self.loss_14 = RollingWindow(14, moments=1)
+        self.gain_28 = RollingWindow(28, moments=1)
+        self.loss_28 = RollingWindow(28, moments=1)
+
+        # Momentum
+        self.returns_21 = RollingWindow(21, moments=1)
+        self.returns_63 = RollingWindow(63, moments=1)
+        self.returns_126 = RollingWindow(126, moments=1)
+        self.volume_21 = RollingWindow(21, moments=1)
+
+        # Volatility
+        self.returns_std_21 = RollingWindow(21)
+        self.hist_vol_63 = RollingWindow(63)
+        self.tr_14 = RollingWindow(period, moments=1)
+        self.hist_vol = math.nan
+
+        # Statistical arbitrage
+        self.returns_moments_63 = RollingWindow(63, moments=4)
+        self.max_lag = max_lag
+
+        if prices_df is not None:
+            self.seed(prices_df)
+
+    def seed(self, prices_df):
+        """
+        Feed the price history
+
+        Args:
+            prices_df: DataFrame with open, high, low, close and volume columns
+        """
+        columns = ["open", "high", "low", "close", "volume"]
+        rows = prices_df[columns].to_numpy(dtype=float).tolist()
+        for time, row in zip(prices_df.index, rows):
+            self._update(*row, time=time)
+
+    def update(self, bar, time=None):
+        """
+        Feed one closed bar
+
+        Args:
+            bar: Mapping with open, high, low, close and volume (str or number)
+            time: Open time of the bar, used by drop_before (defaults to
+                bar.name, the index of a DataFrame row)
+        """
+        if time is None:
+            time = getattr(bar, "name", None)
+        self._update(
+            float(bar["open"]),
+            float(bar["high"]),
+            float(bar["low"]),
+            float(bar["close"]),
+            float(bar["volume"]),
+            time=time,
+        )
+
+    def drop_before(self, start):
+        """
+        Move the start of the window to the first bar at or after start
+
+        The report then matches technical_analysis() over the bars from start
+        onwards. The EWMs, whose recursion has no inverse step, are replayed
+        from the new first bar at a cost of O(window) once per call. The
+        rolling windows already cover only their last 14 to 126 bars, so they
+        stay exact as long as the window is longer than that.
+
+        Args:
+            start: Open time of the first bar to keep
+
+        Returns:
+            int: Number of bars dropped
+        """
+        dropped = 0
+        while self.bars and self.bars[0][0] is not None and self.bars[0][0] < start:
+            self.bars.popleft()
+            dropped += 1
+
+        if dropped:
+            self._replay_trend()
+        return dropped
+
+    def _update(self, open_, high, low, close, volume, time=None):
+        prev = self.last
+        self.last = (open_, high, low, close, volume)
+        self.last_time = time
+        self.n_bars += 1
+
+        if prev is None:
+            returns = math.nan
+            delta = 0.0  # The first difference is NaN in pandas and filled with 0
+        else:
+            returns = close / prev[3] - 1
+            delta = close - prev[3]
+        tr, plus_dm, minus_dm = _movement(
+            None if prev is None else prev[1:4], high, low, close
+        )
+
+        # Trend
+        self._update_trend(close, tr, plus_dm, minus_dm)
+
+        # Mean reversion
+        self.close_50.push(close)
+        self.close_20.push(close)
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self.gain_14.push(gain)
+        self.loss_14.push(loss)
+        self.gain_28.push(gain)
+        self.loss_28.push(loss)
+
+        # Momentum
+        self.returns_21.push(returns)
+        self.returns_63.push(returns)
+        self.returns_126.push(returns)
+        self.volume_21.push(volume)
+
+        # Volatility
+        self.returns_std_21.push(returns)
+        self.hist_vol = self.returns_std_21.std() * math.sqrt(252)
+        self.hist_vol_63.push(self.hist_vol)
+        self.tr_14.push(tr)
+
+        # Statistical arbitrage
+        self.returns_moments_63.push(returns)
+        self.bars.append((time, high, low, close))
+
+    def _update_trend(self, close, tr, plus_dm, minus_dm):
+        self.ema_8.update(close)
+        self.ema_21.update(close)
+        self.ema_55.update(close)
+        tr_ewm = self.tr.update(tr)
+        plus_di = _divide(100 * self.plus_dm.update(plus_dm), tr_ewm)
+        minus_di = _divide(100 * self.minus_dm.update(minus_dm), tr_ewm)
+        self.adx.update(_divide(100 * abs(plus_di - minus_di), plus_di + minus_di))
+
+    def _reset_trend(self):
+        self.ema_8 = EwmState(8, adjust=False)
+        self.ema_21 = EwmState(21, adjust=False)
+        self.ema_55 = EwmState(55, adjust=False)
+        self.plus_dm = EwmState(self.period)
+        self.minus_dm = EwmState(self.period)
+        self.tr = EwmState(self.period)
+        self.adx = EwmState(self.period)
+
+    def _replay_trend(self):
+        self._reset_trend()
+        prev = None
+        for _, high, low, close in self.bars:
+            self._update_trend(close, *_movement(prev, high, low, close))
+            prev = (high, low, close)
+
+    def hurst_exponent(self):
+        """Same value as calculate_hurst_exponent over the close prices in the window"""
+        # technical_analysis passes the closes as a Series, for which the
+        # value does not depend on the prices
+        return series_hurst_exponent(self.max_lag)
+
+    def report(self):
+        """
+        Technical analysis report for the latest bar
+
+        Returns:
+            dict: Same structure as technical_analysis()
+        """
+        if self.last is None:
+            raise ValueError("No bars have been fed")
+
+        close = self.last[3]
+        volume = self.last[4]
+
+        return build_technical_analysis_report(
+            {
+                "trend": decide_trend_signal(
+                    self.ema_8.value,
+                    self.ema_21.value,
+                    self.ema_55.value,
+                    self.adx.value,
+                ),
+                "mean_reversion": decide_mean_reversion_signal(
+                    _divide(
+                        close - self.close_50.mean(),
+                        self.close_50.std(),
+                    ),
+                    self._price_vs_bb(close),
+                    _rsi(self.gain_14, self.loss_14),
+                    _rsi(self.gain_28, self.loss_28),
+                ),
+                "momentum": decide_momentum_signal(
+                    self.returns_21.sum(),
+                    self.returns_63.sum(),
+                    self.returns_126.sum(),
+                    _divide(volume, self.volume_21.mean()),
+                ),
+                "volatility": self._volatility_signal(close),
+                "stat_arb": decide_stat_arb_signal(
+                    self.hurst_exponent(), *self.returns_moments_63.skew_kurt()
+                ),
+            }
+        )
+
+    def _price_vs_bb(self, close):
+        sma_20 = self.close_20.mean()
+        std_20 = self.close_20.std()
+        bb_upper = sma_20 + std_20 * 2
+        bb_lower = sma_20 - std_20 * 2
+        return _divide(close - bb_lower, bb_upper - bb_lower)
+
+    def _volatility_signal(self, close):
+        hist_vol = self.hist_vol
+        vol_ma = self.hist_vol_63.mean()
+        vol_regime = _divide(hist_vol, vol_ma)
+        vol_z = _divide(hist_vol - vol_ma, self.hist_vol_63.std())
+        atr_ratio = self.tr_14.mean() / close
+        return decide_volatility_signal(hist_vol, vol_regime, vol_z, atr_ratio)
+
+
+def _movement(prev, high, low, close):
+    """
+    True range and directional movement of a bar
+
+    prev is the (high, low, close) of the previous bar. The first bar
+    (prev is None) falls back to high - low and no movement,
+    as indicators.true_range and indicators.directional_movement do.
+
+    Returns:
+        tuple: (tr, plus_dm, minus_dm)
+    """
+    if prev is None:
+        return high - low, 0.0, 0.0
+
+    prev_high, prev_low, prev_close = prev
+    tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+    up_move = high - prev_high
+    down_move = prev_low - low
+    plus_dm = up_move if up_move > down_move and up_move > 0 else 0.0
+    minus_dm = down_move if down_move > up_move and down_move > 0 else 0.0
+    return tr, plus_dm, minus_dm
+
+
+def _divide(a, b):
+    """a / b with the NumPy semantics pandas uses (x / 0 is inf, 0 / 0 is NaN)"""
+    if b == 0:
+        if a != a or a == 0:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _rsi(gain, loss):
+    rs = _divide(gain.mean(), loss.mean())
+    return 100 - (100 / (1 + rs))
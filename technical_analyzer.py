@@ -1,8 +1,31 @@
+import functools
 import math
 
 import numpy as np
 import pandas as pd
 
+import indicators
+
+# Thresholds of the strategy signals, shared with the batched report in
+# technical_batch.py
+strategy_weights = {
+    "trend": 0.25,
+    "mean_reversion": 0.20,
+    "momentum": 0.25,
+    "volatility": 0.15,
+    "stat_arb": 0.15,
+}
+combined_signal_threshold = 0.2
+mean_reversion_z_threshold = 2
+mean_reversion_bb_thresholds = (0.2, 0.8)
+momentum_weights = (0.4, 0.3, 0.3)
+momentum_threshold = 0.05
+volume_confirmation_threshold = 1.0
+volatility_regime_thresholds = (0.8, 1.2)
+volatility_z_threshold = 1
+hurst_threshold = 0.4
+skew_threshold = 1
+
 
 def technical_analysis(prices_df):
     """
@@ -13,33 +36,96 @@ def technical_analysis(prices_df):
     4. Volatility Analysis
     5. Statistical Arbitrage Signals
     """
-    prices_df[prices_df.columns] = prices_df[prices_df.columns].astype(float)
+    prices_df = prices_df.astype(float)
+    # Series used by more than one strategy are computed once
+    shared = SharedIntermediates(prices_df)
 
-    trend_signals = calculate_trend_signals(prices_df)
-    mean_reversion_signals = calculate_mean_reversion_signals(prices_df)
-    momentum_signals = calculate_momentum_signals(prices_df)
-    volatility_signals = calculate_volatility_signals(prices_df)
-    stat_arb_signals = calculate_stat_arb_signals(prices_df)
+    trend_signals = calculate_trend_signals(prices_df, shared)
+    mean_reversion_signals = calculate_mean_reversion_signals(prices_df, shared)
+    momentum_signals = calculate_momentum_signals(prices_df, shared)
+    volatility_signals = calculate_volatility_signals(prices_df, shared)
+    stat_arb_signals = calculate_stat_arb_signals(prices_df, shared)
 
-    # Combine all signals using a weighted ensemble approach
-    strategy_weights = {
-        "trend": 0.25,
-        "mean_reversion": 0.20,
-        "momentum": 0.25,
-        "volatility": 0.15,
-        "stat_arb": 0.15,
-    }
-    combined_signal = weighted_signal_combination(
+    return build_technical_analysis_report(
         {
             "trend": trend_signals,
             "mean_reversion": mean_reversion_signals,
             "momentum": momentum_signals,
             "volatility": volatility_signals,
             "stat_arb": stat_arb_signals,
-        },
-        strategy_weights,
+        }
     )
 
+
+class SharedIntermediates:
+    """
+    Intermediate series of a price frame shared by the strategy functions
+
+    Each value is computed on first access and reused afterwards, so the
+    returns, the true range and the price changes behind both RSIs are
+    computed once per report. They are computed exactly as the calculate_*
+    wrappers do, so sharing them does not change the report.
+    """
+
+    def __init__(self, prices_df):
+        self.prices_df = prices_df
+
+    @functools.cached_property
+    def close(self):
+        return _column(self.prices_df, "close")
+
+    @functools.cached_property
+    def high(self):
+        return _column(self.prices_df, "high")
+
+    @functools.cached_property
+    def low(self):
+        return _column(self.prices_df, "low")
+
+    @functools.cached_property
+    def returns(self):
+        """close.pct_change() as a Series"""
+        return self.prices_df["close"].pct_change()
+
+    @functools.cached_property
+    def true_range(self):
+        return indicators.true_range(self.high, self.low, self.close)
+
+    @functools.cached_property
+    def price_changes(self):
+        """(gain, loss) of the close-to-close changes"""
+        return indicators.price_changes(self.close)
+
+    @functools.cached_property
+    def hurst_exponent(self):
+        """calculate_hurst_exponent of the close Series"""
+        close = self.prices_df["close"]
+        if close.index.is_unique:
+            # The lagged slices align label by label, which always gives this
+            # value; skip subtracting the 18 pairs of slices
+            return series_hurst_exponent()
+        return calculate_hurst_exponent(close)
+
+
+def build_technical_analysis_report(signals):
+    """
+    Combine the five strategy signals into the technical analysis report
+
+    Args:
+        signals: dict with trend, mean_reversion, momentum, volatility and stat_arb signals
+
+    Returns:
+        dict: Technical analysis report
+    """
+    trend_signals = signals["trend"]
+    mean_reversion_signals = signals["mean_reversion"]
+    momentum_signals = signals["momentum"]
+    volatility_signals = signals["volatility"]
+    stat_arb_signals = signals["stat_arb"]
+
+    # Combine all signals using a weighted ensemble approach
+    combined_signal = weighted_signal_combination(signals, strategy_weights)
+
     # Generate detailed analysis report
     technical_analysis_report = {
         "signal": combined_signal["signal"],
@@ -81,29 +167,39 @@ def technical_analysis(prices_df):
     return technical_analysis_report
 
 
-def calculate_trend_signals(prices_df):
+def calculate_trend_signals(prices_df, shared=None):
     """
     Advanced trend following strategy using multiple timeframes and indicators
     """
+    shared = shared or SharedIntermediates(prices_df)
+    close = shared.close
+
     # Calculate EMAs for multiple timeframes
-    ema_8 = calculate_ema(prices_df, 8)
-    ema_21 = calculate_ema(prices_df, 21)
-    ema_55 = calculate_ema(prices_df, 55)
+    ema_8 = indicators.ema(close, 8)
+    ema_21 = indicators.ema(close, 21)
+    ema_55 = indicators.ema(close, 55)
 
     # Calculate ADX for trend strength
-    adx = calculate_adx(prices_df, 14)
+    adx, _, _ = indicators.adx(shared.high, shared.low, close, 14, shared.true_range)
+
+    return decide_trend_signal(ema_8[-1], ema_21[-1], ema_55[-1], adx[-1])
+
 
+def decide_trend_signal(ema_8, ema_21, ema_55, adx):
+    """
+    Trend following signal from the latest EMA and ADX values
+    """
     # Determine trend direction and strength
     short_trend = ema_8 > ema_21
     medium_trend = ema_21 > ema_55
 
     # Combine signals with confidence weighting
-    trend_strength = adx["adx"].iloc[-1] / 100.0
+    trend_strength = adx / 100.0
 
-    if short_trend.iloc[-1] and medium_trend.iloc[-1]:
+    if short_trend and medium_trend:
         signal = "bullish"
         confidence = trend_strength
-    elif not short_trend.iloc[-1] and not medium_trend.iloc[-1]:
+    elif not short_trend and not medium_trend:
         signal = "bearish"
         confidence = trend_strength
     else:
@@ -114,40 +210,50 @@ def calculate_trend_signals(prices_df):
         "signal": signal,
         "confidence": confidence,
         "metrics": {
-            "adx": float(adx["adx"].iloc[-1]),
+            "adx": float(adx),
             "trend_strength": float(trend_strength),
         },
     }
 
 
-def calculate_mean_reversion_signals(prices_df):
+def calculate_mean_reversion_signals(prices_df, shared=None):
     """
     Mean reversion strategy using statistical measures and Bollinger Bands
     """
+    shared = shared or SharedIntermediates(prices_df)
+    close = shared.close
+
     # Calculate z-score of price relative to moving average
-    ma_50 = prices_df["close"].rolling(window=50).mean()
-    std_50 = prices_df["close"].rolling(window=50).std()
-    z_score = (prices_df["close"] - ma_50) / std_50
+    rolling_50 = prices_df["close"].rolling(window=50)
+    ma_50 = rolling_50.mean()
+    std_50 = rolling_50.std()
+    z_score = (close[-1] - ma_50.iloc[-1]) / std_50.iloc[-1]
 
     # Calculate Bollinger Bands
-    bb_upper, bb_lower = calculate_bollinger_bands(prices_df)
+    bb_upper, bb_lower = indicators.bollinger_bands(close)
 
     # Calculate RSI with multiple timeframes
-    rsi_14 = calculate_rsi(prices_df, 14)
-    rsi_28 = calculate_rsi(prices_df, 28)
+    rsi_14 = indicators.rsi(close, 14, shared.price_changes)
+    rsi_28 = indicators.rsi(close, 28, shared.price_changes)
 
     # Mean reversion signals
-    price_vs_bb = (prices_df["close"].iloc[-1] - bb_lower.iloc[-1]) / (
-        bb_upper.iloc[-1] - bb_lower.iloc[-1]
-    )
+    price_vs_bb = (close[-1] - bb_lower[-1]) / (bb_upper[-1] - bb_lower[-1])
+
+    return decide_mean_reversion_signal(z_score, price_vs_bb, rsi_14[-1], rsi_28[-1])
 
+
+def decide_mean_reversion_signal(z_score, price_vs_bb, rsi_14, rsi_28):
+    """
+    Mean reversion signal from the latest z-score, Bollinger Band position and RSIs
+    """
     # Combine signals
-    if z_score.iloc[-1] < -2 and price_vs_bb < 0.2:
+    bb_lower, bb_upper = mean_reversion_bb_thresholds
+    if z_score < -mean_reversion_z_threshold and price_vs_bb < bb_lower:
         signal = "bullish"
-        confidence = min(abs(z_score.iloc[-1]) / 4, 1.0)
-    elif z_score.iloc[-1] > 2 and price_vs_bb > 0.8:
+        confidence = min(abs(z_score) / 4, 1.0)
+    elif z_score > mean_reversion_z_threshold and price_vs_bb > bb_upper:
         signal = "bearish"
-        confidence = min(abs(z_score.iloc[-1]) / 4, 1.0)
+        confidence = min(abs(z_score) / 4, 1.0)
     else:
         signal = "neutral"
         confidence = 0.5
@@ -156,20 +262,22 @@ def calculate_mean_reversion_signals(prices_df):
         "signal": signal,
         "confidence": confidence,
         "metrics": {
-            "z_score": float(z_score.iloc[-1]),
+            "z_score": float(z_score),
             "price_vs_bb": float(price_vs_bb),
-            "rsi_14": float(rsi_14.iloc[-1]),
-            "rsi_28": float(rsi_28.iloc[-1]),
+            "rsi_14": float(rsi_14),
+            "rsi_28": float(rsi_28),
         },
     }
 
 
-def calculate_momentum_signals(prices_df):
+def calculate_momentum_signals(prices_df, shared=None):
     """
     Multi-factor momentum strategy
     """
+    shared = shared or SharedIntermediates(prices_df)
+
     # Price momentum
-    returns = prices_df["close"].pct_change()
+    returns = shared.returns
     mom_21 = returns.rolling(21).sum()
     mom_63 = returns.rolling(63).sum()
     mom_126 = returns.rolling(126).sum()
@@ -181,16 +289,26 @@ def calculate_momentum_signals(prices_df):
     # Relative strength
     # (would compare to market/sector in real implementation)
 
+    return decide_momentum_signal(
+        mom_21.iloc[-1], mom_63.iloc[-1], mom_126.iloc[-1], volume_momentum.iloc[-1]
+    )
+
+
+def decide_momentum_signal(mom_21, mom_63, mom_126, volume_momentum):
+    """
+    Momentum signal from the latest price and volume momentum values
+    """
     # Calculate momentum score
-    momentum_score = (0.4 * mom_21 + 0.3 * mom_63 + 0.3 * mom_126).iloc[-1]
+    w_21, w_63, w_126 = momentum_weights
+    momentum_score = w_21 * mom_21 + w_63 * mom_63 + w_126 * mom_126
 
     # Volume confirmation
-    volume_confirmation = volume_momentum.iloc[-1] > 1.0
+    volume_confirmation = volume_momentum > volume_confirmation_threshold
 
-    if momentum_score > 0.05 and volume_confirmation:
+    if momentum_score > momentum_threshold and volume_confirmation:
         signal = "bullish"
         confidence = min(abs(momentum_score) * 5, 1.0)
-    elif momentum_score < -0.05 and volume_confirmation:
+    elif momentum_score < -momentum_threshold and volume_confirmation:
         signal = "bearish"
         confidence = min(abs(momentum_score) * 5, 1.0)
     else:
@@ -201,43 +319,53 @@ def calculate_momentum_signals(prices_df):
         "signal": signal,
         "confidence": confidence,
         "metrics": {
-            "momentum_21": float(mom_21.iloc[-1]),
-            "momentum_63": float(mom_63.iloc[-1]),
-            "momentum_126": float(mom_126.iloc[-1]),
-            "volume_momentum": float(volume_momentum.iloc[-1]),
+            "momentum_21": float(mom_21),
+            "momentum_63": float(mom_63),
+            "momentum_126": float(mom_126),
+            "volume_momentum": float(volume_momentum),
         },
     }
 
 
-def calculate_volatility_signals(prices_df):
+def calculate_volatility_signals(prices_df, shared=None):
     """
     Volatility-based trading strategy
     """
+    shared = shared or SharedIntermediates(prices_df)
+
     # Calculate various volatility metrics
-    returns = prices_df["close"].pct_change()
+    returns = shared.returns
 
     # Historical volatility
     hist_vol = returns.rolling(21).std() * math.sqrt(252)
 
     # Volatility regime detection
-    vol_ma = hist_vol.rolling(63).mean()
-    vol_regime = hist_vol / vol_ma
+    rolling_63 = hist_vol.rolling(63)
+    vol_ma = rolling_63.mean().iloc[-1]
+    vol_regime = hist_vol.iloc[-1] / vol_ma
 
     # Volatility mean reversion
-    vol_z_score = (hist_vol - vol_ma) / hist_vol.rolling(63).std()
+    vol_z_score = (hist_vol.iloc[-1] - vol_ma) / rolling_63.std().iloc[-1]
 
     # ATR ratio
-    atr = calculate_atr(prices_df)
-    atr_ratio = atr / prices_df["close"]
+    atr = indicators.atr(shared.high, shared.low, shared.close, tr=shared.true_range)
+    atr_ratio = atr[-1] / shared.close[-1]
+
+    return decide_volatility_signal(
+        hist_vol.iloc[-1], vol_regime, vol_z_score, atr_ratio
+    )
 
-    # Generate signal based on volatility regime
-    current_vol_regime = vol_regime.iloc[-1]
-    vol_z = vol_z_score.iloc[-1]
 
-    if current_vol_regime < 0.8 and vol_z < -1:
+def decide_volatility_signal(hist_vol, vol_regime, vol_z, atr_ratio):
+    """
+    Volatility signal from the latest volatility regime and its z-score
+    """
+    # Generate signal based on volatility regime
+    low_regime, high_regime = volatility_regime_thresholds
+    if vol_regime < low_regime and vol_z < -volatility_z_threshold:
         signal = "bullish"  # Low vol regime, potential for expansion
         confidence = min(abs(vol_z) / 3, 1.0)
-    elif current_vol_regime > 1.2 and vol_z > 1:
+    elif vol_regime > high_regime and vol_z > volatility_z_threshold:
         signal = "bearish"  # High vol regime, potential for contraction
         confidence = min(abs(vol_z) / 3, 1.0)
     else:
@@ -248,36 +376,44 @@ def calculate_volatility_signals(prices_df):
         "signal": signal,
         "confidence": confidence,
         "metrics": {
-            "historical_volatility": float(hist_vol.iloc[-1]),
-            "volatility_regime": float(current_vol_regime),
+            "historical_volatility": float(hist_vol),
+            "volatility_regime": float(vol_regime),
             "volatility_z_score": float(vol_z),
-            "atr_ratio": float(atr_ratio.iloc[-1]),
+            "atr_ratio": float(atr_ratio),
         },
     }
 
 
-def calculate_stat_arb_signals(prices_df):
+def calculate_stat_arb_signals(prices_df, shared=None):
     """
     Statistical arbitrage signals based on price action analysis
     """
+    shared = shared or SharedIntermediates(prices_df)
+
     # Calculate price distribution statistics
-    returns = prices_df["close"].pct_change()
+    returns = shared.returns
 
     # Skewness and kurtosis
-    skew = returns.rolling(63).skew()
-    kurt = returns.rolling(63).kurt()
+    skew, kurt = indicators.rolling_skew_kurt(returns.to_numpy(), 63)
 
     # Test for mean reversion using Hurst exponent
-    hurst = calculate_hurst_exponent(prices_df["close"])
+    hurst = shared.hurst_exponent
 
     # Correlation analysis
     # (would include correlation with related securities in real implementation)
 
+    return decide_stat_arb_signal(hurst, skew[-1], kurt[-1])
+
+
+def decide_stat_arb_signal(hurst, skew, kurt):
+    """
+    Statistical arbitrage signal from the Hurst exponent and the latest skew and kurtosis
+    """
     # Generate signal based on statistical properties
-    if hurst < 0.4 and skew.iloc[-1] > 1:
+    if hurst < hurst_threshold and skew > skew_threshold:
         signal = "bullish"
         confidence = (0.5 - hurst) * 2
-    elif hurst < 0.4 and skew.iloc[-1] < -1:
+    elif hurst < hurst_threshold and skew < -skew_threshold:
         signal = "bearish"
         confidence = (0.5 - hurst) * 2
     else:
@@ -289,8 +425,8 @@ def calculate_stat_arb_signals(prices_df):
         "confidence": confidence,
         "metrics": {
             "hurst_exponent": float(hurst),
-            "skewness": float(skew.iloc[-1]),
-            "kurtosis": float(kurt.iloc[-1]),
+            "skewness": float(skew),
+            "kurtosis": float(kurt),
         },
     }
 
@@ -320,9 +456,9 @@ def weighted_signal_combination(signals, weights):
         final_score = 0
 
     # Convert back to signal
-    if final_score > 0.2:
+    if final_score > combined_signal_threshold:
         signal = "bullish"
-    elif final_score < -0.2:
+    elif final_score < -combined_signal_threshold:
         signal = "bearish"
     else:
         signal = "neutral"
@@ -344,24 +480,20 @@ def normalize_pandas(obj):
 
 
 def calculate_rsi(prices_df: pd.DataFrame, period: int = 14) -> pd.Series:
-    delta = prices_df["close"].diff()
-    gain = (delta.where(delta > 0, 0)).fillna(0)
-    loss = (-delta.where(delta < 0, 0)).fillna(0)
-    avg_gain = gain.rolling(window=period).mean()
-    avg_loss = loss.rolling(window=period).mean()
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    rsi = indicators.rsi(_column(prices_df, "close"), period)
+    return pd.Series(rsi, index=prices_df.index)
 
 
 def calculate_bollinger_bands(
     prices_df: pd.DataFrame, window: int = 20
 ) -> tuple[pd.Series, pd.Series]:
-    sma = prices_df["close"].rolling(window).mean()
-    std_dev = prices_df["close"].rolling(window).std()
-    upper_band = sma + (std_dev * 2)
-    lower_band = sma - (std_dev * 2)
-    return upper_band, lower_band
+    upper_band, lower_band = indicators.bollinger_bands(
+        _column(prices_df, "close"), window
+    )
+    return (
+        pd.Series(upper_band, index=prices_df.index),
+        pd.Series(lower_band, index=prices_df.index),
+    )
 
 
 def calculate_ema(df: pd.DataFrame, window: int) -> pd.Series:
@@ -375,7 +507,7 @@ def calculate_ema(df: pd.DataFrame, window: int) -> pd.Series:
     Returns:
         pd.Series: EMA values
     """
-    return df["close"].ewm(span=window, adjust=False).mean()
+    return pd.Series(indicators.ema(_column(df, "close"), window), index=df.index)
 
 
 def calculate_adx(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
@@ -389,34 +521,10 @@ def calculate_adx(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
     Returns:
         DataFrame with ADX values
     """
-    # Calculate True Range
-    df["high_low"] = df["high"] - df["low"]
-    df["high_close"] = abs(df["high"] - df["close"].shift())
-    df["low_close"] = abs(df["low"] - df["close"].shift())
-    df["tr"] = df[["high_low", "high_close", "low_close"]].max(axis=1)
-
-    # Calculate Directional Movement
-    df["up_move"] = df["high"] - df["high"].shift()
-    df["down_move"] = df["low"].shift() - df["low"]
-
-    df["plus_dm"] = np.where(
-        (df["up_move"] > df["down_move"]) & (df["up_move"] > 0), df["up_move"], 0
-    )
-    df["minus_dm"] = np.where(
-        (df["down_move"] > df["up_move"]) & (df["down_move"] > 0), df["down_move"], 0
-    )
-
-    # Calculate ADX
-    df["+di"] = 100 * (
-        df["plus_dm"].ewm(span=period).mean() / df["tr"].ewm(span=period).mean()
+    adx, plus_di, minus_di = indicators.adx(
+        _column(df, "high"), _column(df, "low"), _column(df, "close"), period
     )
-    df["-di"] = 100 * (
-        df["minus_dm"].ewm(span=period).mean() / df["tr"].ewm(span=period).mean()
-    )
-    df["dx"] = 100 * abs(df["+di"] - df["-di"]) / (df["+di"] + df["-di"])
-    df["adx"] = df["dx"].ewm(span=period).mean()
-
-    return df[["adx", "+di", "-di"]]
+    return pd.DataFrame({"adx": adx, "+di": plus_di, "-di": minus_di}, index=df.index)
 
 
 def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
@@ -430,14 +538,17 @@ def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     Returns:
         pd.Series: ATR values
     """
-    high_low = df["high"] - df["low"]
-    high_close = abs(df["high"] - df["close"].shift())
-    low_close = abs(df["low"] - df["close"].shift())
+    atr = indicators.atr(
+        _column(df, "high"), _column(df, "low"), _column(df, "close"), period
+    )
+    return pd.Series(atr, index=df.index)
 
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = ranges.max(axis=1)
 
-    return true_range.rolling(period).mean()
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Read-only float view of a column (a converted copy if it is not float)"""
+    values = df[name].to_numpy(dtype=float).view()
+    values.flags.writeable = False
+    return values
 
 
 def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 20) -> float:
@@ -457,7 +568,10 @@ def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 20) -> floa
     lags = range(2, max_lag)
     # Add small epsilon to avoid log(0)
     tau = [
-        max(1e-8, np.sqrt(np.std(np.subtract(price_series[lag:], price_series[:-lag]))))
+        max(
+            1e-8,
+            np.sqrt(np.std(np.subtract(price_series[lag:], price_series[:-lag]))),
+        )
         for lag in lags
     ]
 
@@ -468,3 +582,93 @@ def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 20) -> floa
     except (ValueError, RuntimeWarning):
         # Return 0.5 (random walk) if calculation fails
         return 0.5
+
+
+@functools.lru_cache(maxsize=None)
+def series_hurst_exponent(max_lag: int = 20) -> float:
+    """
+    calculate_hurst_exponent of a pd.Series, which does not depend on the prices
+
+    Subtracting the two lagged slices of a Series aligns them on the index, so
+    every lagged difference is zero and tau stays at the 1e-8 floor for every
+    lag. The fit below is the one calculate_hurst_exponent runs on that tau.
+    """
+    lags = range(2, max_lag)
+    tau = [1e-8] * len(lags)
+    return np.polyfit(np.log(lags), np.log(tau), 1)[0]
+
+
+def calculate_rolling_hurst(
+    price_series: pd.Series, window: int = None, max_lag: int = 20
+) -> pd.Series:
+    """
+    Calculate the Hurst exponent for every window end in one pass
+
+    Equivalent to calling calculate_hurst_exponent on price_series over each
+    window. For an array, the sum and sum of squares of the lagged
+    differences inside each window are taken from cumulative sums for every
+    lag, and the slope of log(tau) on log(lag) comes from the closed-form
+    least-squares solution, so the cost is O(len(price_series) * max_lag)
+    overall. For a pd.Series every window gives series_hurst_exponent.
+
+    Args:
+        price_series: Array-like price data
+        window: Number of prices in each window (None for an expanding window
+            starting at the first price)
+        max_lag: Maximum lag for R/S calculation
+
+    Returns:
+        pd.Series: Hurst exponent at each position (NaN before the first full window)
+    """
+    prices = np.asarray(price_series, dtype=float)
+    n = len(prices)
+    ends = np.arange(n)
+    if window is None:
+        starts = np.zeros(n, dtype=int)
+    else:
+        starts = ends - window + 1
+
+    if isinstance(price_series, pd.Series):
+        hurst = np.full(n, series_hurst_exponent(max_lag))
+        hurst[starts < 0] = np.nan
+        return pd.Series(hurst, index=price_series.index)
+
+    lags = np.arange(2, max_lag)
+    log_lags = np.log(lags)
+    x_dev = log_lags - log_lags.mean()
+    slope = np.zeros(n)
+
+    for lag, weight in zip(lags, x_dev):
+        # Differences ending at position j = lag, ..., n - 1, centred so that
+        # the cumulative sums stay small
+        diffs = prices[lag:] - prices[:-lag]
+        diffs -= diffs.mean() if len(diffs) else 0.0
+        csum = np.r_[0.0, np.cumsum(diffs)]
+        csum_sq = np.r_[0.0, np.cumsum(diffs * diffs)]
+
+        # Number of differences that change from the previous one, counted
+        # exactly so that windows of equal differences are found even where
+        # the cumulative sums below cancel badly
+        changes = np.r_[0, 0, np.cumsum(diffs[1:] != diffs[:-1])][: len(diffs) + 1]
+
+        # Differences inside [start, end] end at positions start + lag, ..., end
+        lo = np.clip(starts, 0, len(diffs))
+        hi = np.clip(ends - lag + 1, lo, len(diffs))
+        count = hi - lo
+        equal = changes[hi] - changes[np.minimum(lo + 1, hi)] == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (csum[hi] - csum[lo]) / count
+            mean_sq = (csum_sq[hi] - csum_sq[lo]) / count
+            var = mean_sq - mean * mean
+            # Rounding error of the cumulative sums, which must not turn a
+            # constant window into a tiny positive variance
+            noise = 8 * np.finfo(float).eps * csum_sq[hi] / count
+        var[~(var > noise) | equal] = 0.0
+        tau = np.maximum(1e-8, np.sqrt(np.sqrt(var)))
+        tau[count <= 0] = 1e-8
+
+        slope += weight * np.log(tau)
+
+    hurst = slope / (x_dev * x_dev).sum()
+    hurst[starts < 0] = np.nan
+    return pd.Series(hurst)
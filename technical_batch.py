@@ -0,0 +1,250 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from technical_analyzer import (
+    calculate_rolling_hurst,
+    combined_signal_threshold,
+    hurst_threshold,
+    mean_reversion_bb_thresholds,
+    mean_reversion_z_threshold,
+    momentum_threshold,
+    momentum_weights,
+    skew_threshold,
+    strategy_weights,
+    volatility_regime_thresholds,
+    volatility_z_threshold,
+    volume_confirmation_threshold,
+)
+
+# Names of the strategies in the report, keyed by the names used internally
+report_names = {
+    "trend": "trend_following",
+    "mean_reversion": "mean_reversion",
+    "momentum": "momentum",
+    "volatility": "volatility",
+    "stat_arb": "statistical_arbitrage",
+}
+
+signal_names = np.array(["bearish", "neutral", "bullish"])
+
+
+def technical_analysis_batch(prices_df):
+    """
+    technical_analysis() for every bar of a price history at once
+
+    Row t holds the report technical_analysis(prices_df.iloc[: t + 1]) would
+    return, flattened into columns (see flatten_report). All indicators used
+    by the report only look back, so they are computed once over the whole
+    history, the Hurst exponent as an expanding window, and the signal rules
+    are applied column-wise with the thresholds of technical_analyzer.
+    Confidences are NaN where the report would have no value.
+
+    Args:
+        prices_df: DataFrame with open, high, low, close and volume columns
+
+    Returns:
+        pd.DataFrame: One row per bar, indexed like prices_df
+    """
+    close = prices_df["close"].to_numpy(dtype=float)
+    high = prices_df["high"].to_numpy(dtype=float)
+    low = prices_df["low"].to_numpy(dtype=float)
+    volume = prices_df["volume"].to_numpy(dtype=float)
+    returns = pd.Series(indicators.pct_change(close))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strategies = {
+            "trend": _trend(close, high, low),
+            "mean_reversion": _mean_reversion(close),
+            "momentum": _momentum(returns, volume),
+            "volatility": _volatility(close, high, low, returns),
+            "stat_arb": _stat_arb(close, returns),
+        }
+        final_score = _combine(strategies)
+
+    columns = {
+        "signal": _signal_names(
+            final_score > combined_signal_threshold,
+            final_score < -combined_signal_threshold,
+        ),
+        "confidence": _percent(np.abs(final_score)),
+    }
+    for strategy, (signal, confidence, metrics) in strategies.items():
+        name = report_names[strategy]
+        columns[f"{name}.signal"] = signal
+        columns[f"{name}.confidence"] = _percent(confidence)
+        for metric, values in metrics.items():
+            columns[f"{name}.{metric}"] = values
+
+    return pd.DataFrame(columns, index=prices_df.index)
+
+
+def technical_analysis_history(prices):
+    """
+    technical_analysis_batch() for several symbols
+
+    Args:
+        prices: dict of symbol -> DataFrame with OHLCV columns
+
+    Returns:
+        pd.DataFrame: Rows indexed by (symbol, bar time)
+    """
+    return pd.concat(
+        {symbol: technical_analysis_batch(df) for symbol, df in prices.items()},
+        names=["symbol"],
+    )
+
+
+def flatten_report(report):
+    """
+    Flatten a technical_analysis() report into the columns of technical_analysis_batch()
+
+    Args:
+        report: Technical analysis report
+
+    Returns:
+        dict: Column name -> value
+    """
+    row = {"signal": report["signal"], "confidence": report["confidence"]}
+    for name, strategy in report["strategy_signals"].items():
+        row[f"{name}.signal"] = strategy["signal"]
+        row[f"{name}.confidence"] = strategy["confidence"]
+        for metric, value in strategy["metrics"].items():
+            row[f"{name}.{metric}"] = value
+    return row
+
+
+def _signal_names(bullish, bearish):
+    """Signal name per bar; bullish takes precedence as in the if/elif rules"""
+    codes = np.where(bullish, 2, np.where(bearish, 0, 1))
+    return signal_names[codes]
+
+
+def _percent(confidence):
+    """round(confidence * 100) per bar, NaN where the confidence is NaN"""
+    return np.round(confidence * 100)
+
+
+def _strategy(bullish, bearish, confidence, metrics):
+    neutral = ~(bullish | bearish)
+    return (
+        _signal_names(bullish, bearish),
+        np.where(neutral, 0.5, confidence),
+        metrics,
+    )
+
+
+def _trend(close, high, low):
+    ema_8 = indicators.ema(close, 8)
+    ema_21 = indicators.ema(close, 21)
+    ema_55 = indicators.ema(close, 55)
+    adx, _, _ = indicators.adx(high, low, close, 14)
+
+    short_trend = ema_8 > ema_21
+    medium_trend = ema_21 > ema_55
+    trend_strength = adx / 100.0
+
+    return _strategy(
+        short_trend & medium_trend,
+        ~short_trend & ~medium_trend,
+        trend_strength,
+        {"adx": adx, "trend_strength": trend_strength},
+    )
+
+
+def _mean_reversion(close):
+    series = pd.Series(close)
+    z_score = (
+        (series - series.rolling(window=50).mean()) / series.rolling(window=50).std()
+    ).to_numpy()
+
+    bb_upper, bb_lower = indicators.bollinger_bands(close, 20)
+    price_vs_bb = (close - bb_lower) / (bb_upper - bb_lower)
+
+    bb_low, bb_high = mean_reversion_bb_thresholds
+    return _strategy(
+        (z_score < -mean_reversion_z_threshold) & (price_vs_bb < bb_low),
+        (z_score > mean_reversion_z_threshold) & (price_vs_bb > bb_high),
+        np.minimum(np.abs(z_score) / 4, 1.0),
+        {
+            "z_score": z_score,
+            "price_vs_bb": price_vs_bb,
+            "rsi_14": indicators.rsi(close, 14),
+            "rsi_28": indicators.rsi(close, 28),
+        },
+    )
+
+
+def _momentum(returns, volume):
+    mom_21 = returns.rolling(21).sum().to_numpy()
+    mom_63 = returns.rolling(63).sum().to_numpy()
+    mom_126 = returns.rolling(126).sum().to_numpy()
+    volume_momentum = volume / pd.Series(volume).rolling(21).mean().to_numpy()
+
+    w_21, w_63, w_126 = momentum_weights
+    momentum_score = w_21 * mom_21 + w_63 * mom_63 + w_126 * mom_126
+    volume_confirmation = volume_momentum > volume_confirmation_threshold
+
+    return _strategy(
+        (momentum_score > momentum_threshold) & volume_confirmation,
+        (momentum_score < -momentum_threshold) & volume_confirmation,
+        np.minimum(np.abs(momentum_score) * 5, 1.0),
+        {
+            "momentum_21": mom_21,
+            "momentum_63": mom_63,
+            "momentum_126": mom_126,
+            "volume_momentum": volume_momentum,
+        },
+    )
+
+
+def _volatility(close, high, low, returns):
+    hist_vol = returns.rolling(21).std() * math.sqrt(252)
+    vol_ma = hist_vol.rolling(63).mean()
+    vol_regime = (hist_vol / vol_ma).to_numpy()
+    vol_z = ((hist_vol - vol_ma) / hist_vol.rolling(63).std()).to_numpy()
+    atr_ratio = indicators.atr(high, low, close) / close
+
+    low_regime, high_regime = volatility_regime_thresholds
+    return _strategy(
+        (vol_regime < low_regime) & (vol_z < -volatility_z_threshold),
+        (vol_regime > high_regime) & (vol_z > volatility_z_threshold),
+        np.minimum(np.abs(vol_z) / 3, 1.0),
+        {
+            "historical_volatility": hist_vol.to_numpy(),
+            "volatility_regime": vol_regime,
+            "volatility_z_score": vol_z,
+            "atr_ratio": atr_ratio,
+        },
+    )
+
+
+def _stat_arb(close, returns):
+    skew, kurt = indicators.rolling_skew_kurt(returns.to_numpy(), 63)
+    # technical_analysis passes the close prices as a Series
+    hurst = calculate_rolling_hurst(pd.Series(close)).to_numpy()
+
+    mean_reverting = hurst < hurst_threshold
+    return _strategy(
+        mean_reverting & (skew > skew_threshold),
+        mean_reverting & (skew < -skew_threshold),
+        (0.5 - hurst) * 2,
+        {"hurst_exponent": hurst, "skewness": skew, "kurtosis": kurt},
+    )
+
+
+def _combine(strategies):
+    """Final score of weighted_signal_combination per bar"""
+    weighted_sum = 0
+    total_confidence = 0
+    for strategy, (signal, confidence, _) in strategies.items():
+        numeric_signal = np.select(
+            [signal == "bullish", signal == "bearish"], [1, -1], default=0
+        )
+        weight = strategy_weights[strategy]
+        weighted_sum = weighted_sum + numeric_signal * weight * confidence
+        total_confidence = total_confidence + weight * confidence
+
+    return np.where(total_confidence > 0, weighted_sum / total_confidence, 0)
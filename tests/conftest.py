@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# utilsは起動時にカレントディレクトリのconfig.iniを読み込むため、
+# テスト用の設定ファイルを置いた一時ディレクトリで実行する
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+workdir = tempfile.mkdtemp(prefix="gmo_ml_bot_tests_")
+with open(os.path.join(workdir, "config.ini"), "w", encoding="utf-8") as f:
+    f.write(
+        "[discord]\nDISCORD_WEBHOOK_URL =\n"
+        "[gmo]\napiKey =\nsecretKey =\n"
+        "[openai]\napiKey =\n"
+    )
+os.chdir(workdir)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from bootstrap_analysis import block_bootstrap, circular_blocks
+
+
+@pytest.mark.parametrize("n", [5, 23])
+def test_block_bootstrap_shorter_than_block_size(n):
+    returns = np.random.default_rng(0).normal(0, 0.01, n)
+    result = block_bootstrap(returns, n_resamples=100, block_size=24, seed=0)
+
+    assert result["sharpe"].shape == (100,)
+    # ブロックが系列全体になるため、どのリサンプルも元の系列の循環シフトになる
+    np.testing.assert_allclose(result["final_profit_rate"], returns.sum())
+
+
+def test_block_bootstrap_requires_two_returns():
+    with pytest.raises(ValueError):
+        block_bootstrap([0.01], n_resamples=10)
+
+
+def test_circular_blocks_rejects_block_longer_than_returns():
+    with pytest.raises(ValueError):
+        circular_blocks(np.zeros(5), 24)
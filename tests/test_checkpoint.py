@@ -0,0 +1,89 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import checkpoint
+from checkpoint import CheckpointStore, cycle_id, reconcile_positions
+
+state = {
+    "cycle": "2024011110",
+    "trade_num": 3,
+    "default_available": 100000,
+    "previous_available": 101000,
+    "position_side": "BUY",
+}
+
+
+@pytest.fixture
+def logs(monkeypatch):
+    logs = []
+    monkeypatch.setattr(
+        checkpoint, "print_log", lambda message, **kwargs: logs.append(message)
+    )
+    return logs
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints" / "bot.json"))
+    assert store.load() is None
+
+    store.save(state)
+    store.save({**state, "trade_num": 4})
+
+    assert CheckpointStore(store.path).load() == {**state, "trade_num": 4}
+    assert os.listdir(tmp_path / "checkpoints") == ["bot.json"]
+
+
+def test_failed_save_keeps_the_previous_state(tmp_path):
+    store = CheckpointStore(str(tmp_path / "bot.json"))
+    store.save(state)
+
+    # JSONに変換できない状態は一時ファイルを消して前回の状態を残す
+    with pytest.raises(TypeError):
+        store.save({**state, "cycle": datetime(2024, 1, 11, 11)})
+
+    assert store.load() == state
+    assert os.listdir(tmp_path) == ["bot.json"]
+
+
+def test_broken_checkpoint_loads_as_none(tmp_path, logs):
+    path = tmp_path / "bot.json"
+    path.write_text(json.dumps(state)[:20], encoding="utf-8")
+
+    assert CheckpointStore(str(path)).load() is None
+    assert len(logs) == 1
+
+
+def test_cycle_id_identifies_the_hour():
+    assert cycle_id(datetime(2024, 1, 11, 10, 59, 59)) == "2024011110"
+
+
+def positions(*sides):
+    return {"data": {"list": [{"side": side} for side in sides]}}
+
+
+def test_matching_positions_keep_the_trade_count(logs):
+    assert reconcile_positions(state, positions("BUY")) == 3
+    assert reconcile_positions({**state, "position_side": None}, {"data": {}}) == 3
+    assert logs == []
+
+
+@pytest.mark.parametrize(
+    "saved_side, actual",
+    [("BUY", positions()), ("BUY", positions("SELL")), (None, positions("BUY"))],
+)
+def test_mismatched_positions_are_reported(logs, saved_side, actual):
+    trade_num = reconcile_positions({**state, "position_side": saved_side}, actual)
+
+    assert trade_num == 3
+    assert len(logs) == 1
+
+
+def test_open_position_without_trades_counts_as_one_trade(logs):
+    # 損益率を確認するため、建玉があれば取引回数を1以上にする
+    saved = {**state, "trade_num": 0, "position_side": None}
+
+    assert reconcile_positions(saved, positions("SELL")) == 1
+    assert reconcile_positions(saved, positions()) == 0
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import execution_sync
+from execution_sync import ExecutionSync, to_trade
+from ledger import Ledger
+
+start = datetime(2024, 1, 10, 1, 0, 5, tzinfo=timezone.utc)
+
+
+def make_execution(execution_id, position_id, side, settle_type, price, loss_gain=0):
+    return {
+        "executionId": execution_id,
+        "orderId": 1000 + execution_id,
+        "positionId": position_id,
+        "symbol": "BTC_JPY",
+        "side": side,
+        "settleType": settle_type,
+        "size": "0.01",
+        "price": str(price),
+        "lossGain": str(loss_gain),
+        "fee": "0",
+        "timestamp": (start + timedelta(hours=execution_id)).isoformat(),
+    }
+
+
+def round_trips(n):
+    """建玉ごとに新規の買いと決済の売りを1件ずつ作成する"""
+    executions = []
+    for i in range(n):
+        executions.append(make_execution(2 * i + 1, i, "BUY", "OPEN", 100 + i))
+        executions.append(make_execution(2 * i + 2, i, "SELL", "CLOSE", 110 + i, 10))
+    return executions
+
+
+class FakeExchange:
+    """latestExecutionsと同じく新しい順にページ単位で約定を返す"""
+
+    def __init__(self, executions):
+        self.executions = executions
+        self.pages = []
+
+    def get_latest_executions(self, symbol, page=1, count=100):
+        self.pages.append(page)
+        rows = sorted(self.executions, key=lambda e: -e["executionId"])
+        return rows[(page - 1) * count : page * count]
+
+    def get_executions(self, order_ids):
+        return [e for e in self.executions if e["orderId"] in order_ids]
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    exchange = FakeExchange([])
+    monkeypatch.setattr(
+        execution_sync, "get_latest_executions", exchange.get_latest_executions
+    )
+    monkeypatch.setattr(execution_sync, "get_executions", exchange.get_executions)
+    return exchange
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = Ledger(str(tmp_path / "trading.db"))
+    yield ledger
+    ledger.close()
+
+
+def test_sync_is_idempotent(exchange, ledger):
+    exchange.executions = round_trips(3)
+    sync = ExecutionSync(ledger)
+
+    assert [trade[0] for trade in sync.sync()] == [2, 4, 6]
+    assert sync.sync() == []
+
+    # 同期の位置を失って同じ約定を読み直しても重複して記録しない
+    ledger.set_state("latest_execution_id", 0)
+    assert sync.sync() == []
+    assert ledger.cumulative_profit() == 30
+    (count,) = ledger._conn.execute("SELECT COUNT(*) FROM executions").fetchone()
+    assert count == 6
+
+
+def test_fetch_latest_stops_at_the_persisted_cursor(exchange, ledger):
+    exchange.executions = round_trips(150)  # 300件
+    sync = ExecutionSync(ledger)
+    ledger.set_state("latest_execution_id", 150)
+
+    trades = sync.sync()
+
+    # 新しい順に100件ずつ読み、IDが150以下の約定を含む2ページ目で止める
+    assert exchange.pages == [1, 2]
+    assert ledger.get_state("latest_execution_id") == "300"
+    assert [trade[0] for trade in trades] == list(range(152, 301, 2))
+
+    exchange.pages = []
+    exchange.executions += round_trips(151)[-2:]
+    assert [trade[0] for trade in sync.sync()] == [302]
+    assert exchange.pages == [1]
+
+
+def test_close_without_open_execution(exchange, ledger):
+    # 新規の約定が取得範囲外の建玉は決済の約定だけで記録する
+    exchange.executions = round_trips(2)[1:]
+    sync = ExecutionSync(ledger)
+
+    trades = sync.sync()
+
+    assert trades[0] == (2, "2024-01-10 12:00:00", 1, None, 110, 10)
+    assert trades[1] == (4, "2024-01-10 13:00:00", 1, 101, 111, 10)
+
+
+@pytest.mark.parametrize("close_side, position", [("SELL", 1), ("BUY", -1)])
+def test_to_trade_infers_the_position_from_the_close(close_side, position):
+    row = (7, close_side, 110.0, -3.0, "2024-01-10T21:30:00+00:00", None, None, None)
+
+    # 日付は日本時間の1時間単位
+    assert to_trade(row) == (7, "2024-01-11 06:00:00", position, None, 110, -3)
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from input_gatherer import InputGatherer
+
+
+def test_each_source_waits_for_its_own_timeout():
+    gatherer = InputGatherer()
+    release = threading.Event()
+    gatherer.start()
+    gatherer.submit("price", 1, lambda: 100.0)
+    gatherer.submit("news", 0.05, release.wait)
+
+    started_at = time.monotonic()
+    assert gatherer.result("price") == 100.0
+    assert gatherer.result("news", default=[]) == []
+    assert time.monotonic() - started_at < 1
+    with pytest.raises(TimeoutError):
+        gatherer.result("news")
+    release.set()
+
+
+def test_failed_source_raises_unless_default_is_given():
+    gatherer = InputGatherer()
+    gatherer.start()
+    gatherer.submit("available", 1, lambda: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        gatherer.result("available")
+    assert gatherer.result("available", default=None) is None
+
+
+def test_cancel_drops_sources_that_have_not_started():
+    gatherer = InputGatherer(max_workers=1)
+    release = threading.Event()
+    calls = []
+    gatherer.start()
+    gatherer.submit("technicals", 1, release.wait)
+    gatherer.submit("news", 1, calls.append, "news")
+
+    gatherer.cancel()
+    release.set()
+    gatherer._executor.shutdown(wait=True)
+
+    assert calls == []
+    with pytest.raises(KeyError):
+        gatherer.result("news")
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import kernels
+from benchmark import make_synthetic_klines
+
+
+@pytest.fixture(params=["numpy", "numba"])
+def backend(request):
+    if request.param not in kernels.available_backends:
+        pytest.skip(f"{request.param} is not installed")
+    with kernels.use_backend(request.param):
+        yield request.param
+
+
+def make_returns(seed):
+    values = make_synthetic_klines(2000, seed=seed)["close"].pct_change()
+    values.iloc[[300, 301, 1200]] = np.nan  # 欠損値
+    values.iloc[1600:1650] = 0.0  # RSIの損失が0の区間
+    return values
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rolling_skew_kurt_matches_pandas(backend, seed):
+    values = make_returns(seed)
+    skew, kurt = kernels.rolling_skew_kurt(values, 63)
+
+    np.testing.assert_allclose(skew, values.rolling(63).skew(), rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(kurt, values.rolling(63).kurt(), rtol=1e-7, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("adjust", [True, False])
+def test_ewm_mean_matches_pandas_exactly(backend, seed, adjust):
+    values = make_returns(seed)
+
+    np.testing.assert_array_equal(
+        kernels.ewm_mean(values, 14, adjust=adjust),
+        values.ewm(span=14, adjust=adjust).mean(),
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rolling_mean_matches_pandas(backend, seed):
+    values = make_returns(seed)
+    gain = values.clip(lower=0).fillna(0)
+
+    np.testing.assert_allclose(
+        kernels.rolling_mean(gain, 14), gain.rolling(14).mean(), rtol=1e-9, atol=1e-15
+    )
+    np.testing.assert_allclose(
+        kernels.rolling_mean(values, 14), values.rolling(14).mean(), rtol=1e-9
+    )
+
+
+def test_use_backend_restores_the_previous_backend(backend):
+    with kernels.use_backend("numpy"):
+        assert kernels.get_backend() == "numpy"
+    assert kernels.get_backend() == backend
+
+
+def test_set_backend_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.set_backend("cuda")
@@ -0,0 +1,76 @@
+import sqlite3
+
+from ledger import Ledger
+
+
+def create_old_ledger(path, trades):
+    """主キーのない旧形式のtradingテーブルを作成する(gmo_ml_bot.pyの初期版と同じ)"""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            """
+            CREATE TABLE trading (
+                trade_id INTEGER,
+                date STRING,
+                position INTEGER,
+                order_price INTEGER,
+                close_price INTEGER,
+                loss_gain INTEGER
+            )
+            """
+        )
+        conn.executemany("INSERT INTO trading values(?, ?, ?, ?, ?, ?)", trades)
+    conn.close()
+
+
+def test_old_trading_table_is_migrated(tmp_path):
+    path = str(tmp_path / "trading.db")
+    create_old_ledger(
+        path,
+        [
+            (1, "2024-01-10 10:00:00", 1, 100, 110, 10),
+            (1, "2024-01-10 10:00:00", 1, 100, 110, 10),  # 重複
+            (2, "2024-01-10 11:00:00", -1, 110, 115, -5),
+            (None, "2024-01-10 12:00:00", 1, 115, 120, 5),  # IDのない行
+            (3, "2024-01-11 09:00:00", 1, 115, 135, 20),
+        ],
+    )
+
+    ledger = Ledger(path)
+
+    rows = ledger._conn.execute("SELECT * FROM trading ORDER BY trade_id").fetchall()
+    assert [row[0] for row in rows] == [1, 2, 3]
+    tables = {
+        name
+        for (name,) in ledger._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+    assert "trading_old" not in tables
+    # 集計は移行した取引から作り直す
+    assert ledger.daily_summary("2024-01-10") == {
+        "trades": 2,
+        "wins": 1,
+        "loss_gain": 5,
+        "win_rate": 0.5,
+    }
+    assert ledger.daily_summary("2024-01-11")["trades"] == 1
+    assert ledger.cumulative_profit() == 25
+
+    # 移行後は保存済みの取引を重複して保存しない
+    assert ledger.record_trades([(2, "2024-01-10 11:00:00", -1, 110, 115, -5)]) == 0
+    assert ledger.record_trades([(4, "2024-01-11 10:00:00", -1, 135, 130, 5)]) == 1
+    assert ledger.cumulative_profit() == 30
+    ledger.close()
+
+
+def test_migration_runs_only_once(tmp_path):
+    path = str(tmp_path / "trading.db")
+    create_old_ledger(path, [(1, "2024-01-10 10:00:00", 1, 100, 110, 10)])
+    Ledger(path).close()
+
+    ledger = Ledger(path)
+
+    assert ledger.daily_summary("2024-01-10")["trades"] == 1
+    assert ledger.cumulative_profit() == 10
+    ledger.close()
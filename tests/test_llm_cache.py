@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+
+from compact_prompt import build_prompt_within_limit
+from llm_cache import LLMCache
+from llm_predictor import cycle_start, llm_model
+
+report = {"signal": "bullish", "confidence": 60, "strategy_signals": {}}
+articles = [{"title": "BTC", "description": "news", "published": "", "link": ""}]
+
+
+def build_prompt(current_time):
+    return build_prompt_within_limit(
+        cycle_start(current_time), report, articles, [], max_tokens=4000, log=False
+    )
+
+
+def test_retry_within_the_hour_hits_the_cache(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    content = json.dumps({"prediction": "bullish", "confidence": 60, "reasoning": ""})
+    cache.put(build_prompt(datetime(2024, 1, 11, 10, 0, 3)), content, model=llm_model)
+
+    # 同じ時間内の再試行・再起動は秒が違ってもキャッシュから応答する
+    retry = cache.lookup(build_prompt(datetime(2024, 1, 11, 10, 4, 51)), llm_model)
+    assert retry is not None
+    assert retry["content"] == content
+    # 次のサイクルは新しく問い合わせる
+    assert (
+        cache.lookup(build_prompt(datetime(2024, 1, 11, 11, 0, 3)), llm_model) is None
+    )
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_without_prediction_is_not_stored(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    prompt = build_prompt(datetime(2024, 1, 11, 10, 0, 3))
+
+    # 予測のキーが欠けたJSONは例外を送出せずに保存を見送る
+    cache.put(prompt, json.dumps({"confidence": 60}), model=llm_model)
+
+    assert cache.lookup(prompt, llm_model) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from llm_predictor import StreamingPrediction
+
+
+def test_streaming_prediction_with_missing_key_falls_back_to_neutral():
+    content = json.dumps({"prediction": "bullish", "reasoning": "no confidence"})
+    stream = StreamingPrediction([content[:10], content[10:]])
+
+    assert stream.decision(timeout=5) == ("neutral", 0)
+    assert stream.result(timeout=5) == content
+
+
+def test_streaming_prediction_survives_failing_callbacks():
+    def fail(stream):
+        raise RuntimeError("callback failed")
+
+    called = []
+    stream = StreamingPrediction(iter([]))
+    stream.result(timeout=5)
+    stream.add_done_callback(fail)
+    stream.add_done_callback(called.append)
+
+    assert called == [stream]
+
+
+def test_streaming_prediction_raises_receive_errors():
+    def chunks():
+        yield '{"prediction": '
+        raise ConnectionError("stream closed")
+
+    stream = StreamingPrediction(chunks())
+
+    with pytest.raises(ConnectionError):
+        stream.decision(timeout=5)
+    with pytest.raises(ConnectionError):
+        stream.result(timeout=5)
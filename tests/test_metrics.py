@@ -0,0 +1,55 @@
+import socket
+import threading
+from unittest import mock
+
+import pytest
+
+import trade
+from metrics import Metrics
+from tracer import tracer
+
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.inc("bot_errors_total", endpoint='a\\b"c\nd')
+
+    assert 'bot_errors_total{endpoint="a\\\\b\\"c\\nd"} 1' in m.render().splitlines()
+
+
+def test_serve_raises_oserror_when_port_is_in_use():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        with pytest.raises(OSError):
+            Metrics().serve(port=sock.getsockname()[1])
+
+
+def test_trade_request_errors_are_counted(monkeypatch):
+    m = Metrics()
+    monkeypatch.setattr(tracer, "_listeners", [m.on_span])
+    response = mock.Mock(status_code=500, json=lambda: {"status": 5})
+
+    with mock.patch.object(trade.requests, "get", return_value=response):
+        with pytest.raises(Exception):
+            trade.get_position()
+
+    assert m.counters[("bot_errors_total", (("endpoint", "get_position"),))] == 1
+
+
+def test_concurrent_increments_are_not_lost():
+    m = Metrics()
+
+    def work():
+        for _ in range(10000):
+            m.inc("bot_cycles_total")
+            m.set("bot_position", 1)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        m.render()
+    for thread in threads:
+        thread.join()
+
+    assert "bot_cycles_total 80000" in m.render().splitlines()
@@ -0,0 +1,96 @@
+import pickle
+import time
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+
+class ConstantModel:
+    def __init__(self, proba):
+        self.proba = proba
+
+    def predict_proba(self, X):
+        return [[1 - self.proba, self.proba]]
+
+
+def save_model(model_dir, name, proba):
+    with open(model_dir / name, "wb") as f:
+        pickle.dump(ConstantModel(proba), f)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def logs(monkeypatch):
+    logs = []
+    monkeypatch.setattr(
+        model_registry, "print_log", lambda message, **kwargs: logs.append(message)
+    )
+    return logs
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    save_model(tmp_path, "a.pkl", 0.6)
+    return tmp_path
+
+
+def probas(models):
+    return [model.proba for model in models]
+
+
+def test_new_models_are_swapped_in_only_by_current(model_dir, logs):
+    registry = ModelRegistry(str(model_dir), interval=0.02)
+    registry.start()
+    try:
+        save_model(model_dir, "b.pkl", 0.8)
+        wait_until(lambda: registry._pending is not None)
+
+        # 次のサイクルでcurrentを呼ぶまでは現在のモデルを使い続ける
+        assert probas(registry.models) == [0.6]
+        assert probas(registry.current()) == [0.6, 0.8]
+        assert probas(registry.current()) == [0.6, 0.8]
+        assert [name for name, _, _ in registry.version] == ["a.pkl", "b.pkl"]
+    finally:
+        registry.stop()
+
+
+def test_models_that_fail_validation_are_rejected(model_dir, logs):
+    registry = ModelRegistry(str(model_dir), interval=0.02)
+    registry.start()
+    try:
+        save_model(model_dir, "b.pkl", 1.5)
+        wait_until(lambda: any("検証に失敗" in message for message in logs))
+        time.sleep(0.2)
+
+        assert registry._pending is None
+        assert probas(registry.current()) == [0.6]
+        # 失敗した版は再び変化するまで読み込まない
+        assert sum("検証に失敗" in message for message in logs) == 1
+
+        save_model(model_dir, "b.pkl", 0.7)
+        wait_until(lambda: registry._pending is not None)
+        assert probas(registry.current()) == [0.6, 0.7]
+    finally:
+        registry.stop()
+
+
+@pytest.mark.parametrize("proba", [1.5, float("nan")])
+def test_invalid_initial_models_raise(tmp_path, proba):
+    save_model(tmp_path, "a.pkl", proba)
+
+    with pytest.raises(ValueError):
+        ModelRegistry(str(tmp_path))
+
+
+def test_empty_model_dir_raises(tmp_path):
+    with pytest.raises(ValueError):
+        ModelRegistry(str(tmp_path))
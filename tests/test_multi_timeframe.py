@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import make_synthetic_klines
+from multi_timeframe import (
+    align_features,
+    build_multi_timeframe_features,
+    build_timeframes,
+    calc_timeframe_features,
+    ohlcv_cols,
+    resample_ohlcv,
+)
+
+
+def minute_klines(n=3 * 24 * 60, seed=0):
+    return make_synthetic_klines(
+        n, freq="1min", end=pd.Timestamp("2025-03-31 05:59", tz="Asia/Tokyo"), seed=seed
+    )
+
+
+def pandas_resample(df, rule, offset=None):
+    agg = {"open": "first", "high": "max", "low": "min", "close": "last"}
+    agg["volume"] = "sum"
+    return df.resample(rule, offset=offset).agg(agg).dropna()
+
+
+@pytest.mark.parametrize("interval, rule", [("15min", "15min"), ("1hour", "1h")])
+def test_resample_matches_pandas(interval, rule):
+    df = minute_klines().iloc[7:-3]  # 境界の途中から始まり途中で終わる
+
+    expected = pandas_resample(df, rule)
+    actual = resample_ohlcv(df, interval)
+
+    pd.testing.assert_frame_equal(actual, expected, check_freq=False)
+    assert actual.index[0] == df.index[0].floor(rule)
+
+
+def test_resample_skips_missing_bars():
+    df = minute_klines()
+    df = df.drop(df.index[120:240])  # 2時間分の欠損
+
+    actual = resample_ohlcv(df, "1hour")
+
+    pd.testing.assert_frame_equal(actual, pandas_resample(df, "1h"), check_freq=False)
+    assert len(actual) == 72 - 2
+
+
+def test_resample_offset_moves_the_day_boundary():
+    df = minute_klines()
+
+    # UTCの21:00 = 日本時間の6:00を日付の境界とする
+    actual = resample_ohlcv(df, "1day", offset=pd.Timedelta(hours=21))
+
+    assert (actual.index.hour == 6).all()
+    assert actual.index.tz == df.index.tz
+    first_day = df.loc[: actual.index[1] - pd.Timedelta(minutes=1)]
+    assert actual["open"].iloc[0] == first_day["open"].iloc[0]
+    assert actual["high"].iloc[0] == first_day["high"].max()
+    assert actual["close"].iloc[0] == first_day["close"].iloc[-1]
+
+
+def test_build_timeframes_matches_direct_resampling():
+    df = minute_klines()
+
+    frames = build_timeframes(df, "1min", ["4hour", "15min", "1hour"])
+
+    assert list(frames) == ["1min", "15min", "1hour", "4hour"]
+    for interval in ["15min", "1hour", "4hour"]:
+        pd.testing.assert_frame_equal(
+            frames[interval], resample_ohlcv(df[ohlcv_cols], interval)
+        )
+    with pytest.raises(ValueError):
+        build_timeframes(frames["1hour"], "1hour", ["15min"])
+
+
+def test_align_features_uses_only_closed_bars():
+    df = minute_klines()
+    frames = build_timeframes(df, "1min", ["4hour"])
+    features = calc_timeframe_features(frames["4hour"])
+    decision_times = pd.date_range(
+        df.index[0], df.index[-1], freq="17min", tz=df.index.tz
+    )
+
+    aligned = align_features(features, "4hour", decision_times)
+
+    close_times = features.index + pd.Timedelta(hours=4)
+    for t, row in aligned.iterrows():
+        closed = features.loc[close_times <= t]
+        if closed.empty:
+            assert row.isna().all()
+        else:
+            pd.testing.assert_series_equal(row, closed.iloc[-1], check_names=False)
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_features_do_not_look_ahead(seed):
+    df = minute_klines(seed=seed)
+    full = build_multi_timeframe_features(df, windows=(5, 13))
+
+    # 判断時刻までのデータだけで作った特徴量と一致する
+    for open_time in full.index[30::7]:
+        decision_time = open_time + pd.Timedelta(hours=1)
+        partial = build_multi_timeframe_features(
+            df.loc[df.index < decision_time], windows=(5, 13)
+        )
+        assert partial.index[-1] == open_time
+        np.testing.assert_allclose(
+            partial.iloc[-1].to_numpy(), full.loc[open_time].to_numpy(), rtol=1e-9
+        )
+
+
+def test_unclosed_base_bar_is_dropped():
+    df = minute_klines().iloc[:-30]  # 最後の1時間足は30分しかない
+
+    features = build_multi_timeframe_features(df)
+
+    assert features.index[-1] == df.index[-1].floor("1h") - pd.Timedelta(hours=1)
+    assert "4hour_return" in features and "return" in features
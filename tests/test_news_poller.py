@@ -0,0 +1,94 @@
+import time
+from email.utils import formatdate
+from unittest import mock
+
+import pytest
+
+import news_poller
+from news_poller import NewsPoller
+
+feed_url = "https://example.com/rss"
+
+
+def make_rss(items):
+    body = "".join(
+        f"<item><title>{title}</title><link>{link}</link>"
+        f"<description>&lt;p&gt;{title}&lt;/p&gt;</description>"
+        f"<pubDate>{formatdate(published_at, usegmt=True)}</pubDate></item>"
+        for title, link, published_at in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{body}</channel></rss>'
+
+
+class FakeFeed:
+    """条件付きリクエストのヘッダを記録し、ETagが一致すれば304を返すフィード"""
+
+    def __init__(self, items):
+        self.items = items
+        self.etag = '"v1"'
+        self.modified = "Wed, 10 Jan 2024 00:00:00 GMT"
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if headers and headers.get("If-None-Match") == self.etag:
+            return mock.Mock(status_code=304)
+        return mock.Mock(
+            status_code=200,
+            content=make_rss(self.items).encode("utf-8"),
+            headers={"ETag": self.etag, "Last-Modified": self.modified},
+            raise_for_status=lambda: None,
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(news_poller.time, "time", lambda: now[0])
+    return now
+
+
+def make_poller(tmp_path, monkeypatch, feed):
+    monkeypatch.setattr(news_poller.requests, "get", feed.get)
+    return NewsPoller([feed_url], path=str(tmp_path / "news_index.db"))
+
+
+def test_unchanged_feed_is_not_parsed_again(tmp_path, monkeypatch, clock):
+    feed = FakeFeed([("BTC", "https://example.com/1", clock[0] - 3600)])
+    poller = make_poller(tmp_path, monkeypatch, feed)
+
+    assert poller.poll() == 1
+    assert feed.requests[0] == {}
+
+    # 2回目はETagとLast-Modifiedを送り、304の場合は解析しない
+    with mock.patch.object(news_poller.feedparser, "parse") as parse:
+        assert poller.poll() == 0
+    parse.assert_not_called()
+    assert feed.requests[1] == {
+        "If-None-Match": feed.etag,
+        "If-Modified-Since": feed.modified,
+    }
+    assert [a["title"] for a in poller.get_news_articles()] == ["BTC"]
+
+
+def test_articles_older_than_24_hours_are_pruned(tmp_path, monkeypatch, clock):
+    feed = FakeFeed(
+        [
+            ("new", "https://example.com/new", clock[0] - 3600),
+            ("old", "https://example.com/old", clock[0] - 23 * 3600),
+            ("expired", "https://example.com/expired", clock[0] - 25 * 3600),
+        ]
+    )
+    poller = make_poller(tmp_path, monkeypatch, feed)
+
+    assert poller.poll() == 2
+    articles = poller.get_news_articles()
+    assert [a["title"] for a in articles] == ["new", "old"]
+    assert articles[0]["description"] == "new"
+
+    # 2時間後には公開から25時間経った記事が索引から削除される
+    clock[0] += 2 * 3600
+    assert poller.poll() == 0
+    assert [a["title"] for a in poller.get_news_articles()] == ["new"]
+    (count,) = poller._conn.execute("SELECT COUNT(*) FROM articles").fetchone()
+    assert count == 1
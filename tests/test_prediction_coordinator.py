@@ -0,0 +1,115 @@
+import json
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import prediction_coordinator
+from llm_predictor import StreamingPrediction
+from prediction_coordinator import PredictionCoordinator
+
+
+class FakeModel:
+    def __init__(self, proba):
+        self.proba = proba
+
+    def predict_proba(self, X):
+        return [[1 - self.proba, self.proba]]
+
+
+@pytest.fixture(autouse=True)
+def features(monkeypatch):
+    X = pd.DataFrame({"return": [0.0], "return_std_5": [0.0], "sharpe_5": [0.0]})
+    monkeypatch.setattr(prediction_coordinator, "make_features", lambda *a, **k: X)
+
+
+def make_coordinator(tmp_path, models, **kwargs):
+    coordinator = PredictionCoordinator(
+        models, log_path=str(tmp_path / "fallbacks.jsonl"), **kwargs
+    )
+    coordinator.start(datetime(2024, 1, 11, 10, 0, 3))
+    return coordinator
+
+
+def response(prediction, confidence):
+    content = json.dumps(
+        {"prediction": prediction, "confidence": confidence, "reasoning": ""}
+    )
+    return StreamingPrediction([content])
+
+
+def stalled_response(release):
+    def chunks():
+        release.wait()
+        yield '{"prediction": "bearish", "confidence": 90, "reasoning": ""}'
+
+    return StreamingPrediction(chunks())
+
+
+def test_deadline_miss_falls_back_to_the_ensemble(tmp_path):
+    coordinator = make_coordinator(
+        tmp_path, [FakeModel(0.6), FakeModel(0.8)], deadline=0.1
+    )
+    release = threading.Event()
+
+    decision = coordinator.decide(stalled_response(release))
+    release.set()
+
+    assert decision["source"] == "ensemble"
+    assert decision["prediction"] == "bullish"
+    assert decision["confidence"] == 40.0
+    assert decision["ensemble_proba"] == pytest.approx(0.7)
+    assert coordinator.stats == {"llm": 0, "blend": 0, "ensemble": 1, "miss": 1}
+
+    # 締め切りの超過はJSONLに記録する
+    with open(tmp_path / "fallbacks.jsonl", encoding="utf-8") as f:
+        (record,) = [json.loads(line) for line in f]
+    assert record["time"] == "2024-01-11T10:00:03"
+    assert record["error"].startswith("TimeoutError")
+    assert record["fallback"] is True
+
+
+def test_deadline_miss_without_models_raises(tmp_path):
+    coordinator = make_coordinator(tmp_path, [], deadline=0.05)
+    release = threading.Event()
+
+    with pytest.raises(RuntimeError):
+        coordinator.decide(stalled_response(release))
+    release.set()
+    assert coordinator.stats["miss"] == 1
+
+
+def test_llm_in_time_is_used_as_is(tmp_path):
+    coordinator = make_coordinator(tmp_path, [FakeModel(0.7)])
+
+    decision = coordinator.decide(response("bearish", 80))
+
+    assert decision == {
+        "prediction": "bearish",
+        "confidence": 80.0,
+        "source": "llm",
+        "ensemble_proba": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "llm, expected",
+    [
+        # 0.5 * -0.8 + 0.5 * 0.5 = -0.15
+        (("bearish", 80), ("bearish", 15.0)),
+        # 0.5 * 0.2 + 0.5 * 0.5 = 0.35
+        (("bullish", 20), ("bullish", 35.0)),
+        # 0.5 * -0.5 + 0.5 * 0.5 = 0
+        (("bearish", 50), ("neutral", 0.0)),
+    ],
+)
+def test_llm_in_time_is_blended_with_the_ensemble(tmp_path, llm, expected):
+    coordinator = make_coordinator(tmp_path, [FakeModel(0.75)], ensemble_weight=0.5)
+
+    decision = coordinator.decide(response(*llm))
+
+    assert (decision["prediction"], decision["confidence"]) == expected
+    assert decision["source"] == "blend"
+    assert decision["ensemble_proba"] == 0.75
+    assert coordinator.stats["blend"] == 1
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from llm_predictor import make_record
+from reflection_store import ReflectionStore
+
+start = datetime(2024, 1, 11, 10, 0, 3)
+articles = [
+    {"title": "BTC", "link": "https://example.com/1", "description": "", "pub_date": ""}
+]
+
+
+def append_records(store, n):
+    records = []
+    for i in range(n):
+        current_time = start + timedelta(hours=i)
+        record = make_record(
+            current_time, {"signal": "bullish", "i": i}, articles, "bullish", 60, None
+        )
+        store.append(current_time, 100.0 + i, record)
+        records.append(record)
+    return records
+
+
+def indices(store):
+    return [record["technical_analysis_report"]["i"] for record in store.history()]
+
+
+def test_restart_loads_the_last_window(tmp_path):
+    path = str(tmp_path / "reflection.db")
+    store = ReflectionStore(path, window=3)
+    records = append_records(store, 5)
+    records[-1]["prediction"]["reasoning"] = "理由"
+    records[-1]["actual_result"] = "correct"
+    store.update(records[-1])
+
+    restarted = ReflectionStore(path, window=3)
+
+    assert indices(restarted) == [2, 3, 4]
+    assert restarted.history() == store.history()
+    assert restarted.last()["prediction"]["reasoning"] == "理由"
+    # 連続するサイクルで重複する記事は1回だけ保存する
+    (count,) = restarted._conn.execute(
+        "SELECT COUNT(*) FROM reflection_articles"
+    ).fetchone()
+    assert count == 1
+
+
+def test_discard_last_refills_the_window_from_disk(tmp_path):
+    path = str(tmp_path / "reflection.db")
+    store = ReflectionStore(path, window=3)
+    append_records(store, 5)
+
+    store.discard_last()
+
+    assert indices(store) == [1, 2, 3]
+    assert indices(ReflectionStore(path, window=3)) == [1, 2, 3]
+
+
+def test_resume_within_the_same_hour_keeps_the_prediction(tmp_path):
+    path = str(tmp_path / "reflection.db")
+    append_records(ReflectionStore(path), 2)
+    store = ReflectionStore(path)
+
+    assert store.resume(start + timedelta(hours=1, minutes=40)) == 101.0
+    assert indices(store) == [0, 1]
+
+
+def test_resume_after_the_hour_discards_the_unevaluated_prediction(tmp_path):
+    path = str(tmp_path / "reflection.db")
+    append_records(ReflectionStore(path), 2)
+    store = ReflectionStore(path)
+
+    assert store.resume(start + timedelta(hours=2, minutes=1)) is None
+    assert indices(store) == [0]
+    assert indices(ReflectionStore(path)) == [0]
+
+
+def test_resume_ignores_an_evaluated_prediction(tmp_path):
+    store = ReflectionStore(str(tmp_path / "reflection.db"))
+    (record,) = append_records(store, 1)
+    record["actual_result"] = "incorrect"
+    store.update(record)
+
+    assert store.resume(start) is None
+    assert indices(store) == [0]
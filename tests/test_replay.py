@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from compact_prompt import build_prompt_within_limit
+from llm_cache import LLMCache
+from llm_predictor import cycle_start, llm_model
+from news_analyzer import save_news_snapshot
+from replay import ReplayEngine
+from technical_analyzer import technical_analysis
+
+
+def make_klines(hours=24 * 12, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01 06:00", periods=hours, freq="h", tz="Asia/Tokyo")
+    close = 6_000_000 * np.exp(np.cumsum(rng.normal(0, 0.005, hours)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame(
+        {
+            "open": open_,
+            "high": np.maximum(open_, close) * 1.001,
+            "low": np.minimum(open_, close) * 0.999,
+            "close": close,
+            "volume": rng.uniform(1, 10, hours),
+        },
+        index=index,
+    )
+
+
+def test_replay_serves_responses_recorded_after_the_hour(tmp_path):
+    klines = make_klines()
+    articles = [{"title": "BTC", "description": "news", "published": "", "link": ""}]
+    content = json.dumps(
+        {"prediction": "bearish", "confidence": 70, "reasoning": "recorded"}
+    )
+    snapshot_path = str(tmp_path / "news_snapshots.jsonl")
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+
+    # Botは正時から37秒遅れて起動したサイクルで記録する
+    cycle_time = cycle_start(datetime(2024, 1, 11, 10, 0, 37))
+    cycle = pd.Timestamp(cycle_time, tz="Asia/Tokyo")
+    X = klines.loc[
+        ReplayEngine(klines).window_start(cycle) : cycle - pd.Timedelta(hours=1)
+    ]
+
+    save_news_snapshot(cycle_time, articles, snapshot_path)
+    prompt = build_prompt_within_limit(
+        cycle_time, technical_analysis(X), articles, [], max_tokens=4000, log=False
+    )
+    cache.put(prompt, content, model=llm_model)
+
+    engine = ReplayEngine(klines, news_snapshots=snapshot_path, response_store=cache)
+    result_df = engine.run(start=cycle_time, end=cycle_time)
+
+    assert engine.get_news(cycle) == articles
+    assert engine.stats == {"store": 1, "stub": 0, "miss": 0}
+    assert result_df.loc[cycle, "prediction"] == "bearish"
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+import pytest
+
+from benchmark import assert_report_close, make_synthetic_klines
+from streaming_indicators import StreamingTechnicalAnalyzer
+from technical_analyzer import technical_analysis
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_streaming_report_matches_technical_analysis(seed):
+    klines = make_synthetic_klines(400, seed=seed, as_str=True)
+    analyzer = StreamingTechnicalAnalyzer(klines.iloc[:10])
+
+    for i in range(10, len(klines)):
+        analyzer.update(klines.iloc[i])
+        if i % 37 == 0 or i == len(klines) - 1:
+            assert_report_close(
+                technical_analysis(klines.iloc[: i + 1]), analyzer.report(), rtol=1e-7
+            )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_streaming_report_matches_technical_analysis_over_the_bot_window(seed):
+    # Botと同じく直近10日間(朝6:00区切り)の窓に絞って比較する
+    klines = make_synthetic_klines(24 * 40, seed=seed, as_str=True)
+    analyzer = StreamingTechnicalAnalyzer(klines.iloc[: 24 * 30])
+
+    for i in range(24 * 30, len(klines)):
+        analyzer.update(klines.iloc[i])
+        current_time = klines.index[i] + timedelta(hours=1)
+        if current_time.hour > 6:
+            end_date = current_time.normalize()
+        else:
+            end_date = (current_time - timedelta(days=1)).normalize()
+        start = end_date - timedelta(days=9) + timedelta(hours=6)
+        analyzer.drop_before(start)
+
+        if i % 11 == 0 or i == len(klines) - 1:
+            assert_report_close(
+                technical_analysis(klines.loc[start : klines.index[i]]),
+                analyzer.report(),
+                rtol=1e-7,
+            )
+
+
+def test_drop_before_returns_the_number_of_dropped_bars():
+    klines = make_synthetic_klines(400, as_str=True)
+    analyzer = StreamingTechnicalAnalyzer(klines)
+
+    assert analyzer.drop_before(klines.index[100]) == 100
+    assert analyzer.drop_before(klines.index[100]) == 0
+    assert_report_close(
+        technical_analysis(klines.iloc[100:]), analyzer.report(), rtol=1e-7
+    )
+
+
+def test_report_requires_a_bar():
+    with pytest.raises(ValueError):
+        StreamingTechnicalAnalyzer().report()
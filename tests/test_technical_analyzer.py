@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+import kernels
+from technical_analyzer import (
+    build_technical_analysis_report,
+    calculate_hurst_exponent,
+    calculate_mean_reversion_signals,
+    calculate_momentum_signals,
+    calculate_rolling_hurst,
+    calculate_trend_signals,
+    calculate_volatility_signals,
+    decide_stat_arb_signal,
+    series_hurst_exponent,
+    technical_analysis,
+)
+
+
+def random_walk(n=500, seed=0):
+    steps = np.random.default_rng(seed).normal(0, 100, n)
+    index = pd.date_range("2024-01-01 06:00", periods=n, freq="h", tz="Asia/Tokyo")
+    return pd.Series(5_000_000 + steps.cumsum(), index=index)
+
+
+def test_hurst_exponent_of_series_keeps_index_alignment():
+    # Seriesの差分はインデックスで揃えられるため、価格によらず同じ値になる(従来の挙動)
+    for seed in range(3):
+        prices = random_walk(seed=seed)
+        assert calculate_hurst_exponent(prices) == series_hurst_exponent()
+        assert calculate_hurst_exponent(prices.iloc[-30:]) == series_hurst_exponent()
+
+
+def test_hurst_exponent_of_array_uses_lagged_differences():
+    assert calculate_hurst_exponent(random_walk().to_numpy()) > 0.1
+
+
+@pytest.mark.parametrize("window", [None, 5, 20, 240])
+def test_rolling_hurst_of_array_matches_calculate_hurst_exponent(window):
+    for seed in range(3):
+        prices = random_walk(600, seed).to_numpy()
+        hurst = calculate_rolling_hurst(prices, window=window)
+
+        for end in [*range(30), *range(30, len(prices), 7)]:
+            if window is not None and end < window - 1:
+                assert np.isnan(hurst.iloc[end])
+                continue
+            start = 0 if window is None else end - window + 1
+            expected = calculate_hurst_exponent(prices[start : end + 1])
+            assert hurst.iloc[end] == pytest.approx(expected, rel=1e-6, abs=1e-6)
+
+
+def test_rolling_hurst_of_constant_window_falls_back_to_the_floor():
+    prices = np.r_[np.full(50, 100.0), random_walk(50).to_numpy()]
+    hurst = calculate_rolling_hurst(prices, window=30)
+
+    assert hurst.iloc[29:50].tolist() == pytest.approx([0.0] * 21, abs=1e-12)
+    assert hurst.iloc[49] == pytest.approx(calculate_hurst_exponent(prices[20:50]))
+
+
+def test_rolling_hurst_of_series_matches_batch():
+    prices = random_walk(300)
+    hurst = calculate_rolling_hurst(prices, window=100)
+
+    assert hurst.index.equals(prices.index)
+    assert hurst.iloc[:99].isna().all()
+    assert (hurst.iloc[99:] == calculate_hurst_exponent(prices.iloc[-100:])).all()
+
+
+def make_prices(n=300, seed=0):
+    close = random_walk(n, seed)
+    spread = np.random.default_rng(seed + 1).uniform(0, 2000, n)
+    return pd.DataFrame(
+        {
+            "open": close.shift(fill_value=close.iloc[0]),
+            "high": close + spread,
+            "low": close - spread,
+            "close": close,
+            "volume": np.random.default_rng(seed + 2).gamma(2.0, 5.0, n),
+        }
+    )
+
+
+@pytest.mark.parametrize("backend", kernels.available_backends)
+@pytest.mark.parametrize("n", [60, 300])
+def test_shared_intermediates_keep_the_report_identical(backend, n):
+    prices = make_prices(n)
+    returns = prices["close"].pct_change()
+
+    with kernels.use_backend(backend):
+        skew, kurt = indicators.rolling_skew_kurt(returns.to_numpy(), 63)
+        expected = build_technical_analysis_report(
+            {
+                "trend": calculate_trend_signals(prices),
+                "mean_reversion": calculate_mean_reversion_signals(prices),
+                "momentum": calculate_momentum_signals(prices),
+                "volatility": calculate_volatility_signals(prices),
+                "stat_arb": decide_stat_arb_signal(
+                    calculate_hurst_exponent(prices["close"]), skew[-1], kurt[-1]
+                ),
+            }
+        )
+        actual = technical_analysis(prices)
+
+    # NaNも含めて完全に一致する
+    assert json.dumps(actual) == json.dumps(expected)
@@ -0,0 +1,16 @@
+import pytest
+
+from benchmark import assert_report_close, make_synthetic_klines
+from technical_analyzer import technical_analysis
+from technical_batch import flatten_report, technical_analysis_batch
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_rows_match_technical_analysis(seed):
+    klines = make_synthetic_klines(800, seed=seed, as_str=True)
+    table = technical_analysis_batch(klines)
+
+    assert len(table) == len(klines)
+    for end in range(130, len(klines), 23):
+        expected = flatten_report(technical_analysis(klines.iloc[: end + 1]))
+        assert_report_close(expected, table.iloc[end].to_dict())
@@ -0,0 +1,293 @@
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class Tracer:
+    """
+    サイクルごとの処理時間を記録するトレーサ
+
+    start_cycleからend_cycleまでの間にspanで囲んだ処理の開始時刻と所要時間を
+    メモリ上に記録し、end_cycleでSQLiteのテーブルとChromeのトレースイベント形式の
+    JSON(Perfettoで表示可能)に書き出す。書き出しはバックグラウンドのスレッドで行うため、
+    ループ側の負荷は記録1件あたりperf_counter_nsの呼び出し2回とリストへの追加のみ。
+    サンプリングされなかったサイクルやサイクル外のspanは何もしない。
+    書き出しの際に、retention_daysより古いspanとmax_trace_files件を超えた古いJSONを削除する。
+    add_listenerで登録した関数には、サイクルの内外に関わらず全てのspanの終了時に
+    (名前, 所要時間(ns), 例外で終了した場合はTrue)を渡す。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.db_path = None
+        self.trace_dir = None
+        self.retention_days = 30
+        self.max_trace_files = 24 * 7
+
+        self._cycle = None
+        self._queue = None
+        self._writer = None
+        self._listeners = []
+
+    def configure(
+        self,
+        enabled=True,
+        sample_rate=1.0,
+        db_path="sql/trace.db",
+        trace_dir="traces",
+        retention_days=30,
+        max_trace_files=24 * 7,
+    ):
+        """
+        トレースの設定を行う
+
+        Args:
+            enabled: トレースを有効にする場合はTrue
+            sample_rate: トレースするサイクルの割合(0〜1)
+            db_path: spanを格納するSQLiteのパス(Noneの場合は書き出さない)
+            trace_dir: Chromeのトレース形式のJSONを出力するディレクトリ(Noneの場合は書き出さない)
+            retention_days: SQLiteにspanを残す日数(Noneの場合は削除しない)
+            max_trace_files: trace_dirに残すJSONの数(Noneの場合は削除しない)
+        """
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.db_path = db_path
+        self.trace_dir = trace_dir
+        self.retention_days = retention_days
+        self.max_trace_files = max_trace_files
+
+        if enabled and self._writer is None:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def add_listener(self, listener):
+        """spanの終了時に呼び出す関数を登録する"""
+        self._listeners.append(listener)
+
+    def start_cycle(self, name="cycle"):
+        """サイクルの記録を開始する(記録中のサイクルがあれば終了させる)"""
+        self.end_cycle()
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+
+        self._cycle = {
+            "id": datetime.now().strftime("%Y%m%d_%H%M%S_%f"),
+            "name": name,
+            "pid": os.getpid(),
+            "wall_ns": time.time_ns(),
+            "start": time.perf_counter_ns(),
+            "spans": [],
+        }
+
+    def end_cycle(self):
+        """サイクルの記録を終了し、書き出しを依頼する"""
+        cycle = self._cycle
+        if cycle is None:
+            return
+        self._cycle = None
+
+        end = time.perf_counter_ns()
+        cycle["spans"].append(
+            (cycle["name"], cycle["start"], end, threading.get_ident(), None)
+        )
+        self._queue.put(cycle)
+
+    @contextmanager
+    def span(self, name, **args):
+        """withで囲んだ処理の所要時間を記録する"""
+        cycle = self._cycle
+        if cycle is None and not self._listeners:
+            yield
+            return
+
+        start = time.perf_counter_ns()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            if cycle is not None:
+                cycle["spans"].append(
+                    (name, start, end, threading.get_ident(), args or None)
+                )
+            for listener in self._listeners:
+                listener(name, end - start, error)
+
+    def traced(self, name=None):
+        """関数の所要時間を記録するデコレータ"""
+
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self._cycle is None and not self._listeners:
+                    return func(*args, **kwargs)
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def flush(self):
+        """書き出し待ちのサイクルがなくなるまで待つ"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _write_loop(self):
+        conn = None
+        while True:
+            cycle = self._queue.get()
+            try:
+                if self.db_path is not None:
+                    if conn is None:
+                        conn = connect(self.db_path)
+                    write_sqlite(conn, cycle)
+                    if self.retention_days is not None:
+                        prune_spans(
+                            conn, cycle["wall_ns"] - self.retention_days * 86400 * 10**9
+                        )
+                if self.trace_dir is not None:
+                    os.makedirs(self.trace_dir, exist_ok=True)
+                    path = os.path.join(self.trace_dir, f"{cycle['id']}.json")
+                    with open(path, "w") as f:
+                        json.dump(chrome_trace(cycle), f)
+                    if self.max_trace_files is not None:
+                        prune_trace_dir(self.trace_dir, self.max_trace_files)
+            except Exception as e:
+                logging.warning(f"トレースの書き出し中にエラーが発生しました: {e}")
+            finally:
+                self._queue.task_done()
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS spans (
+            cycle_id TEXT,
+            name TEXT,
+            start_ns INTEGER,
+            duration_ns INTEGER,
+            thread_id INTEGER,
+            args TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS spans_cycle_id ON spans (cycle_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS spans_start_ns ON spans (start_ns)")
+    return conn
+
+
+def prune_spans(conn, before_ns):
+    """開始時刻(UNIX時間(ns))がbefore_nsより前のspanを削除する"""
+    with conn:
+        conn.execute("DELETE FROM spans WHERE start_ns < ?", (before_ns,))
+
+
+def prune_trace_dir(trace_dir, max_files):
+    """trace_dirのJSONを新しいものからmax_files件だけ残して削除する"""
+    # ファイル名のcycle_idは時刻順に並ぶ
+    names = sorted(name for name in os.listdir(trace_dir) if name.endswith(".json"))
+    for name in names[: max(len(names) - max_files, 0)]:
+        os.remove(os.path.join(trace_dir, name))
+
+
+def _absolute_spans(cycle):
+    """perf_counter基準の時刻をUNIX時間(ns)に変換したspanを返す"""
+    offset = cycle["wall_ns"] - cycle["start"]
+    for name, start, end, thread_id, args in cycle["spans"]:
+        yield name, start + offset, end - start, thread_id, args
+
+
+def write_sqlite(conn, cycle):
+    with conn:
+        conn.executemany(
+            "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    cycle["id"],
+                    name,
+                    start,
+                    duration,
+                    thread_id,
+                    json.dumps(args) if args else None,
+                )
+                for name, start, duration, thread_id, args in _absolute_spans(cycle)
+            ],
+        )
+
+
+def chrome_trace(cycle):
+    """サイクルの記録をChromeのトレースイベント形式に変換する"""
+    events = []
+    for name, start, duration, thread_id, args in _absolute_spans(cycle):
+        event = {
+            "name": name,
+            "cat": cycle["name"],
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": cycle["pid"],
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = args
+        events.append(event)
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(db_path, output_path, since=None):
+    """
+    SQLiteに記録したspanをまとめてChromeのトレース形式で出力する関数
+
+    Args:
+        db_path: spanを格納したSQLiteのパス
+        output_path: 出力するJSONのパス
+        since: この値以降のcycle_id(例: "20250101_000000")のみ出力する
+    """
+    conn = sqlite3.connect(db_path)
+    query = "SELECT cycle_id, name, start_ns, duration_ns, thread_id, args FROM spans"
+    params = ()
+    if since is not None:
+        query += " WHERE cycle_id >= ?"
+        params = (since,)
+
+    events = []
+    for cycle_id, name, start, duration, thread_id, args in conn.execute(query, params):
+        event = {
+            "name": name,
+            "cat": cycle_id,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": 0,
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = json.loads(args)
+        events.append(event)
+    conn.close()
+
+    with open(output_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
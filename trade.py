@@ -5,10 +5,9 @@ import json
 import time
 from datetime import datetime
 
-import pandas as pd
 import requests
-from pytz import timezone
 
+from tracer import traced
 from utils import print_log
 
 conf = configparser.ConfigParser()
@@ -18,6 +17,7 @@ secretKey = conf["gmo"]["secretKey"]
 
 
 # ------------------------GMOコインAPIを用いた取引目的の関数------------------------#
+@traced()
 def get_price(symbol="BTC_JPY"):
     """
     仮想通貨の現在価格を取得する関数
@@ -37,6 +37,7 @@ def get_price(symbol="BTC_JPY"):
     return res_json["data"][0]["ask"]
 
 
+@traced()
 def get_available_amount():
     """
     取引余力を取得する関数
@@ -61,6 +62,7 @@ def get_available_amount():
     return res_json["data"]["availableAmount"]
 
 
+@traced()
 def build_position(
     symbol, side, executionType, size, price="", losscutPrice="", timeInForce="FAK"
 ):
@@ -108,6 +110,7 @@ def build_position(
     return res_json
 
 
+@traced()
 def get_position():
     """建玉一覧を取得"""
     timestamp = "{0}000".format(int(time.mktime(datetime.now().timetuple())))
@@ -131,6 +134,7 @@ def get_position():
     return res_json
 
 
+@traced()
 def close_position(symbol, side, size, executionType, position_id):
     """決済注文を出す"""
     timestamp = "{0}000".format(int(time.mktime(datetime.now().timetuple())))
@@ -161,29 +165,40 @@ def close_position(symbol, side, size, executionType, position_id):
     return res_json
 
 
+@traced()
 def exe_all_position():
-    """すべてのポジションを決済する"""
+    """すべてのポジションを決済し、決済注文の注文IDのリストを返す"""
+    order_ids = []
     position = get_position()
     if "list" in position["data"]:
         for i in position["data"]["list"]:
             if i["side"] == "BUY":
-                close_position(
+                res = close_position(
                     i["symbol"], "SELL", i["size"], "MARKET", i["positionId"]
                 )
+                order_ids.append(res["data"])
                 print_log(f"{i['symbol']}(BUY)は決済されました", notify=False)
             elif i["side"] == "SELL":
-                close_position(i["symbol"], "BUY", i["size"], "MARKET", i["positionId"])
+                res = close_position(
+                    i["symbol"], "BUY", i["size"], "MARKET", i["positionId"]
+                )
+                order_ids.append(res["data"])
                 print_log(f"{i['symbol']}(SELL)は決済されました", notify=False)
 
     else:
         print_log("ポジションはありません", notify=False)
 
+    return order_ids
+
 
+@traced()
 def order_process(
     symbol, side, executionType, size, price="", losscutPrice="", timeInForce="FAK"
 ):
-    """注文を出す"""
-    build_position(symbol, side, executionType, size, price, losscutPrice, timeInForce)
+    """注文を出し、注文IDを返す"""
+    res = build_position(
+        symbol, side, executionType, size, price, losscutPrice, timeInForce
+    )
 
     time.sleep(1)
 
@@ -192,9 +207,20 @@ def order_process(
         price = position["data"]["list"][0]["price"]
         print_log(f"{symbol}を{price}円で{side}しました", notify=False)
 
+    return res["data"]
 
-def get_trading_result():
-    """取引の記録を取得"""
+
+@traced()
+def get_latest_executions(symbol="BTC_JPY", page=1, count=100):
+    """
+    最新の約定一覧を新しい順に取得(直近1日分)
+    params
+    ============
+    page: int
+        取得するページ
+    count: int
+        1ページの件数(最大100)
+    """
     timestamp = "{0}000".format(int(time.mktime(datetime.now().timetuple())))
     method = "GET"
     endPoint = "https://api.coin.z.com/private"
@@ -204,7 +230,37 @@ def get_trading_result():
     sign = hmac.new(
         bytes(secretKey.encode("ascii")), bytes(text.encode("ascii")), hashlib.sha256
     ).hexdigest()
-    parameters = {"symbol": "BTC_JPY", "page": 1, "count": 2}
+    parameters = {"symbol": symbol, "page": page, "count": count}
+
+    headers = {"API-KEY": apiKey, "API-TIMESTAMP": timestamp, "API-SIGN": sign}
+
+    res = requests.get(endPoint + path, headers=headers, params=parameters)
+
+    res_json = res.json()
+    if res.status_code != 200 or "data" not in res_json:
+        raise Exception(f"Error fetching latest executions: {res_json}")
+    return res_json["data"].get("list", [])
+
+
+@traced()
+def get_executions(order_ids):
+    """
+    注文IDを指定して約定一覧を取得
+    params
+    ============
+    order_ids: list
+        注文IDのリスト(最大10件)
+    """
+    timestamp = "{0}000".format(int(time.mktime(datetime.now().timetuple())))
+    method = "GET"
+    endPoint = "https://api.coin.z.com/private"
+    path = "/v1/executions"
+
+    text = timestamp + method + path
+    sign = hmac.new(
+        bytes(secretKey.encode("ascii")), bytes(text.encode("ascii")), hashlib.sha256
+    ).hexdigest()
+    parameters = {"orderId": ",".join(str(order_id) for order_id in order_ids)}
 
     headers = {"API-KEY": apiKey, "API-TIMESTAMP": timestamp, "API-SIGN": sign}
 
@@ -212,16 +268,5 @@ def get_trading_result():
 
     res_json = res.json()
     if res.status_code != 200 or "data" not in res_json:
-        raise Exception(f"Error fetching trading result: {res_json}")
-
-    data_list = res_json["data"]["list"]
-    time_ = pd.Timestamp(data_list[1]["timestamp"]).astimezone(timezone("Asia/Tokyo"))
-    date = time_.strftime("%Y-%m-%d %H:00:00")
-    side = data_list[1]["side"]
-    position = -1 if side == "SELL" else 1
-    order_price = int(data_list[1]["price"])
-    close_price = int(data_list[0]["price"])
-    loss_gain = int(data_list[0]["lossGain"])
-    id = int(data_list[0]["executionId"])
-
-    return id, date, position, order_price, close_price, loss_gain
+        raise Exception(f"Error fetching executions: {res_json}")
+    return res_json["data"].get("list", [])